@@ -0,0 +1,142 @@
+"""Точность и полнота поиска почти-дубликатов на синтетическом корпусе
+
+    python -m benchmarks.dedup --bases 2000 --similarity 0.6
+
+Корпус — отзывы из типичных фраз (разные отзывы делят слова и обороты) и их копии с правками: смена регистра и пунктуации,
+опечатка, вставка, удаление или замена слова. Отзывы поступают по
+одному, как в create_feedback: MinHash-подпись → кандидаты по полосам →
+pick_cluster. Индекс полос — словарь, как частичный индекс
+pending_lsh_bands в MongoDB; число кандидатов на поиск и определяет
+стоимость запроса к базе. В индексе остаются все отзывы корпуса, хотя
+в базе проверенные из него выпадают, — оценка сверху. MongoDB не нужен.
+"""
+import argparse
+import random
+import time
+from collections import Counter, defaultdict
+from datetime import datetime, timedelta
+
+from database.dedup import fingerprint, pick_cluster
+
+
+# Фразы собираются из частей: разные отзывы похожи по словам, но редко совпадают целиком
+SUBJECTS = (
+    "курьер", "заказ", "приложение", "поддержка", "оплата", "доставка", "менеджер", "сайт",
+    "упаковка", "товар", "возврат", "промокод", "оператор", "бонусы", "пицца", "каталог",
+)
+STATES = (
+    "опоздал на час", "пришёл не полностью", "постоянно зависает", "не отвечает второй день",
+    "работает отлично", "был вежливым", "оказался порванным", "стоит дороже, чем на сайте",
+    "не применяется", "приехал холодным", "вернули через неделю", "понравился",
+    "сломался через день", "обещали перезвонить", "оформили быстро", "списали дважды",
+)
+MODIFIERS = ("", "опять", "как всегда", "в этот раз", "к сожалению", "наконец-то", "очень", "снова")
+EDITS = ("copy", "case", "punctuation", "typo", "insert", "delete", "replace")
+
+
+def review(rng: random.Random) -> str:
+    phrases = [
+        " ".join(filter(None, (rng.choice(MODIFIERS), rng.choice(SUBJECTS), rng.choice(STATES))))
+        for _ in range(rng.randint(2, 5))
+    ]
+    return ". ".join(phrases).capitalize() + "."
+
+
+def edit(text: str, kind: str, rng: random.Random) -> str:
+    words = text.split()
+    if kind == "case":
+        return text.upper() if rng.random() < 0.5 else text.lower()
+    if kind == "punctuation":
+        return text.replace(",", "").replace(".", "!!!")
+    if kind == "typo":
+        i = rng.randrange(len(words))
+        word = words[i]
+        if len(word) > 3:
+            j = rng.randrange(1, len(word) - 1)
+            words[i] = word[:j] + word[j + 1] + word[j] + word[j + 2:]
+    elif kind == "insert":
+        words.insert(rng.randrange(len(words) + 1), rng.choice(["очень", "просто", "вообще", "снова"]))
+    elif kind == "delete" and len(words) > 4:
+        del words[rng.randrange(len(words))]
+    elif kind == "replace":
+        words[rng.randrange(len(words))] = rng.choice(["плохо", "ужасно", "отлично", "нормально"])
+    return " ".join(words)
+
+
+def corpus(bases: int, seed: int):
+    """(текст, номер исходного отзыва, вид правки) в порядке поступления"""
+    rng = random.Random(seed)
+    originals = list(dict.fromkeys(review(rng) for _ in range(bases)))
+    items = [(text, i, None) for i, text in enumerate(originals)]
+    for i, text in enumerate(originals):
+        if rng.random() < 0.5:
+            for _ in range(rng.randint(1, 3)):
+                kind = rng.choice(EDITS)
+                items.append((edit(text, kind, rng), i, kind))
+    rng.shuffle(items)
+    return items
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--bases", type=int, default=2000)
+    parser.add_argument("--similarity", type=float, default=0.6)
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+
+    items = corpus(args.bases, args.seed)
+    index = defaultdict(list)
+    clusters = {}
+    hashing = lookups = 0.0
+    candidates_seen = []
+    now = datetime(2024, 1, 1)
+
+    for n, (text, _, _) in enumerate(items):
+        started = time.perf_counter()
+        doc = {"_id": n, "user_id": n, "created_at": now, **fingerprint(text)}
+        hashing += time.perf_counter() - started
+
+        started = time.perf_counter()
+        found = {id(c): c for key in doc["lsh_bands"] for c in index[key]}.values()
+        cluster_id = pick_cluster(doc, found, args.similarity, timedelta(hours=24))
+        lookups += time.perf_counter() - started
+        candidates_seen.append(len(found))
+
+        if cluster_id is not None:
+            doc["cluster_id"] = cluster_id
+        clusters[n] = cluster_id if cluster_id is not None else n
+        for key in doc["lsh_bands"]:
+            index[key].append(doc)
+
+    # Пары «в одном кластере»: предсказанные против истинных
+    def pairs(groups: Counter) -> int:
+        return sum(n * (n - 1) // 2 for n in groups.values())
+
+    tp = pairs(Counter((items[n][1], clusters[n]) for n in clusters))
+    predicted = pairs(Counter(clusters.values()))
+    actual = pairs(Counter(origin for _, origin, _ in items))
+
+    # Правка поймана, если копия попала в кластер исходного отзыва
+    original = {origin: n for n, (_, origin, kind) in enumerate(items) if kind is None}
+    total = Counter(kind for _, _, kind in items if kind)
+    caught = Counter(
+        kind for n, (_, origin, kind) in enumerate(items)
+        if kind and clusters[n] == clusters[original[origin]]
+    )
+
+    duplicates = sum(1 for n in clusters if clusters[n] != n)
+    print(f"Отзывов: {len(items)}, исходных: {len({origin for _, origin, _ in items})}, порог сходства: {args.similarity}")
+    print(f"Пары в одном кластере: точность {tp / max(predicted, 1):.3f}, полнота {tp / max(actual, 1):.3f}")
+    print(f"Скрыто из очереди как дубликаты: {duplicates}")
+    print("Полнота по видам правок: " + ", ".join(
+        f"{kind} {caught[kind] / total[kind]:.2f}" for kind in EDITS if total[kind]
+    ))
+    print(
+        f"MinHash: {hashing / len(items) * 1e6:.0f} мкс/отзыв, поиск по полосам: "
+        f"{lookups / len(items) * 1e6:.0f} мкс, кандидатов в среднем {sum(candidates_seen) / len(items):.2f}, "
+        f"максимум {max(candidates_seen)}"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,124 @@
+"""Масштабирование DISPATCH_MODE=processes по ядрам
+
+    python -m benchmarks.dispatch --updates 3000 --processes 1,2,4
+    python -m benchmarks.dispatch --updates 3000 --processes 2 --crash
+
+Обновления-отзывы идут через ProcessUpdateDispatcher, как в main.py:
+сериализация, очередь процесса по пользователю, разбор Update в
+процессе. Вместо хендлеров процесс выполняет CPU-часть записи отзыва —
+MinHash-отпечаток текста (--rounds раз) — и сообщает о каждом
+обновлении. Время — от первой передачи до последнего подтверждения,
+без запуска процессов. Ускорение ограничено числом ядер машины.
+С --crash один процесс убивается посередине: диспетчер должен
+перезапустить его и передать новому оставшиеся обновления.
+MongoDB и Telegram не нужны.
+"""
+import argparse
+import asyncio
+import multiprocessing
+import os
+import queue as queue_module
+import random
+import time
+from functools import partial
+
+from aiogram.types import Update
+
+from bot.dispatch import ProcessUpdateDispatcher
+
+
+def _bench_process(results, rounds: int, mp_queue, workers: int, queue_size: int, global_rate: float):
+    """Цель процесса вместо _process_main: отпечаток текста на каждое обновление"""
+    from database.dedup import fingerprint
+
+    results.put("ready")
+    while (data := mp_queue.get()) is not None:
+        update = Update.model_validate_json(data)
+        for _ in range(rounds):
+            fingerprint(update.message.text)
+        results.put(update.update_id)
+
+
+def make_updates(count: int, users: int, seed: int):
+    rng = random.Random(seed)
+    words = "курьер заказ доставка опоздал приложение оплата поддержка вежливый холодный вернули".split()
+    return [
+        Update.model_validate({
+            "update_id": i,
+            "message": {
+                "message_id": i,
+                "date": 0,
+                "chat": {"id": user_id, "type": "private"},
+                "from": {"id": user_id, "is_bot": False, "first_name": "u"},
+                "text": " ".join(rng.choice(words) for _ in range(rng.randint(10, 60))),
+            },
+        })
+        for i, user_id in ((i, rng.randrange(users)) for i in range(count))
+    ]
+
+
+async def collect(results, count: int, idle: float) -> set:
+    """Подтверждения обработки, пока не придут все или idle секунд не будет новых"""
+    loop = asyncio.get_running_loop()
+    done = set()
+    while len(done) < count:
+        try:
+            done.add(await loop.run_in_executor(None, results.get, True, idle))
+        except queue_module.Empty:
+            break
+    return done
+
+
+async def run(processes: int, updates: list, rounds: int, queue_size: int, crash: bool) -> float:
+    results = multiprocessing.get_context("spawn").Queue()
+    dispatcher = ProcessUpdateDispatcher(
+        None, None, processes=processes, queue_size=queue_size,
+        target=partial(_bench_process, results, rounds),
+    )
+    await dispatcher.start()
+    await collect(results, processes, idle=60)  # "ready" от каждого процесса
+
+    started = time.perf_counter()
+    collecting = asyncio.create_task(collect(results, len(updates), idle=10))
+    for i, update in enumerate(updates):
+        if crash and i == len(updates) // 2:
+            dispatcher._processes[0].kill()
+            dispatcher._processes[0].join()
+        await dispatcher.submit(update)
+    done = await collecting
+    elapsed = time.perf_counter() - started
+    if len(done) < len(updates):
+        elapsed -= 10  # ожидание подтверждений, которых уже не будет
+    await dispatcher.stop()
+
+    done.discard("ready")  # перезапущенный процесс
+    lost = len(updates) - len(done)
+    note = f", потеряно {lost} (были у убитого процесса)" if lost else ""
+    print(f"{processes} проц.: {len(done) / elapsed:,.0f} обновлений/с за {elapsed:.2f} с{note}")
+    return len(done) / elapsed
+
+
+async def main_async(args):
+    updates = make_updates(args.updates, args.users, args.seed)
+    print(f"🧮 {args.updates} обновлений, {args.rounds} отпечатков на каждое, ядер: {os.cpu_count()}")
+    baseline = None
+    for processes in args.processes:
+        rate = await run(processes, updates, args.rounds, args.queue_size, args.crash)
+        baseline = baseline or rate
+        print(f"   ускорение к {args.processes[0]} проц.: ×{rate / baseline:.2f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--updates", type=int, default=3000)
+    parser.add_argument("--users", type=int, default=500)
+    parser.add_argument("--rounds", type=int, default=5, help="отпечатков на обновление (нагрузка на CPU)")
+    parser.add_argument("--processes", type=lambda s: [int(x) for x in s.split(",")], default=[1, 2, 4])
+    parser.add_argument("--queue-size", type=int, default=100)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--crash", action="store_true", help="убить процесс посередине прогона")
+    asyncio.run(main_async(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
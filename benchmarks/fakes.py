@@ -0,0 +1,36 @@
+"""Подмена Bot API для бенчмарков: сессия, которая считает вызовы вместо запросов в Telegram"""
+import itertools
+from collections import Counter
+from datetime import datetime
+
+from aiogram.client.session.base import BaseSession
+from aiogram.methods import GetMe
+from aiogram.types import Chat, Message, User
+
+
+class RecordingSession(BaseSession):
+    """Сессия бота, которая не ходит в Telegram, а считает вызовы методов"""
+
+    def __init__(self):
+        super().__init__()
+        self.calls: Counter = Counter()
+        self._message_ids = itertools.count(1)
+
+    async def make_request(self, bot, method, timeout=None):
+        self.calls[type(method).__name__] += 1
+        if isinstance(method, GetMe):
+            return User(id=bot.id, is_bot=True, first_name="bench")
+        if method.__returning__ is Message:
+            return Message(
+                message_id=next(self._message_ids),
+                date=datetime.now(),
+                chat=Chat(id=method.chat_id, type="private"),
+                text=getattr(method, "text", None),
+            )
+        return True
+
+    async def stream_content(self, url, headers=None, timeout=30, chunk_size=65536, raise_for_status=True):
+        yield b""
+
+    async def close(self):
+        pass
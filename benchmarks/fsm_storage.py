@@ -0,0 +1,79 @@
+"""Сравнение MongoStorage и MemoryStorage на сценарии оставления отзыва
+
+    python -m benchmarks.fsm_storage --users 2000 --concurrency 100
+
+Нужен доступный MongoDB (MONGO_URL / DB_NAME из .env).
+"""
+import argparse
+import asyncio
+import statistics
+import time
+
+from aiogram.fsm.context import FSMContext
+from aiogram.fsm.storage.base import StorageKey
+from aiogram.fsm.storage.memory import MemoryStorage
+
+from database.connection import db
+from database.fsm_storage import MongoStorage
+
+
+async def feedback_flow(storage, user_id: int) -> float:
+    """FSM-операции одного отзыва: текст → оценка → очистка"""
+    context = FSMContext(storage, StorageKey(bot_id=0, chat_id=user_id, user_id=user_id))
+    started = time.perf_counter()
+
+    await context.set_state("FeedbackState:waiting_for_message")
+    await context.get_state()
+    await context.update_data(message="Отличный сервис, всё понравилось")
+    await context.set_state("FeedbackState:waiting_for_rating")
+    await context.get_state()
+    await context.get_data()
+    await context.clear()
+
+    return time.perf_counter() - started
+
+
+async def run(storage, users: int, concurrency: int) -> dict:
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def one(user_id):
+        async with semaphore:
+            return await feedback_flow(storage, user_id)
+
+    started = time.perf_counter()
+    latencies = sorted(await asyncio.gather(*(one(i) for i in range(users))))
+    elapsed = time.perf_counter() - started
+    await storage.close()
+
+    return {
+        "flows/s": users / elapsed,
+        "p50, мс": statistics.median(latencies) * 1000,
+        "p99, мс": latencies[int(len(latencies) * 0.99) - 1] * 1000,
+    }
+
+
+async def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--users", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, default=100)
+    args = parser.parse_args()
+
+    await db.connect()
+    try:
+        mongo = MongoStorage(db)
+        await mongo.setup()
+        results = {
+            "memory": await run(MemoryStorage(), args.users, args.concurrency),
+            "mongo": await run(mongo, args.users, args.concurrency),
+            # Кэш чтения — только для одной реплики
+            "mongo+cache": await run(MongoStorage(db, cache_ttl=30), args.users, args.concurrency),
+        }
+    finally:
+        await db.disconnect()
+
+    for name, result in results.items():
+        print(f"{name:>11}: " + ", ".join(f"{k} {v:.1f}" for k, v in result.items()))
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,266 @@
+"""Сквозной нагрузочный тест: настоящий Dispatcher с роутерами и синтетические обновления
+
+    python -m benchmarks.load --users 1000 --concurrency 50
+    python -m benchmarks.load --backend mongo --db-name feedback_bot_bench
+    python -m benchmarks.load --save          # записать текущие цифры как базовые
+
+Сценарии: отправка отзыва (кнопка → текст → оценка), «📊 Мои отзывы»,
+модерация кнопками и статистика. Обновления проходят весь путь
+feed_update → middleware → хендлер → база; запросы к Bot API
+перехватывает RecordingSession, лимиты отправки отключены. --backend
+выбирает хранилище так же, как STORAGE_BACKEND у бота; цифры каждого
+хранилища лежат в baseline.json под своим ключом — прогоны с разным
+--backend и сравнивают их между собой.
+
+Результат сравнивается с benchmarks/baseline.json: падение пропускной
+способности или рост p99 больше допуска и рост числа вызовов Bot API
+на обновление считаются регрессией (код выхода 1). Базовые цифры
+зависят от машины — сохраняйте их там же, где сравниваете.
+С --backend mongo нужен доступный MongoDB; база --db-name очищается.
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import statistics
+import sys
+import time
+from datetime import datetime
+from pathlib import Path
+
+
+BASELINE_PATH = Path(__file__).with_name("baseline.json")
+FIRST_USER_ID = 10 ** 9
+WORDS = (
+    "доставка курьер приложение оплата заказ быстро удобно поддержка вежливый опоздал товар "
+    "качество цена магазин сайт ответ вернули деньги неделю упаковка отличный сервис спасибо"
+).split()
+
+
+def configure(args):
+    """Настройки читаются при импорте модулей бота, поэтому задаются до него"""
+    os.environ.setdefault("BOT_TOKEN", "123456:benchmark")
+    os.environ.setdefault("ADMIN_IDS", "1")
+    # Замеряется обработка, а не лимиты Telegram
+    os.environ["SEND_GLOBAL_RATE"] = "1000000000"
+    os.environ["SEND_CHAT_RATE"] = "1000000000"
+    os.environ["SEND_CHAT_BURST"] = "1000000000"
+    os.environ["ADMINS_FROM_DB"] = "false"
+    os.environ["STORAGE_BACKEND"] = args.backend
+    if args.backend == "memory":
+        os.environ["FSM_STORAGE"] = "memory"
+        os.environ["THROTTLE_STORAGE"] = "memory"
+        os.environ["BATCH_WRITES"] = "false"
+    else:
+        os.environ["DB_NAME"] = args.db_name
+
+
+def feedback_text(user_id: int) -> str:
+    """Свой текст у каждого пользователя — иначе отзывы склеятся как почти-дубликаты"""
+    words = random.Random(user_id).choices(WORDS, k=12)
+    return f"Отзыв: {' '.join(words)}"
+
+
+def percentile(values, q: float) -> float:
+    return values[min(len(values) - 1, int(len(values) * q))]
+
+
+class Harness:
+    """Бот, диспетчер и генератор обновлений"""
+
+    def __init__(self, bot, dp, session, admin_id: int):
+        self.bot = bot
+        self.dp = dp
+        self.session = session
+        self.admin_id = admin_id
+        self._update_ids = iter(range(1, 10 ** 12))
+
+    def _user(self, user_id: int):
+        from aiogram.types import User
+        return User(id=user_id, is_bot=False, first_name=f"User {user_id}", username=f"user{user_id}")
+
+    def _message(self, user_id: int, text: str = None, reply_markup=None):
+        from aiogram.types import Chat, Message
+        return Message(
+            message_id=next(self._update_ids),
+            date=datetime.now(),
+            chat=Chat(id=user_id, type="private"),
+            from_user=self._user(user_id),
+            text=text,
+            reply_markup=reply_markup,
+        )
+
+    def message(self, user_id: int, text: str):
+        from aiogram.types import Update
+        return Update(update_id=next(self._update_ids), message=self._message(user_id, text))
+
+    def callback(self, user_id: int, data: str, reply_markup=None):
+        from aiogram.types import CallbackQuery, Update
+        return Update(
+            update_id=next(self._update_ids),
+            callback_query=CallbackQuery(
+                id=str(next(self._update_ids)),
+                from_user=self._user(user_id),
+                chat_instance="benchmark",
+                data=data,
+                message=self._message(user_id, "📋 Новые отзывы", reply_markup),
+            ),
+        )
+
+    async def feed(self, update) -> float:
+        started = time.perf_counter()
+        await self.dp.feed_update(self.bot, update)
+        return time.perf_counter() - started
+
+    async def run(self, sequences, concurrency: int) -> dict:
+        """Прогон: обновления одной последовательности идут строго по очереди"""
+        from bot.sender import sender
+
+        semaphore = asyncio.Semaphore(concurrency)
+        latencies = []
+
+        async def one(updates):
+            async with semaphore:
+                for update in updates:
+                    latencies.append(await self.feed(update))
+
+        self.session.calls.clear()
+        started = time.perf_counter()
+        await asyncio.gather(*(one(updates) for updates in sequences))
+        elapsed = time.perf_counter() - started
+
+        # Фоновые уведомления и дайджесты тоже относятся к сценарию
+        await sender.stop()
+        await sender.start(self.bot)
+
+        latencies.sort()
+        return {
+            "updates/s": round(len(latencies) / elapsed, 1),
+            "p50_ms": round(statistics.median(latencies) * 1000, 3),
+            "p99_ms": round(percentile(latencies, 0.99) * 1000, 3),
+            "api_calls_per_update": {
+                method: round(count / len(latencies), 3)
+                for method, count in sorted(self.session.calls.items())
+            },
+        }
+
+
+async def scenarios(harness: Harness, database, users: int, concurrency: int) -> dict:
+    from keyboards.main import get_claim_keyboard
+
+    user_ids = range(FIRST_USER_ID, FIRST_USER_ID + users)
+    results = {}
+
+    results["submit"] = await harness.run([
+        [
+            harness.message(user_id, "📝 Оставить отзыв"),
+            harness.message(user_id, feedback_text(user_id)),
+            harness.callback(user_id, f"rating_{user_id % 5 + 1}"),
+        ]
+        for user_id in user_ids
+    ], concurrency)
+
+    results["my_feedback"] = await harness.run(
+        [[harness.message(user_id, "📊 Мои отзывы")] for user_id in user_ids], concurrency
+    )
+
+    # Модерация: каждое нажатие — в пачке из пяти закреплённых отзывов, как в боте
+    page = await database.claim_feedback(harness.admin_id, count=users)
+    ids = [fb.id for fb in page.items]
+    updates = []
+    for start in range(0, len(ids), 5):
+        chunk = ids[start:start + 5]
+        keyboard = get_claim_keyboard(chunk)
+        for i, feedback_id in enumerate(chunk):
+            action = "approve" if i % 2 == 0 else "reject"
+            updates.append([harness.callback(harness.admin_id, f"{action}_{feedback_id}", keyboard)])
+    results["moderation"] = await harness.run(updates, concurrency)
+
+    results["stats"] = await harness.run(
+        [[harness.message(harness.admin_id, "📊 Статистика")] for _ in user_ids], concurrency
+    )
+    return results
+
+
+def compare(results: dict, baseline: dict, tolerance: float) -> list:
+    """Регрессии относительно базовых цифр"""
+    problems = []
+    for name, result in results.items():
+        base = baseline.get(name)
+        if base is None:
+            continue
+        if result["updates/s"] < base["updates/s"] * (1 - tolerance):
+            problems.append(f"{name}: пропускная способность {result['updates/s']} < {base['updates/s']}")
+        if result["p99_ms"] > base["p99_ms"] * (1 + tolerance):
+            problems.append(f"{name}: p99 {result['p99_ms']} мс > {base['p99_ms']} мс")
+        # Число дайджестов зависит от длительности прогона, поэтому небольшой допуск
+        for method, calls in result["api_calls_per_update"].items():
+            base_calls = base["api_calls_per_update"].get(method, 0)
+            if calls > base_calls * 1.05:
+                problems.append(f"{name}: {method} на обновление {calls} > {base_calls}")
+    return problems
+
+
+async def run(args) -> int:
+    from bot.sender import sender
+    from database.admins import roster
+    from database.connection import db as database
+    from main import create_bot, create_dispatcher, create_storage
+    from benchmarks.fakes import RecordingSession
+
+    await database.connect()
+    if args.backend == "mongo":
+        await database.db.feedback.delete_many({})
+        await database.db.stats.delete_many({})
+
+    session = RecordingSession()
+    bot = create_bot(session=session)
+    await sender.start(bot)
+    dp = await create_dispatcher(await create_storage())
+    harness = Harness(bot, dp, session, admin_id=min(roster.ids))
+
+    try:
+        results = await scenarios(harness, database, args.users, args.concurrency)
+    finally:
+        await sender.stop()
+        await dp.storage.close()
+        await database.flush()
+        await database.disconnect()
+
+    for name, result in results.items():
+        calls = ", ".join(f"{method} {count}" for method, count in result["api_calls_per_update"].items())
+        print(
+            f"{name:>12}: {result['updates/s']:.0f} upd/s, "
+            f"p50 {result['p50_ms']:.2f} мс, p99 {result['p99_ms']:.2f} мс | {calls}"
+        )
+
+    baselines = json.loads(BASELINE_PATH.read_text()) if BASELINE_PATH.exists() else {}
+    if args.save:
+        baselines[args.backend] = results
+        BASELINE_PATH.write_text(json.dumps(baselines, ensure_ascii=False, indent=2) + "\n")
+        print(f"💾 Базовые цифры сохранены в {BASELINE_PATH}")
+        return 0
+
+    problems = compare(results, baselines.get(args.backend, {}), args.tolerance)
+    for problem in problems:
+        print(f"❌ {problem}")
+    return 1 if problems else 0
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--backend", choices=("memory", "mongo"), default="memory")
+    parser.add_argument("--db-name", default="feedback_bot_bench")
+    parser.add_argument("--users", type=int, default=1000)
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--tolerance", type=float, default=0.3)
+    parser.add_argument("--save", action="store_true")
+    args = parser.parse_args()
+
+    configure(args)
+    sys.exit(asyncio.run(run(args)))
+
+
+if __name__ == "__main__":
+    main()
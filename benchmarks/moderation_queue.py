@@ -0,0 +1,90 @@
+"""Пропускная способность модерации при нескольких администраторах
+
+    python -m benchmarks.moderation_queue --items 200 --think-ms 20
+    python -m benchmarks.moderation_queue --backend mongo --db-name feedback_bot_bench
+
+Каждый администратор в цикле открывает «📋 Новые отзывы» и решает по
+отзывам страницы, тратя на каждый --think-ms. Режим shared — прежнее
+поведение (все получают одну и ту же первую страницу), lease — очередь
+с арендой (claim_feedback). Считаются время до пустой очереди, решения,
+перезаписавшие чужое решение, и отказы по чужой аренде.
+С --backend mongo база --db-name очищается.
+"""
+import argparse
+import asyncio
+import time
+from collections import Counter
+
+from benchmarks.load import configure, feedback_text
+
+
+async def admin_loop(database, admin_id: int, mode: str, think: float, counters: Counter):
+    from database.leases import LeaseConflict
+
+    while True:
+        # В режиме shared все берут пачку одного общего «администратора» 0:
+        # его аренды продлеваются, и каждый видит те же первые отзывы очереди
+        page = await database.claim_feedback(admin_id if mode == "lease" else 0)
+        if not page.items:
+            return
+        for row in page.items:
+            await asyncio.sleep(think)  # администратор читает отзыв
+            try:
+                before = await database.approve_feedback(row.id, admin_id=admin_id if mode == "lease" else None)
+            except LeaseConflict:
+                counters["conflicts"] += 1
+                continue
+            counters["decisions"] += 1
+            if before is not None and before["is_moderated"]:
+                counters["overwritten"] += 1
+
+
+async def run(args):
+    from database.connection import create_database, db
+    from database.models import FeedbackModel
+
+    print(f"{'режим':>6} {'админов':>8} {'время, с':>9} {'отзывов/с':>10} {'решений':>8} {'перезаписано':>13} {'отказов':>8}")
+    for mode in ("shared", "lease"):
+        for admins in args.admins:
+            if args.backend == "memory":
+                database = create_database()
+            else:
+                database = db
+                await db.connect()
+                await db.db.feedback.delete_many({})
+            for user_id in range(args.items):
+                await database.create_feedback(FeedbackModel(
+                    user_id=user_id, first_name=f"User {user_id}", message=feedback_text(user_id), rating=5,
+                ))
+            await database.flush()
+
+            counters = Counter()
+            started = time.perf_counter()
+            await asyncio.gather(*(
+                admin_loop(database, admin_id, mode, args.think_ms / 1000, counters)
+                for admin_id in range(1, admins + 1)
+            ))
+            elapsed = time.perf_counter() - started
+            await database.disconnect()
+
+            print(
+                f"{mode:>6} {admins:>8} {elapsed:>9.2f} {args.items / elapsed:>10.1f} "
+                f"{counters['decisions']:>8} {counters['overwritten']:>13} {counters['conflicts']:>8}"
+            )
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--backend", choices=("memory", "mongo"), default="memory")
+    parser.add_argument("--db-name", default="feedback_bot_bench")
+    parser.add_argument("--items", type=int, default=200)
+    parser.add_argument("--admins", type=int, nargs="+", default=[1, 2, 4, 8])
+    parser.add_argument("--think-ms", type=float, default=20)
+    args = parser.parse_args()
+
+    configure(args)
+    asyncio.run(run(args))
+
+
+if __name__ == "__main__":
+    main()
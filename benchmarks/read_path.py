@@ -0,0 +1,111 @@
+"""Стоимость чтения страницы: полные документы против проекций и записей со __slots__
+
+    python -m benchmarks.read_path --message-length 1500 --pages 2000
+
+Для каждого вида списка кодирует в BSON то, что сервер вернул бы
+до и после проекции, и замеряет декодирование в то, с чем работают
+хендлеры: байты ответа, память (tracemalloc) и время на страницу.
+MongoDB не нужен.
+"""
+import argparse
+import random
+import time
+import tracemalloc
+from datetime import datetime, timedelta
+
+import bson
+from bson import ObjectId
+
+from database.models import FeedbackModel
+from database.records import ROW_PREVIEW, SUMMARY_PREVIEW, FeedbackRow, SummaryRow
+
+
+WORDS = "доставка курьер приложение оплата заказ быстро удобно поддержка вежливый опоздал".split()
+
+
+def synthetic_docs(count: int, message_length: int) -> list:
+    docs = []
+    for i in range(count):
+        words = []
+        while sum(len(w) + 1 for w in words) < message_length:
+            words.append(random.choice(WORDS))
+        doc = FeedbackModel(
+            user_id=1000 + i, username=f"user{i}", first_name=f"Имя {i}", last_name="Фамилия",
+            message=" ".join(words)[:message_length], rating=random.randint(1, 5),
+            created_at=datetime(2024, 1, 1) + timedelta(minutes=i),
+        ).model_dump()
+        doc["_id"] = ObjectId()
+        docs.append(doc)
+    return docs
+
+
+def projected(doc: dict, fields: tuple, preview: int) -> dict:
+    """Документ в том виде, в каком его вернёт проекция с $substrCP"""
+    result = {field: doc[field] for field in fields}
+    result["preview"] = doc["message"][:preview]
+    result["message_length"] = len(doc["message"])
+    return result
+
+
+def decode_full(payload: bytes) -> list:
+    """Прежний путь: полные документы и замена _id на строку в цикле"""
+    docs = bson.decode_all(payload)
+    for doc in docs:
+        doc["_id"] = str(doc["_id"])
+    return docs
+
+
+def measure(name: str, payload: bytes, decode, pages: int):
+    tracemalloc.start()
+    result = decode(payload)
+    current, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    started = time.perf_counter()
+    for _ in range(pages):
+        decode(payload)
+    elapsed = time.perf_counter() - started
+
+    print(
+        f"{name:>28}: {len(payload):>7} байт, {current:>7} байт в памяти после декодирования, "
+        f"{elapsed / pages * 1e6:7.1f} мкс/страница ({len(result)} записей)"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--message-length", type=int, default=1500)
+    parser.add_argument("--pages", type=int, default=2000)
+    parser.add_argument("--page-size", type=int, default=5)
+    args = parser.parse_args()
+
+    random.seed(1)
+    docs = synthetic_docs(100, args.message_length)
+    page = docs[:args.page_size]
+    row_fields = ("_id", "user_id", "username", "first_name", "rating", "is_approved", "created_at")
+    summary_fields = ("rating", "is_approved")
+
+    def encode(items):
+        return b"".join(bson.encode(doc) for doc in items)
+
+    print("Страница админ-панели / поиска:")
+    measure("полные документы", encode(page), decode_full, args.pages)
+    measure(
+        "проекция + FeedbackRow",
+        encode(projected(doc, row_fields, ROW_PREVIEW) for doc in page),
+        lambda payload: [FeedbackRow.from_doc(doc) for doc in bson.decode_all(payload)],
+        args.pages,
+    )
+
+    print("«Мои отзывы» (прежде — до 100 документов пользователя):")
+    measure("100 полных документов", encode(docs), decode_full, args.pages // 10 or 1)
+    measure(
+        "проекция limit(5) + SummaryRow",
+        encode(projected(doc, summary_fields, SUMMARY_PREVIEW) for doc in docs[:5]),
+        lambda payload: [SummaryRow.from_doc(doc) for doc in bson.decode_all(payload)],
+        args.pages,
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,123 @@
+"""Отчёт /report по синтетической истории отзывов
+
+    python -m benchmarks.report --rows 1000000
+    python -m benchmarks.report --rows 200000 --naive
+
+Строки (REPORT_FIELDS) генерируются пачками по --batch-size — такими,
+какими их отдаёт курсор iter_report_batches, — и сворачиваются
+ReportBuilder. Время считается только для свёртки, пик памяти
+(tracemalloc) — для всего прохода. С --naive те же строки считаются
+построчным циклом на Python со списками задержек и длин, а результаты
+сверяются. MongoDB не нужен.
+"""
+import argparse
+import math
+import time
+import tracemalloc
+from datetime import datetime
+
+import numpy as np
+
+from utils.report import DELAY_LIMIT_MINUTES, LENGTH_LIMIT, RATINGS, ReportBuilder
+
+
+def batches(rows: int, batch_size: int, seed: int):
+    """Пачки строк отчёта: ~5% без оценки, ~15% не проверены, задержки — от минут до недель"""
+    rng = np.random.default_rng(seed)
+    start = int(datetime(2022, 1, 1).timestamp() * 1000)
+    span = 3 * 365 * 24 * 3_600_000
+    for offset in range(0, rows, batch_size):
+        size = min(batch_size, rows - offset)
+        rating = rng.choice(RATINGS, size, p=[0.05, 0.1, 0.1, 0.15, 0.25, 0.35])
+        moderated = rng.random(size) < 0.85
+        approved = np.where(moderated, rng.random(size) < 0.3 + rating * 0.12, -1)
+        delay = np.where(moderated, rng.lognormal(15, 2, size).astype(np.int64), -1)
+        length = np.minimum(rng.lognormal(4.5, 1, size).astype(np.int64) + 1, LENGTH_LIMIT)
+        created = start + rng.integers(0, span, size)
+        yield [
+            {"rating": r, "approved": a, "created": c, "delay": d, "length": n}
+            for r, a, c, d, n in zip(
+                rating.tolist(), approved.tolist(), created.tolist(), delay.tolist(), length.tolist()
+            )
+        ]
+
+
+class NaiveReport:
+    """Построчный подсчёт: списки задержек и длин растут вместе с историей"""
+
+    def __init__(self):
+        self.rows = 0
+        self.ratings = [0] * RATINGS
+        self.outcomes = [[0, 0] for _ in range(RATINGS)]
+        self.delays = []
+        self.lengths = []
+        self.hours = [0] * 24
+
+    def add(self, batch):
+        for row in batch:
+            self.rows += 1
+            self.ratings[row["rating"]] += 1
+            if row["approved"] >= 0:
+                self.outcomes[row["rating"]][row["approved"]] += 1
+                self.delays.append(min(max(row["delay"], 0) // 60_000, DELAY_LIMIT_MINUTES))
+            self.lengths.append(row["length"])
+            self.hours[row["created"] // 3_600_000 % 24] += 1
+
+    @staticmethod
+    def percentile(values, q):
+        """Наименьшее значение, до которого набирается q% — как utils.report.percentiles"""
+        return values[max(math.ceil(q / 100 * len(values)) - 1, 0)] if values else None
+
+    def check(self, report):
+        self.delays.sort()
+        self.lengths.sort()
+        assert report.total == self.rows
+        assert list(report.distribution.values()) == self.ratings
+        assert [report.moderated_by_rating[r] for r in range(RATINGS)] == [sum(o) for o in self.outcomes]
+        assert report.moderation_minutes == {q: self.percentile(self.delays, q) for q in (50, 90)}
+        assert report.length == {q: self.percentile(self.lengths, q) for q in (50, 90, 99)}
+        assert report.hours == self.hours
+
+
+def measure(counter, rows: int, batch_size: int, seed: int):
+    """(секунды на свёртку, пик памяти в МБ)"""
+    tracemalloc.start()
+    elapsed = 0.0
+    for batch in batches(rows, batch_size, seed):
+        started = time.perf_counter()
+        counter.add(batch)
+        elapsed += time.perf_counter() - started
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return elapsed, peak / 1024 / 1024
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--batch-size", type=int, default=10000)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--naive", action="store_true", help="сравнить с построчным подсчётом")
+    args = parser.parse_args()
+
+    builder = ReportBuilder()
+    elapsed, peak = measure(builder, args.rows, args.batch_size, args.seed)
+    started = time.perf_counter()
+    report = builder.result()
+    elapsed += time.perf_counter() - started
+    print(f"📑 {args.rows} строк пачками по {args.batch_size}")
+    print(f"numpy: {elapsed:.2f} с ({args.rows / elapsed:,.0f} строк/с), пик памяти {peak:.1f} МБ")
+    print(
+        f"   модерация: медиана {report.moderation_minutes[50]} мин, 90% — {report.moderation_minutes[90]} мин; "
+        f"длина: {report.length}"
+    )
+
+    if args.naive:
+        naive = NaiveReport()
+        naive_elapsed, naive_peak = measure(naive, args.rows, args.batch_size, args.seed)
+        naive.check(report)
+        print(f"naive: {naive_elapsed:.2f} с, пик памяти {naive_peak:.1f} МБ — результаты совпали")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,284 @@
+import asyncio
+import logging
+import multiprocessing
+import queue as queue_module
+import signal
+from contextlib import suppress
+from typing import List, Optional
+
+from aiogram import Bot, Dispatcher
+from aiogram.types import Update
+
+
+logger = logging.getLogger(__name__)
+
+
+def update_user_id(update: Update) -> Optional[int]:
+    """ID пользователя, от которого пришло обновление"""
+    try:
+        user = getattr(update.event, "from_user", None)
+    except Exception:
+        return None
+    return user.id if user else None
+
+
+class WorkerDied(RuntimeError):
+    """Процесс обработки обновлений падает снова и снова"""
+
+
+class UpdateDispatcher:
+    """Параллельная обработка обновлений с сохранением порядка для пользователя
+
+    Обновления раскладываются по воркерам по from_user.id: обновления одного
+    пользователя (текст отзыва → оценка) обрабатываются строго по очереди,
+    разные пользователи — параллельно. Очередь воркера ограничена, при её
+    заполнении submit() ждёт — это и есть обратное давление на источник.
+    """
+
+    def __init__(self, dp: Dispatcher, bot: Bot, workers: int = 8, queue_size: int = 100):
+        self.dp = dp
+        self.bot = bot
+        self.workers = workers
+        self.queue_size = queue_size
+        self._queues: List[asyncio.Queue] = []
+        self._tasks: List[asyncio.Task] = []
+
+    def partition(self, update: Update) -> int:
+        user_id = update_user_id(update)
+        return (user_id if user_id is not None else update.update_id) % self.workers
+
+    async def start(self):
+        self._queues = [asyncio.Queue(maxsize=self.queue_size) for _ in range(self.workers)]
+        self._tasks = [asyncio.create_task(self._worker(q)) for q in self._queues]
+
+    async def submit(self, update: Update):
+        await self._queues[self.partition(update)].put(update)
+
+    async def _worker(self, queue: asyncio.Queue):
+        while True:
+            update = await queue.get()
+            try:
+                await self.dp.feed_update(self.bot, update)
+            except Exception:
+                logger.exception(f"❌ Ошибка обработки обновления {update.update_id}")
+            finally:
+                queue.task_done()
+
+    async def stop(self, timeout: float = 10):
+        """Дообработка очередей (не дольше timeout) и остановка воркеров"""
+        if self._queues:
+            await asyncio.wait(
+                [asyncio.create_task(q.join()) for q in self._queues], timeout=timeout
+            )
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    async def run_polling(self, polling_timeout: int = 30):
+        """Long polling с передачей обновлений воркерам"""
+        offset = None
+        allowed_updates = self.dp.resolve_used_update_types()
+        backoff = 1.0
+
+        await self.dp.emit_startup(bot=self.bot)
+        try:
+            while True:
+                try:
+                    updates = await self.bot.get_updates(
+                        offset=offset,
+                        timeout=polling_timeout,
+                        allowed_updates=allowed_updates,
+                        request_timeout=polling_timeout + 10,
+                    )
+                except Exception as e:
+                    logger.warning(f"⚠️ Ошибка получения обновлений: {e}, повтор через {backoff:.0f} с")
+                    await asyncio.sleep(backoff)
+                    backoff = min(backoff * 2, 60)
+                    continue
+
+                backoff = 1.0
+                for update in updates:
+                    await self.submit(update)
+                    offset = update.update_id + 1
+        finally:
+            # Подтверждаем уже принятые обновления, иначе после рестарта Telegram пришлёт их снова
+            if offset is not None:
+                with suppress(Exception):
+                    await self.bot.get_updates(offset=offset, timeout=0, limit=1)
+            await self.dp.emit_shutdown(bot=self.bot)
+
+
+class ProcessUpdateDispatcher(UpdateDispatcher):
+    """Разбиение по пользователям между процессами
+
+    Каждый процесс поднимает своё подключение к MongoDB, бота и диспетчер
+    и внутри себя снова раскладывает обновления по воркерам-задачам.
+    Глобальный лимит исходящих сообщений делится между процессами.
+
+    Упавший процесс (OOM, исключение в цикле) перезапускается, а
+    обновления из его очереди переходят новому; после max_restarts
+    перезапусков одного процесса submit() поднимает WorkerDied.
+    """
+
+    # Период проверки процессов и шаг ожидания места в очереди, секунды
+    CHECK_INTERVAL = 1.0
+
+    def __init__(
+        self,
+        dp: Dispatcher,
+        bot: Bot,
+        processes: int,
+        workers: int = 8,
+        queue_size: int = 100,
+        max_restarts: int = 3,
+        target=None,
+    ):
+        super().__init__(dp, bot, workers=processes, queue_size=queue_size)
+        self.workers_per_process = workers
+        self.max_restarts = max_restarts
+        self.target = target or _process_main
+        self._processes: list = []
+        self._mp_queues: list = []
+        self._restarts: List[int] = []
+        self._context = multiprocessing.get_context("spawn")
+        self._global_rate = 0.0
+        self._watchdog: Optional[asyncio.Task] = None
+
+    def _spawn(self, n: int):
+        mp_queue = self._context.Queue(maxsize=self.queue_size)
+        process = self._context.Process(
+            target=self.target,
+            args=(mp_queue, self.workers_per_process, self.queue_size, self._global_rate),
+            daemon=True,
+        )
+        process.start()
+        self._mp_queues[n], self._processes[n] = mp_queue, process
+
+    async def start(self):
+        from config.settings import settings
+
+        self._global_rate = settings.SEND_GLOBAL_RATE / self.workers
+        self._mp_queues = [None] * self.workers
+        self._processes = [None] * self.workers
+        self._restarts = [0] * self.workers
+        for n in range(self.workers):
+            self._spawn(n)
+        self._watchdog = asyncio.create_task(self._watch())
+
+    def _ensure_alive(self, n: int):
+        """Перезапуск упавшего процесса n; необработанные обновления переходят новому"""
+        process = self._processes[n]
+        if process.is_alive():
+            return
+        if self._restarts[n] >= self.max_restarts:
+            raise WorkerDied(f"процесс обработки {n} упал {self._restarts[n] + 1} раз (код {process.exitcode})")
+        self._restarts[n] += 1
+        logger.error(f"💥 Процесс обработки {n} завершился с кодом {process.exitcode}, перезапуск")
+
+        old_queue = self._mp_queues[n]
+        self._spawn(n)
+        moved = 0
+        with suppress(queue_module.Empty, queue_module.Full):
+            while True:
+                self._mp_queues[n].put_nowait(old_queue.get_nowait())
+                moved += 1
+        if moved:
+            logger.info(f"↪️ {moved} обновлений из очереди процесса {n} переданы новому")
+        # Упавший процесс очередь уже не прочитает: не ждём её фоновый поток при выходе
+        old_queue.cancel_join_thread()
+        old_queue.close()
+
+    async def _watch(self):
+        reported = set()
+        while True:
+            await asyncio.sleep(self.CHECK_INTERVAL)
+            for n in range(self.workers):
+                try:
+                    self._ensure_alive(n)
+                except WorkerDied as e:
+                    if n not in reported:
+                        reported.add(n)
+                        logger.critical(f"❌ {e}")
+
+    async def _put(self, n: int, data, deadline: Optional[float] = None, respawn: bool = True) -> bool:
+        """Запись в очередь процесса n с проверкой, что он жив; False — не успели до deadline или процесс упал"""
+        loop = asyncio.get_running_loop()
+        while True:
+            if respawn:
+                self._ensure_alive(n)
+            elif not self._processes[n].is_alive():
+                return False
+            try:
+                self._mp_queues[n].put_nowait(data)
+                return True
+            except queue_module.Full:
+                pass
+            wait = self.CHECK_INTERVAL
+            if deadline is not None:
+                wait = min(wait, deadline - loop.time())
+                if wait <= 0:
+                    return False
+            # Очередь процесса заполнена — ждём, не блокируя цикл событий;
+            # ValueError — очередь закрыта при перезапуске процесса, пишем в новую
+            with suppress(queue_module.Full, ValueError):
+                await loop.run_in_executor(None, self._mp_queues[n].put, data, True, wait)
+                return True
+
+    async def submit(self, update: Update):
+        await self._put(self.partition(update), update.model_dump_json(by_alias=True, exclude_none=True))
+
+    async def stop(self, timeout: float = 10):
+        """Сигнал остановки каждому живому процессу и ожидание не дольше timeout, затем terminate/kill"""
+        if self._watchdog is not None:
+            self._watchdog.cancel()
+            await asyncio.gather(self._watchdog, return_exceptions=True)
+            self._watchdog = None
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + timeout
+        for n, process in enumerate(self._processes):
+            if process.is_alive() and not await self._put(n, None, deadline, respawn=False):
+                logger.warning(f"⚠️ Процесс обработки {n} не принял сигнал остановки")
+        for n, process in enumerate(self._processes):
+            await loop.run_in_executor(None, process.join, max(deadline - loop.time(), 0))
+            if process.is_alive():
+                logger.warning(f"⚠️ Процесс обработки {n} не остановился за {timeout:.0f} с, terminate")
+                process.terminate()
+                await loop.run_in_executor(None, process.join, 1)
+                if process.is_alive():
+                    process.kill()
+            self._mp_queues[n].cancel_join_thread()
+            self._mp_queues[n].close()
+        self._processes, self._mp_queues = [], []
+
+
+def _process_main(mp_queue, workers: int, queue_size: int, global_rate: float):
+    # Остановкой управляет родитель (None в очереди) — сигналы группы процессов игнорируем
+    signal.signal(signal.SIGTERM, signal.SIG_IGN)
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    asyncio.run(_process_loop(mp_queue, workers, queue_size, global_rate))
+
+
+async def _process_loop(mp_queue, workers: int, queue_size: int, global_rate: float):
+    from main import close_app, create_app, setup_logging
+    from bot.sender import sender
+
+    setup_logging()
+    bot, dp = await create_app()
+    sender.set_global_rate(global_rate)
+
+    dispatcher = UpdateDispatcher(dp, bot, workers=workers, queue_size=queue_size)
+    await dispatcher.start()
+    await dp.emit_startup(bot=bot)
+
+    loop = asyncio.get_running_loop()
+    try:
+        while True:
+            data = await loop.run_in_executor(None, mp_queue.get)
+            if data is None:
+                break
+            await dispatcher.submit(Update.model_validate_json(data, context={"bot": bot}))
+    finally:
+        await dispatcher.stop()
+        await dp.emit_shutdown(bot=bot)
+        await close_app(bot, dp)
@@ -0,0 +1,250 @@
+import asyncio
+import heapq
+import itertools
+import logging
+import random
+import time
+from contextvars import ContextVar
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from aiogram import Bot
+from aiogram.client.session.middlewares.base import BaseRequestMiddleware
+from aiogram.exceptions import TelegramNetworkError, TelegramRetryAfter, TelegramServerError
+from aiogram.methods import GetUpdates
+
+from config.settings import settings
+
+
+logger = logging.getLogger(__name__)
+
+# Приоритеты исходящих запросов: меньше — раньше.
+# Ответы пользователям идут вперёд фоновых уведомлений
+USER_PRIORITY = 0
+NOTIFY_PRIORITY = 1
+
+send_priority: ContextVar[int] = ContextVar("send_priority", default=USER_PRIORITY)
+
+MESSAGE_LIMIT = 4096
+
+
+class RateLimiter:
+    """Token bucket с резервированием: reserve() возвращает время ожидания"""
+
+    def __init__(self, rate: float, burst: float):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.updated = time.monotonic()
+
+    def reserve(self) -> float:
+        now = time.monotonic()
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        self.tokens -= 1
+        return 0.0 if self.tokens >= 0 else -self.tokens / self.rate
+
+    def is_idle(self, now: float) -> bool:
+        """Корзина успела бы наполниться — лимитер можно забыть"""
+        return self.tokens + (now - self.updated) * self.rate >= self.burst
+
+
+class OutboundScheduler(BaseRequestMiddleware):
+    """Планировщик исходящих запросов к Bot API
+
+    Подключается к сессии бота как request-middleware, поэтому через него
+    проходят все ответы хендлеров. Соблюдает глобальный и per-chat лимиты
+    Telegram, повторяет запросы после TelegramRetryAfter и сетевых ошибок,
+    пропускает ответы пользователям вперёд фоновых уведомлений
+    и склеивает всплески уведомлений о новых отзывах в дайджесты.
+    """
+
+    def __init__(
+        self,
+        global_rate: float = 30,
+        chat_rate: float = 1,
+        chat_burst: float = 3,
+        max_retries: int = 3,
+        digest_interval: float = 10,
+    ):
+        self.max_retries = max_retries
+        self.digest_interval = digest_interval
+        self._chat_rate = chat_rate
+        self._chat_burst = chat_burst
+        self._global = RateLimiter(global_rate, global_rate)
+        self._chats: Dict[int, RateLimiter] = {}
+        self._paused_until = 0.0
+        self._queue: List[tuple] = []
+        self._seq = itertools.count()
+        self._wakeup: Optional[asyncio.Event] = None
+        self._digests: Dict[int, List[str]] = {}
+        self._digest_window: Dict[int, float] = {}
+        self._sending: set = set()
+        self._tasks: List[asyncio.Task] = []
+        self._bot: Optional[Bot] = None
+
+    @property
+    def running(self) -> bool:
+        return bool(self._tasks)
+
+    def set_global_rate(self, rate: float):
+        """Смена глобального лимита (например, доля лимита на процесс)"""
+        self._global = RateLimiter(rate, rate)
+
+    async def start(self, bot: Bot):
+        """Запуск планировщика"""
+        self._bot = bot
+        self._wakeup = asyncio.Event()
+        self._tasks = [
+            asyncio.create_task(self._grant_loop()),
+            asyncio.create_task(self._digest_loop()),
+        ]
+
+    async def stop(self, timeout: float = 10):
+        """Отправка накопленных дайджестов и остановка"""
+        if not self.running:
+            return
+
+        for admin_id in list(self._digests):
+            self._flush_digest(admin_id)
+        if self._sending:
+            await asyncio.wait(self._sending, timeout=timeout)
+
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    async def __call__(self, make_request, bot, method):
+        chat_id = getattr(method, "chat_id", None)
+        if isinstance(method, GetUpdates):
+            return await make_request(bot, method)
+
+        if self.running and chat_id is not None:
+            await self._acquire(chat_id)
+
+        return await self._request(make_request, bot, method)
+
+    async def _acquire(self, chat_id):
+        """Ожидание очереди по приоритету, затем лимита чата"""
+        future = asyncio.get_running_loop().create_future()
+        heapq.heappush(self._queue, (send_priority.get(), next(self._seq), future))
+        self._wakeup.set()
+        await future
+
+        limiter = self._chats.get(chat_id)
+        if limiter is None:
+            limiter = self._chats[chat_id] = RateLimiter(self._chat_rate, self._chat_burst)
+        delay = limiter.reserve()
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+    async def _grant_loop(self):
+        """Выдача слотов глобального лимита в порядке приоритета"""
+        while True:
+            while not self._queue:
+                self._wakeup.clear()
+                await self._wakeup.wait()
+
+            delay = max(self._global.reserve(), self._paused_until - time.monotonic())
+            if delay > 0:
+                await asyncio.sleep(delay)
+
+            # За время ожидания мог прийти запрос с более высоким приоритетом
+            _, _, future = heapq.heappop(self._queue)
+            if not future.done():
+                future.set_result(None)
+
+    async def _request(self, make_request, bot, method):
+        """Запрос с повторами после flood control и сетевых ошибок"""
+        for attempt in range(self.max_retries + 1):
+            try:
+                return await make_request(bot, method)
+            except TelegramRetryAfter as e:
+                if attempt == self.max_retries:
+                    raise
+                # Flood control касается всего бота, поэтому притормаживаем всех
+                self._paused_until = max(self._paused_until, time.monotonic() + e.retry_after)
+                logger.warning(f"⏳ Flood control, пауза {e.retry_after} с")
+                await asyncio.sleep(e.retry_after)
+            except (TelegramNetworkError, TelegramServerError) as e:
+                if attempt == self.max_retries:
+                    raise
+                delay = min(2 ** attempt, 30) + random.random()
+                logger.warning(f"🔁 {type(method).__name__}: {e}, повтор через {delay:.1f} с")
+                await asyncio.sleep(delay)
+
+    def notify_admins(self, text: str, admin_ids: Iterable[int]):
+        """Уведомление администраторов без ожидания отправки
+
+        Первое уведомление уходит сразу, следующие в течение digest_interval
+        копятся и отправляются одним дайджестом.
+        """
+        now = time.monotonic()
+        for admin_id in admin_ids:
+            if self._digest_window.get(admin_id, 0) <= now and admin_id not in self._digests:
+                self._digest_window[admin_id] = now + self.digest_interval
+                self._spawn_notification(admin_id, text)
+            else:
+                self._digests.setdefault(admin_id, []).append(text)
+
+    def notify_many(self, messages: Iterable[Tuple[int, str]]):
+        """Пачка фоновых уведомлений (например, авторам после массовой модерации)"""
+        for chat_id, text in messages:
+            self._spawn_notification(chat_id, text)
+
+    def _flush_digest(self, admin_id: int):
+        texts = self._digests.pop(admin_id, None)
+        if not texts:
+            return
+
+        self._digest_window[admin_id] = time.monotonic() + self.digest_interval
+        if len(texts) == 1:
+            self._spawn_notification(admin_id, texts[0])
+            return
+
+        chunk = f"🔔 <b>Новых отзывов: {len(texts)}</b>"
+        for text in texts:
+            if len(chunk) + len(text) + 2 > MESSAGE_LIMIT:
+                self._spawn_notification(admin_id, chunk)
+                chunk = ""
+            chunk = f"{chunk}\n\n{text}" if chunk else text
+        self._spawn_notification(admin_id, chunk)
+
+    def _spawn_notification(self, chat_id: int, text: str):
+        if self._bot is None:
+            logger.warning("⚠️ Планировщик не запущен, уведомление пропущено")
+            return
+        task = asyncio.create_task(self._send_notification(chat_id, text))
+        self._sending.add(task)
+        task.add_done_callback(self._sending.discard)
+
+    async def _send_notification(self, chat_id: int, text: str):
+        send_priority.set(NOTIFY_PRIORITY)
+        try:
+            await self._bot.send_message(chat_id, text[:MESSAGE_LIMIT], parse_mode="HTML")
+        except Exception as e:
+            logger.warning(f"⚠️ Не удалось отправить уведомление в чат {chat_id}: {e}")
+
+    async def _digest_loop(self):
+        """Периодическая отправка дайджестов и очистка простаивающих лимитеров"""
+        while True:
+            await asyncio.sleep(1)
+            now = time.monotonic()
+            for admin_id in list(self._digests):
+                if self._digest_window.get(admin_id, 0) <= now:
+                    self._flush_digest(admin_id)
+
+            if len(self._chats) > 10000:
+                self._chats = {
+                    chat_id: limiter for chat_id, limiter in self._chats.items()
+                    if not limiter.is_idle(now)
+                }
+
+
+sender = OutboundScheduler(
+    global_rate=settings.SEND_GLOBAL_RATE,
+    chat_rate=settings.SEND_CHAT_RATE,
+    chat_burst=settings.SEND_CHAT_BURST,
+    max_retries=settings.SEND_MAX_RETRIES,
+    digest_interval=settings.ADMIN_DIGEST_INTERVAL,
+)
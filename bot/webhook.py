@@ -0,0 +1,80 @@
+import asyncio
+import logging
+import secrets
+from typing import Optional
+
+from aiogram.types import Update
+from aiohttp import web
+from pydantic import ValidationError
+
+from bot.dispatch import UpdateDispatcher
+from config.settings import settings
+
+
+logger = logging.getLogger(__name__)
+
+SECRET_HEADER = "X-Telegram-Bot-Api-Secret-Token"
+
+
+class WebhookHandler:
+    """Приём обновлений от Telegram
+
+    Отвечает 200 сразу после проверки секрета и передачи Update в
+    UpdateDispatcher, обработка идёт в воркерах. Очереди воркеров
+    ограничены: при переполнении ответ задерживается, и Telegram сам
+    сбавляет темп. Пока диспетчер не подключён (старт) или уже отключён
+    (остановка), отвечает 503 — Telegram повторит доставку позже.
+    """
+
+    def __init__(self, secret: str, dispatcher: Optional[UpdateDispatcher] = None):
+        self.secret = secret
+        self.dispatcher = dispatcher
+
+    def register(self, app: web.Application, path: str):
+        app.router.add_post(path, self.handle)
+
+    async def handle(self, request: web.Request) -> web.Response:
+        if not secrets.compare_digest(request.headers.get(SECRET_HEADER, ""), self.secret):
+            return web.Response(status=401)
+
+        dispatcher = self.dispatcher
+        if dispatcher is None:
+            return web.Response(status=503)
+
+        try:
+            update = Update.model_validate(
+                await request.json(), context={"bot": dispatcher.bot}
+            )
+        except (ValueError, ValidationError):
+            return web.Response(status=400)
+
+        await dispatcher.submit(update)
+        return web.Response()
+
+
+def setup_webhook(app: web.Application) -> WebhookHandler:
+    """Регистрация обработчика вебхука; диспетчер подключается к нему после старта"""
+    # Вебхук выставляется при каждом старте, поэтому случайный секрет подходит
+    secret = settings.WEBHOOK_SECRET or secrets.token_urlsafe(32)
+    handler = WebhookHandler(secret)
+    handler.register(app, settings.WEBHOOK_PATH)
+    return handler
+
+
+async def run_webhook(dispatcher: UpdateDispatcher, secret: str):
+    """Работа в режиме webhook (HTTP-сервер уже запущен)"""
+    dp, bot = dispatcher.dp, dispatcher.bot
+    await dp.emit_startup(bot=bot)
+    # Накопившиеся обновления не сбрасываем — Telegram доставит их на вебхук
+    await bot.set_webhook(
+        url=settings.WEBHOOK_URL.rstrip("/") + settings.WEBHOOK_PATH,
+        secret_token=secret,
+        allowed_updates=dp.resolve_used_update_types(),
+        drop_pending_updates=False,
+    )
+    logger.info(f"🌐 Webhook принимает обновления на {settings.WEBHOOK_PATH}")
+
+    try:
+        await asyncio.Event().wait()
+    finally:
+        await dp.emit_shutdown(bot=bot)
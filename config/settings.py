@@ -1,3 +1,4 @@
+from pydantic import model_validator
 from pydantic_settings import BaseSettings
 from typing import List
 
@@ -10,6 +11,121 @@ class Settings(BaseSettings):
     MONGODB_URI: str = ""
     ADMIN_IDS: str
     DB_NAME: str = "feedback_bot"
+    # Хранилище отзывов: mongo или memory (в памяти процесса — один инстанс, без сохранения)
+    STORAGE_BACKEND: str = "mongo"
+    VERIFY_INDEXES: bool = False
+    # Подключение при старте: таймаут попытки, число попыток и начальная пауза между ними
+    MONGO_CONNECT_TIMEOUT_MS: int = 5000
+    MONGO_CONNECT_ATTEMPTS: int = 5
+    MONGO_CONNECT_BACKOFF: float = 1
+    STATS_CACHE_TTL: float = 5.0
+    # Кэш «📊 Мои отзывы»: число пользователей и время жизни записи, секунды.
+    # Запись сверяется с версией отзывов пользователя в базе, так что изменения из других
+    # процессов и реплик видны сразу. Кэш у каждого процесса свой: при DISPATCH_MODE=processes
+    # метрики user_summary_cache_* отражают только основной процесс
+    USER_SUMMARY_CACHE_SIZE: int = 10000
+    USER_SUMMARY_CACHE_TTL: float = 60
+    PAGE_SIZE: int = 5
+    
+    # Групповая запись отзывов: копить до BATCH_MAX_DOCS штук или BATCH_WINDOW_MS мс
+    BATCH_WRITES: bool = False
+    BATCH_WINDOW_MS: float = 5
+    BATCH_MAX_DOCS: int = 100
+    
+    # Состав админов дополнительно из коллекции admins (роли moderator/viewer)
+    ADMINS_FROM_DB: bool = False
+    ADMINS_REFRESH_INTERVAL: float = 30
+    
+    # Режим получения обновлений: polling или webhook
+    BOT_MODE: str = "polling"
+    WEBHOOK_URL: str = ""
+    WEBHOOK_PATH: str = "/webhook"
+    WEBHOOK_SECRET: str = ""
+    WEBAPP_HOST: str = "0.0.0.0"
+    PORT: int = 8080
+    
+    # Метрики Prometheus на /metrics и лог операций дольше порога
+    METRICS_ENABLED: bool = True
+    SLOW_OP_THRESHOLD_MS: float = 500
+    
+    # /healthz и /readyz для платформы; срок дообработки обновлений при SIGTERM, секунды
+    HEALTH_ENABLED: bool = True
+    SHUTDOWN_TIMEOUT: float = 20
+    
+    # Обработка обновлений: воркеры-задачи (tasks) или процессы (processes)
+    DISPATCH_MODE: str = "tasks"
+    DISPATCH_WORKERS: int = 8
+    DISPATCH_PROCESSES: int = 2
+    DISPATCH_QUEUE_SIZE: int = 100
+    
+    # Ограничение частоты действий пользователей (в минуту / размер всплеска)
+    THROTTLE_ENABLED: bool = True
+    THROTTLE_STORAGE: str = "memory"
+    THROTTLE_MAX_USERS: int = 100000
+    THROTTLE_SUBMIT_PER_MINUTE: float = 2
+    THROTTLE_SUBMIT_BURST: int = 3
+    THROTTLE_READ_PER_MINUTE: float = 12
+    THROTTLE_READ_BURST: int = 5
+    THROTTLE_DEFAULT_PER_MINUTE: float = 60
+    THROTTLE_DEFAULT_BURST: int = 20
+    
+    # FSM-хранилище: memory или mongo; FSM_CACHE_TTL > 0 — кэш чтения на процесс,
+    # только для одной реплики (записи других реплик он не видит)
+    FSM_STORAGE: str = "memory"
+    FSM_CACHE_SIZE: int = 10000
+    FSM_CACHE_TTL: float = 0
+    FSM_FLUSH_DELAY: float = 0.05
+    FSM_STATE_TTL: int = 86400
+    
+    # Лимиты исходящих сообщений (Bot API: ~30 сообщений/с, ~1 сообщение/с в чат)
+    SEND_GLOBAL_RATE: float = 30
+    SEND_CHAT_RATE: float = 1
+    SEND_CHAT_BURST: int = 3
+    SEND_MAX_RETRIES: int = 3
+    ADMIN_DIGEST_INTERVAL: float = 10
+    
+    # Выгрузка /export: размер пачки курсора, одновременных выгрузок, порог сброса на диск (МБ)
+    EXPORT_BATCH_SIZE: int = 1000
+    EXPORT_MAX_CONCURRENT: int = 2
+    EXPORT_SPOOL_MB: int = 8
+    
+    # Отчёт /report: размер пачки строк из базы
+    REPORT_BATCH_SIZE: int = 10000
+    
+    # Поиск /search: mongo (текстовый индекс) или memory (обратный индекс в процессе)
+    SEARCH_BACKEND: str = "mongo"
+    
+    # Сколько минут отзывы из «📋 Новые отзывы» закреплены за администратором
+    MODERATION_LEASE_MINUTES: float = 10
+    
+    # Архив: перенос проверенных отзывов старше ARCHIVE_AFTER_DAYS пачками с паузой (с),
+    # проход раз в ARCHIVE_INTERVAL_MINUTES; ARCHIVE_TTL_DAYS > 0 — удалять архивные старше стольких дней
+    ARCHIVE_ENABLED: bool = False
+    ARCHIVE_AFTER_DAYS: float = 30
+    ARCHIVE_BATCH_SIZE: int = 500
+    ARCHIVE_BATCH_PAUSE: float = 1
+    ARCHIVE_INTERVAL_MINUTES: float = 60
+    ARCHIVE_TTL_DAYS: float = 0
+    
+    # Почти-дубликаты (MinHash): порог сходства, окно для всех авторов (ч) и для одного автора (дн.);
+    # отзывы короче DEDUP_MIN_LENGTH символов не сравниваются
+    DEDUP_ENABLED: bool = False
+    DEDUP_MIN_LENGTH: int = 40
+    DEDUP_SIMILARITY: float = 0.6
+    DEDUP_WINDOW_HOURS: float = 24
+    DEDUP_USER_WINDOW_DAYS: float = 30
+    
+    @model_validator(mode="after")
+    def check_bot_mode(self) -> "Settings":
+        """Режим webhook без адреса не запустится: проверяем до старта"""
+        if self.BOT_MODE not in ("polling", "webhook"):
+            raise ValueError(f"BOT_MODE должен быть polling или webhook, а не {self.BOT_MODE!r}")
+        if self.BOT_MODE == "webhook" and not self.WEBHOOK_URL.startswith("https://"):
+            raise ValueError(
+                "BOT_MODE=webhook требует WEBHOOK_URL — публичный https-адрес бота, "
+                f"сейчас {self.WEBHOOK_URL!r}"
+            )
+        return self
     
     @property
     def mongodb_connection_string(self) -> str:
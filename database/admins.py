@@ -0,0 +1,97 @@
+import asyncio
+import logging
+from typing import Dict, Iterable, Optional
+
+from pymongo.errors import OperationFailure, PyMongoError
+
+from config.settings import settings
+
+
+logger = logging.getLogger(__name__)
+
+ADMINS_COLLECTION = "admins"
+
+ROLE_VIEWER = "viewer"
+ROLE_MODERATOR = "moderator"
+ROLE_LEVELS = {ROLE_VIEWER: 1, ROLE_MODERATOR: 2}
+# Столько сбоев change stream подряд — и состав админов переходит на опрос
+WATCH_ATTEMPTS = 5
+
+
+class AdminRoster:
+    """Состав администраторов с ролями
+
+    ID из ADMIN_IDS разбираются один раз и всегда имеют роль модератора.
+    Дополнительно состав можно хранить в коллекции admins
+    ({"_id": user_id, "role": "moderator" | "viewer"}): он перечитывается
+    при изменениях (change stream) или периодически, без перезапуска.
+    """
+    
+    def __init__(self, static_ids: Iterable[int]):
+        self._static: Dict[int, str] = {user_id: ROLE_MODERATOR for user_id in static_ids}
+        self._roles: Dict[int, str] = dict(self._static)
+        self.ids = frozenset(self._roles)
+        self._task: Optional[asyncio.Task] = None
+    
+    def role(self, user_id: int) -> Optional[str]:
+        return self._roles.get(user_id)
+    
+    def allows(self, user_id: int, role: str = ROLE_VIEWER) -> bool:
+        """Есть ли у пользователя роль не ниже указанной"""
+        return ROLE_LEVELS.get(self._roles.get(user_id), 0) >= ROLE_LEVELS[role]
+    
+    async def load(self, database):
+        """Перечитать состав из коллекции admins"""
+        roles = dict(self._static)
+        async for doc in database[ADMINS_COLLECTION].find({}, {"role": 1}):
+            if doc.get("role") in ROLE_LEVELS:
+                roles.setdefault(doc["_id"], doc["role"])
+        
+        # Подмена целиком — читатели никогда не видят полуобновлённый состав
+        self._roles = roles
+        self.ids = frozenset(roles)
+    
+    def start(self, database, interval: float = 30):
+        """Фоновое обновление состава"""
+        self._task = asyncio.create_task(self._watch(database, interval))
+    
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+    
+    async def _watch(self, database, interval: float):
+        """Change stream с повторами при сбоях сети и выборов primary; без него — опрос раз в interval"""
+        failures = 0
+        while failures < WATCH_ATTEMPTS:
+            try:
+                await self.load(database)
+                async with database[ADMINS_COLLECTION].watch() as stream:
+                    failures = 0
+                    async for _ in stream:
+                        await self.load(database)
+            except OperationFailure as e:
+                # Change streams есть только в replica set — опрашиваем коллекцию
+                logger.info(f"👮 Change streams недоступны ({e}), состав админов обновляется раз в {interval:.0f} с")
+                break
+            except PyMongoError as e:
+                failures += 1
+                delay = min(2 ** (failures - 1), interval)
+                logger.warning(
+                    f"⚠️ Слежение за составом админов прервано ({type(e).__name__}: {e}), "
+                    f"попытка {failures}/{WATCH_ATTEMPTS}, повтор через {delay:.0f} с"
+                )
+                await asyncio.sleep(delay)
+        else:
+            logger.warning(f"⚠️ Change stream недоступен, состав админов обновляется раз в {interval:.0f} с")
+        
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                await self.load(database)
+            except PyMongoError as e:
+                logger.warning(f"⚠️ Не удалось обновить состав админов: {e}")
+
+
+roster = AdminRoster(settings.admin_ids_list)
@@ -0,0 +1,172 @@
+import asyncio
+import heapq
+import logging
+from collections import Counter
+from datetime import datetime, timedelta
+from typing import AsyncIterator, Dict, Iterable, List, Optional, Tuple
+
+from bson import ObjectId
+from pymongo import UpdateOne
+from pymongo.errors import PyMongoError
+
+
+logger = logging.getLogger(__name__)
+
+ARCHIVE_COLLECTION = "feedback_archive"
+# Число архивных отзывов пользователя: {"_id": user_id, "archived": n}
+ARCHIVE_USERS_COLLECTION = "feedback_archive_users"
+# Метка пачки реплики, упавшей посреди переноса, через столько считается брошенной
+STALE_BATCH = timedelta(hours=1)
+# Служебные поля оперативной коллекции, в архив не переносятся
+HOT_ONLY_FIELDS = ("archive_batch", "moderation_batch", "minhash", "lsh_bands")
+# Что нужно, чтобы списать удаляемый архивный отзыв из счётчиков и корзин
+PURGE_PROJECTION = {"user_id": 1, "created_at": 1, "rating": 1, "is_approved": 1}
+
+
+def archivable(older_than: datetime) -> dict:
+    """Отзывы, проверенные раньше older_than"""
+    return {"is_moderated": True, "moderated_at": {"$lt": older_than}}
+
+
+def unbatched(token: ObjectId) -> dict:
+    """Документ не захвачен пачкой или метка пачки старше STALE_BATCH относительно token"""
+    stale = ObjectId.from_datetime(token.generation_time - STALE_BATCH)
+    return {"$or": [{"archive_batch": {"$exists": False}}, {"archive_batch": {"$lt": stale}}]}
+
+
+async def claim_batch(
+    collection, query: dict, batch_size: int, projection: Optional[dict] = None
+) -> Tuple[ObjectId, List[dict]]:
+    """Захват до batch_size документов под условием меткой archive_batch
+
+    Переносить могут несколько реплик сразу: каждый документ достаётся
+    одной метке, и только её владелец его удалит и учтёт в счётчиках.
+    """
+    token = ObjectId()
+    free = unbatched(token)
+    ids = [doc["_id"] async for doc in collection.find({**query, **free}, {"_id": 1}).limit(batch_size)]
+    if not ids:
+        return token, []
+    await collection.update_many({"_id": {"$in": ids}, **free}, {"$set": {"archive_batch": token}})
+    docs = await collection.find({"archive_batch": token}, projection).to_list(length=len(ids))
+    return token, docs
+
+
+def archived(doc: dict, archived_at: datetime) -> dict:
+    """Документ для архива: без служебных полей, с моментом переноса"""
+    doc = {field: value for field, value in doc.items() if field not in HOT_ONLY_FIELDS}
+    doc["archived_at"] = archived_at
+    return doc
+
+
+def count_updates(docs: Iterable[dict], sign: int = 1) -> List[UpdateOne]:
+    """Операции bulk_write для числа архивных отзывов пользователей"""
+    counts = Counter(doc["user_id"] for doc in docs)
+    return [
+        UpdateOne({"_id": user_id}, {"$inc": {"archived": sign * n}}, upsert=True)
+        for user_id, n in counts.items()
+    ]
+
+
+async def rebuild_archive_counts(database):
+    """Пересчёт числа архивных отзывов пользователей одним $group + $merge"""
+    rebuilt_at = datetime.now()
+    await database[ARCHIVE_COLLECTION].aggregate([
+        {"$group": {"_id": "$user_id", "archived": {"$sum": 1}}},
+        {"$set": {"rebuilt_at": rebuilt_at}},
+        {"$merge": {"into": ARCHIVE_USERS_COLLECTION, "whenMatched": "replace", "whenNotMatched": "insert"}},
+    ]).to_list(length=None)
+    await database[ARCHIVE_USERS_COLLECTION].delete_many({"rebuilt_at": {"$lt": rebuilt_at}})
+
+
+async def merge_sorted(cursors: List, key, batch_size: int) -> AsyncIterator[List[dict]]:
+    """Пачки из нескольких уже отсортированных курсоров в общем порядке key"""
+    heads = []
+    for n, cursor in enumerate(cursors):
+        doc = await anext(cursor, None)
+        if doc is not None:
+            heads.append((key(doc), n, doc))
+    heapq.heapify(heads)
+
+    batch = []
+    while heads:
+        _, n, doc = heads[0]
+        batch.append(doc)
+        following = await anext(cursors[n], None)
+        if following is None:
+            heapq.heappop(heads)
+        else:
+            heapq.heapreplace(heads, (key(following), n, following))
+        if len(batch) == batch_size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+class FeedbackArchiver:
+    """Фоновый перенос проверенных отзывов в архив
+
+    Раз в interval секунд переносит отзывы, проверенные больше after
+    назад, пачками по batch_size с паузой pause между пачками — чтобы
+    не отнимать у хендлеров диск и пул соединений. С ttl архивные отзывы,
+    созданные раньше ttl назад, удаляются так же, пачками.
+    """
+
+    def __init__(
+        self,
+        database,
+        after: timedelta,
+        batch_size: int = 500,
+        pause: float = 1,
+        interval: float = 3600,
+        ttl: Optional[timedelta] = None,
+    ):
+        self.database = database
+        self.after = after
+        self.batch_size = batch_size
+        self.pause = pause
+        self.interval = interval
+        self.ttl = ttl
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self):
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+    async def _drain(self, step) -> int:
+        """Пачки до первой неполной; step — одна пачка, возвращает её размер"""
+        total = 0
+        while True:
+            done = await step(self.batch_size)
+            total += done
+            if done < self.batch_size:
+                return total
+            await asyncio.sleep(self.pause)
+
+    async def run_once(self) -> Dict[str, int]:
+        """Один проход: перенос и, если задан срок хранения, удаление"""
+        now = datetime.now()
+        result = {"archived": await self._drain(
+            lambda size: self.database.archive_feedback(now - self.after, size)
+        )}
+        if self.ttl is not None:
+            result["purged"] = await self._drain(
+                lambda size: self.database.purge_archive(now - self.ttl, size)
+            )
+        return result
+
+    async def _run(self):
+        while True:
+            try:
+                result = await self.run_once()
+                if any(result.values()):
+                    logger.info(f"🗄 Архив: перенесено {result['archived']}, удалено {result.get('purged', 0)}")
+            except PyMongoError as e:
+                logger.warning(f"⚠️ Перенос в архив не удался: {e}")
+            await asyncio.sleep(self.interval)
@@ -0,0 +1,143 @@
+from abc import ABC, abstractmethod
+from datetime import datetime
+from typing import AsyncIterator, List, Optional, Tuple
+
+from database.models import BulkModeration, FeedbackModel, UserSummary
+from database.pagination import Page, PageCursor
+from database.records import SummaryRow
+from utils.filters import FeedbackFilter
+
+
+class Storage(ABC):
+    """Хранилище отзывов: всё, чем пользуются хендлеры, бот и фоновые задачи
+
+    Реализации — Database (MongoDB через Motor) и MemoryDatabase (в памяти
+    процесса); какая используется, решает STORAGE_BACKEND.
+    """
+
+    @abstractmethod
+    async def connect(self):
+        """Подготовка к работе (подключение, миграции)"""
+
+    @abstractmethod
+    async def ping(self):
+        """Проверка доступности (для /readyz)"""
+
+    @abstractmethod
+    async def flush(self):
+        """Запись отложенного перед остановкой"""
+
+    @abstractmethod
+    async def disconnect(self):
+        """Освобождение ресурсов"""
+
+    @abstractmethod
+    async def create_feedback(self, feedback: FeedbackModel) -> dict:
+        """Запись отзыва; возвращает документ со строковым _id"""
+
+    @abstractmethod
+    async def get_feedback_page(
+        self,
+        cursor: Optional[PageCursor] = None,
+        backward: bool = False,
+        page_size: Optional[int] = None,
+    ) -> Page:
+        """Страница отзывов (новые сверху) после/до курсора"""
+
+    @abstractmethod
+    async def claim_feedback(self, admin_id: int, count: Optional[int] = None) -> Page:
+        """Очередь модерации: ожидающие отзывы, закреплённые за администратором"""
+
+    @abstractmethod
+    async def approve_feedback(
+        self, feedback_id: str, admin_comment: str = None, admin_id: Optional[int] = None
+    ) -> Optional[dict]:
+        """Одобрение отзыва вместе с его кластером (в ключе "cluster")
+
+        Возвращает отзыв до модерации или None, если его нет; с admin_id
+        отзыв, закреплённый за другим администратором, не меняется —
+        поднимается LeaseConflict.
+        """
+
+    @abstractmethod
+    async def reject_feedback(
+        self, feedback_id: str, admin_comment: str = None, admin_id: Optional[int] = None
+    ) -> Optional[dict]:
+        """Отклонение отзыва вместе с его кластером — как approve_feedback"""
+
+    @abstractmethod
+    async def bulk_moderate(
+        self, feedback_ids: List[str], approved: bool, admin_id: Optional[int] = None
+    ) -> BulkModeration:
+        """Модерация выбранных отзывов вместе с их кластерами"""
+
+    @abstractmethod
+    async def moderate_by_rule(
+        self,
+        approved: bool,
+        min_rating: int = 1,
+        max_rating: int = 5,
+        older_than: Optional[datetime] = None,
+        admin_id: Optional[int] = None,
+    ) -> BulkModeration:
+        """Модерация ожидающих отзывов с оценкой в диапазоне, созданных раньше older_than"""
+
+    @abstractmethod
+    async def get_feedback_version(self) -> int:
+        """Версия отзывов: растёт при каждой записи, модерации, переносе в архив и удалении"""
+
+    @abstractmethod
+    async def get_feedback_stats(self) -> dict:
+        """Счётчики: всего, проверено, одобрено, отклонено, ожидает"""
+
+    @abstractmethod
+    async def rebuild_feedback_stats(self) -> dict:
+        """Пересчёт счётчиков по всем отзывам (сверка)"""
+
+    @abstractmethod
+    async def get_feedback_trends(self) -> dict:
+        """Средние оценки за 7/30/90 дней и динамика за неделю"""
+
+    @abstractmethod
+    async def rebuild_feedback_rollups(self):
+        """Пересчёт дневных корзин"""
+
+    @abstractmethod
+    def iter_feedback_batches(
+        self,
+        query: dict,
+        projection: Optional[dict] = None,
+        batch_size: int = 1000,
+        include_archive: bool = False,
+    ) -> AsyncIterator[List[dict]]:
+        """Отзывы под условием пачками в порядке создания (для выгрузок)"""
+
+    @abstractmethod
+    def iter_report_batches(self, batch_size: int = 10000) -> AsyncIterator[List[dict]]:
+        """Строки отчёта (REPORT_FIELDS) по всей истории, с архивом, пачками"""
+
+    @abstractmethod
+    async def archive_feedback(self, older_than: datetime, batch_size: int = 500) -> int:
+        """Перенос пачки отзывов, проверенных раньше older_than, в архив"""
+
+    @abstractmethod
+    async def purge_archive(self, created_before: datetime, batch_size: int = 500) -> int:
+        """Удаление пачки архивных отзывов, созданных раньше created_before"""
+
+    @abstractmethod
+    async def search_feedback(
+        self,
+        text: str,
+        feedback_filter: FeedbackFilter = FeedbackFilter(),
+        offset: int = 0,
+        page_size: Optional[int] = None,
+    ) -> Page:
+        """Страница результатов поиска по тексту, от самых релевантных"""
+
+    @abstractmethod
+    async def get_user_summary(self, user_id: int) -> UserSummary:
+        """Число отзывов пользователя и первая страница (для «Мои отзывы»)"""
+
+    @abstractmethod
+    async def get_user_history(self, user_id: int, offset: int = 0) -> Tuple[UserSummary, List[SummaryRow]]:
+        """Сводка и страница отзывов пользователя начиная с offset"""
@@ -1,16 +1,66 @@
+import asyncio
 from motor.motor_asyncio import AsyncIOMotorClient
-from typing import Optional
+from pymongo import ReplaceOne, ReturnDocument, UpdateOne
+from pymongo.errors import BulkWriteError, ConnectionFailure
+from bson import ObjectId
+from typing import AsyncIterator, List, Optional, Tuple
 from config.settings import settings
-from database.models import FeedbackModel
-from datetime import datetime
+from database.base import Storage
+from database.models import BulkModeration, FeedbackModel, UserSummary
+from database.records import ROW_PROJECTION, SUMMARY_PROJECTION, FeedbackRow, SummaryRow
+from database.indexes import QueryShape, apply_migrations, query_shapes, verify_indexes
+from database.writer import BatchWriter
+from database.pagination import Page, PageCursor, keyset_filter
+from database.stats import (
+    FEEDBACK_STATS_ID, STATS_COLLECTION, STATS_FIELDS,
+    rebuild_feedback_stats, removal_delta, transition_delta,
+)
+from database.archive import (
+    ARCHIVE_COLLECTION, ARCHIVE_USERS_COLLECTION, PURGE_PROJECTION,
+    archivable, archived, claim_batch, count_updates, merge_sorted, unbatched,
+)
+from database.report import REPORT_PIPELINE
+from database.leases import LEASE_FIELDS, LeaseConflict, held_by, lease_condition, unclaimed
+from database.dedup import DEDUP_CANDIDATES, DEDUP_PROJECTION, candidate_query, fingerprint, pick_cluster
+from database.rollups import (
+    ROLLUP_COLLECTION, TREND_WINDOWS, creation_deltas, day_key, moderation_deltas,
+    rebuild_feedback_rollups, removal_deltas, rollup_updates, summarize_trends,
+)
+from utils.cache import TTLCache
+from utils.filters import FeedbackFilter
+from utils.search import InvertedIndex
+from utils.metrics import Gauge, MongoCommandTimer, registry
+from datetime import datetime, timedelta
 
 
-class Database:
+# Версия отзывов пользователя: {"_id": user_id, "version": n}. Растёт при каждой записи,
+# модерации, переносе и удалении его отзывов — любым процессом или репликой
+USER_VERSIONS_COLLECTION = "feedback_user_versions"
+# Документ той же коллекции с версией всех отзывов — по ней кэшируется /report
+FEEDBACK_VERSION_ID = "feedback"
+# Очередь модерации: почти-дубликаты модерируются вместе с головой кластера
+_PENDING = {"is_moderated": False, "is_duplicate": {"$ne": True}}
+_NEWEST = [("created_at", -1), ("_id", -1)]
+_OLDEST = [("created_at", 1), ("_id", 1)]
+# Образцы значений для форм запросов (@query_shapes)
+_AT = datetime(2024, 1, 1)
+_ID = ObjectId.from_datetime(_AT)
+
+
+class Database(Storage):
     """Класс для работы с базой данных"""
     
     def __init__(self):
         self.client: Optional[AsyncIOMotorClient] = None
         self.db = None
+        self._stats_cache = TTLCache(maxsize=1, ttl=settings.STATS_CACHE_TTL)
+        self._writer: Optional[BatchWriter] = None
+        self._search_index: Optional[InvertedIndex] = None
+        # Сводки «Мои отзывы» по (user_id, версия): после любого изменения отзывов
+        # пользователя версия в базе другая, и старая запись больше не читается
+        self._summary_cache = TTLCache(
+            maxsize=settings.USER_SUMMARY_CACHE_SIZE, ttl=settings.USER_SUMMARY_CACHE_TTL
+        )
     
     async def connect(self):
         """Подключение к MongoDB"""
@@ -21,14 +71,51 @@ class Database:
         
         self.client = AsyncIOMotorClient(
             uri,
-            serverSelectionTimeoutMS=10000,
-            connectTimeoutMS=10000,
+            serverSelectionTimeoutMS=settings.MONGO_CONNECT_TIMEOUT_MS,
+            connectTimeoutMS=settings.MONGO_CONNECT_TIMEOUT_MS,
+            event_listeners=[MongoCommandTimer()],
         )
         
-        # Проверка подключения
-        await self.client.admin.command('ping')
+        # Проверка подключения; кратковременная недоступность при старте — не повод падать
+        for attempt in range(1, settings.MONGO_CONNECT_ATTEMPTS + 1):
+            try:
+                await self.ping()
+                break
+            except ConnectionFailure as e:
+                if attempt == settings.MONGO_CONNECT_ATTEMPTS:
+                    raise
+                delay = min(settings.MONGO_CONNECT_BACKOFF * 2 ** (attempt - 1), 30)
+                print(f"⚠️ MongoDB недоступен ({type(e).__name__}), попытка {attempt}, повтор через {delay:.0f} с")
+                await asyncio.sleep(delay)
         self.db = self.client[settings.DB_NAME]
         print(f"✅ Подключено к MongoDB: {settings.DB_NAME}")
+        
+        # Индексы и миграции схемы
+        version = await apply_migrations(self.db)
+        print(f"🧱 Версия схемы: {version}")
+        if settings.VERIFY_INDEXES:
+            await verify_indexes(self.db)
+        
+        # Групповая запись отзывов для всплесков нагрузки
+        if settings.BATCH_WRITES:
+            self._writer = BatchWriter(
+                lambda: self.db.feedback,
+                on_inserted=self._on_feedback_inserted,
+                window=settings.BATCH_WINDOW_MS / 1000,
+                max_docs=settings.BATCH_MAX_DOCS,
+            )
+        
+        if settings.SEARCH_BACKEND == "memory":
+            await self._build_search_index()
+    
+    async def ping(self):
+        """Проверка доступности сервера"""
+        await self.client.admin.command('ping')
+    
+    async def flush(self):
+        """Запись отзывов, ожидающих групповой записи"""
+        if self._writer:
+            await self._writer.close()
     
     async def disconnect(self):
         """Отключение от MongoDB"""
@@ -40,84 +127,580 @@ class Database:
         """Создание нового отзыва"""
         collection = self.db.feedback
         doc = feedback.model_dump()
-        result = await collection.insert_one(doc)
-        doc["_id"] = str(result.inserted_id)
-        return doc
+        if settings.DEDUP_ENABLED and len(doc["message"]) >= settings.DEDUP_MIN_LENGTH:
+            doc.update(await asyncio.to_thread(fingerprint, doc["message"]))
+            await self._assign_cluster(doc)
+        if self._writer:
+            inserted_id = await self._writer.insert(doc)
+        else:
+            result = await collection.insert_one(doc)
+            inserted_id = result.inserted_id
+            await self._on_feedback_inserted([doc])
+        return {**doc, "_id": str(inserted_id)}
     
-    async def get_all_feedback(self, limit: int = 50):
-        """Получение всех отзывов"""
-        collection = self.db.feedback
-        cursor = collection.find().sort("created_at", -1).limit(limit)
-        results = await cursor.to_list(length=limit)
-        # Конвертируем ObjectId в строку
-        for doc in results:
-            doc["_id"] = str(doc["_id"])
-        return results
-    
-    async def get_pending_feedback(self):
-        """Получение отзывов на модерации"""
+    @query_shapes(QueryShape(
+        "_assign_cluster", "feedback",
+        candidate_query({"lsh_bands": [1, 65537], "created_at": _AT}, timedelta(hours=1), timedelta(days=7)),
+    ))
+    async def _assign_cluster(self, doc: dict):
+        """Отнесение нового отзыва к кластеру ожидающего почти-дубликата"""
+        window = timedelta(hours=settings.DEDUP_WINDOW_HOURS)
+        user_window = timedelta(days=settings.DEDUP_USER_WINDOW_DAYS)
+        candidates = await self.db.feedback.find(
+            candidate_query(doc, window, user_window), DEDUP_PROJECTION
+        ).limit(DEDUP_CANDIDATES).to_list(length=DEDUP_CANDIDATES)
+        
+        cluster_id = pick_cluster(doc, candidates, settings.DEDUP_SIMILARITY, window)
+        if cluster_id is None:
+            return
+        # Голова могла быть проверена, пока шёл поиск, — тогда отзыв остаётся самостоятельным
+        result = await self.db.feedback.update_one(
+            {"_id": cluster_id, "is_moderated": False}, {"$inc": {"duplicates": 1}}
+        )
+        if result.modified_count:
+            doc["cluster_id"] = cluster_id
+            doc["is_duplicate"] = True
+    
+    async def _on_feedback_inserted(self, docs: list):
+        """Учёт записанных отзывов в счётчиках и дневных корзинах"""
+        await self._inc_stats({"total": len(docs), "pending": len(docs)})
+        await self._inc_rollups(creation_deltas(docs))
+        await self._touch_users(doc["user_id"] for doc in docs)
+        if self._search_index is not None:
+            for doc in docs:
+                self._index_feedback(doc)
+        await self._settle_duplicates(docs)
+    
+    @query_shapes(
+        QueryShape("_settle_duplicates", "feedback", {"_id": {"$in": [_ID]}, "is_moderated": True}),
+        QueryShape("_settle_duplicates(moderate)", "feedback", {"_id": {"$in": [_ID]}, "is_moderated": False}),
+    )
+    async def _settle_duplicates(self, docs: list):
+        """Итог головы для почти-дубликатов, чья голова проверена между поиском и записью
+
+        Модерация головы закрывает только уже записанные отзывы кластера —
+        без этого дубликат остался бы скрытым из очереди навсегда.
+        """
+        duplicates = [doc for doc in docs if doc.get("is_duplicate")]
+        if not duplicates:
+            return
+        heads = await self.db.feedback.find(
+            {"_id": {"$in": list({doc["cluster_id"] for doc in duplicates})}, "is_moderated": True},
+            {"is_approved": 1, "admin_comment": 1}
+        ).to_list(length=None)
+        for head in heads:
+            members = [doc for doc in duplicates if doc["cluster_id"] == head["_id"]]
+            applied = await self._moderate_many(
+                {"_id": {"$in": [doc["_id"] for doc in members]}}, head["is_approved"], head.get("admin_comment")
+            )
+            applied_ids = {doc["_id"] for doc in applied}
+            for doc in members:
+                if doc["_id"] in applied_ids:
+                    doc.update(is_moderated=True, is_approved=head["is_approved"], admin_comment=head.get("admin_comment"))
+    
+    @query_shapes()
+    async def _touch_users(self, user_ids):
+        """Новая версия отзывов пользователей и всех отзывов — их кэши во всех процессах устарели"""
+        updates = [
+            UpdateOne({"_id": user_id}, {"$inc": {"version": 1}}, upsert=True) for user_id in set(user_ids)
+        ]
+        if not updates:
+            return
+        updates.append(UpdateOne({"_id": FEEDBACK_VERSION_ID}, {"$inc": {"version": 1}}, upsert=True))
+        try:
+            await self.db[USER_VERSIONS_COLLECTION].bulk_write(updates, ordered=False)
+        except BulkWriteError:
+            # Параллельный upsert уже создал документ пользователя — повторяем по существующим
+            await self.db[USER_VERSIONS_COLLECTION].bulk_write(updates, ordered=False)
+    
+    @query_shapes()
+    async def _inc_stats(self, delta: dict):
+        """Атомарное изменение счётчиков статистики"""
+        if not delta:
+            return
+        await self.db[STATS_COLLECTION].update_one(
+            {"_id": FEEDBACK_STATS_ID},
+            {"$inc": delta},
+            upsert=True
+        )
+        self._stats_cache.invalidate()
+    
+    async def _inc_rollups(self, deltas: dict):
+        """Изменение дневных корзин одним bulk_write"""
+        updates = rollup_updates(deltas)
+        if updates:
+            await self.db[ROLLUP_COLLECTION].bulk_write(updates, ordered=False)
+    
+    @query_shapes(
+        QueryShape("get_feedback_page", "feedback", {}, _NEWEST),
+        QueryShape("get_feedback_page(cursor)", "feedback", keyset_filter({}, PageCursor(_AT, _ID)), _NEWEST),
+        QueryShape(
+            "get_feedback_page(cursor, backward)", "feedback",
+            keyset_filter({}, PageCursor(_AT, _ID), backward=True), _OLDEST,
+        ),
+    )
+    async def get_feedback_page(
+        self,
+        cursor: Optional[PageCursor] = None,
+        backward: bool = False,
+        page_size: Optional[int] = None,
+    ) -> Page:
+        """Страница отзывов (новые сверху) после/до курсора"""
+        page_size = page_size or settings.PAGE_SIZE
+        direction = 1 if backward else -1
+        
+        found = self.db.feedback.find(keyset_filter({}, cursor, backward), ROW_PROJECTION).sort(
+            [("created_at", direction), ("_id", direction)]
+        ).limit(page_size + 1)
+        docs = await found.to_list(length=page_size + 1)
+        
+        has_more = len(docs) > page_size
+        results = [FeedbackRow.from_doc(doc) for doc in docs[:page_size]]
+        if backward:
+            results.reverse()
+        
+        if backward:
+            return Page(results, has_prev=has_more, has_next=True)
+        return Page(results, has_prev=cursor is not None, has_next=has_more)
+    
+    @query_shapes(
+        QueryShape("claim_feedback", "feedback", {**_PENDING, **unclaimed(_AT)}, _OLDEST),
+        QueryShape("claim_feedback(held)", "feedback", {**held_by(0, _AT), "is_moderated": False}, _OLDEST),
+    )
+    async def claim_feedback(self, admin_id: int, count: Optional[int] = None) -> Page:
+        """Очередь модерации: ожидающие отзывы, закреплённые за администратором
+
+        Свои ещё не истёкшие аренды продлеваются и показываются снова,
+        остальное добирается из свободных отзывов (старые первыми) —
+        каждый захват атомарен, двум администраторам один отзыв не достанется.
+        """
+        count = count or settings.PAGE_SIZE
         collection = self.db.feedback
-        cursor = collection.find({"is_moderated": False}).sort("created_at", -1)
-        results = await cursor.to_list(length=100)
-        # Конвертируем ObjectId в строку для каждого документа
-        for doc in results:
-            doc["_id"] = str(doc["_id"])
-        return results
-    
-    async def approve_feedback(self, feedback_id: str, admin_comment: str = None):
-        """Одобрение отзыва"""
-        from bson import ObjectId
+        now = datetime.now()
+        until = now + timedelta(minutes=settings.MODERATION_LEASE_MINUTES)
+        
+        await collection.update_many(
+            {**held_by(admin_id, now), "is_moderated": False}, {"$set": {"lease_until": until}}
+        )
+        held = await collection.find(
+            {**held_by(admin_id, now), "is_moderated": False}, ROW_PROJECTION
+        ).sort(_OLDEST).limit(count).to_list(length=count)
+        
+        claimed = await asyncio.gather(*(
+            collection.find_one_and_update(
+                {**_PENDING, **unclaimed(now)},
+                {"$set": {"lease_owner": admin_id, "lease_until": until}},
+                projection=ROW_PROJECTION,
+                sort=_OLDEST,
+                return_document=ReturnDocument.AFTER,
+            )
+            for _ in range(count - len(held))
+        ))
+        docs = held + [doc for doc in claimed if doc is not None]
+        docs.sort(key=lambda doc: (doc["created_at"], doc["_id"]))
+        return Page([FeedbackRow.from_doc(doc) for doc in docs], has_prev=False, has_next=False)
+    
+    @query_shapes(
+        QueryShape("_moderate_feedback(cluster)", "feedback", {"cluster_id": _ID, "is_moderated": False}),
+    )
+    async def _moderate_feedback(
+        self, feedback_id: str, approved: bool, admin_comment: str = None, admin_id: Optional[int] = None
+    ) -> Optional[dict]:
+        """Модерация отзыва с учётом перехода в счётчиках
+
+        С admin_id отзыв, закреплённый за другим администратором, не меняется —
+        поднимается LeaseConflict. Вместе с головой кластера модерируются её
+        ожидающие почти-дубликаты — они возвращаются в ключе "cluster".
+        """
         collection = self.db.feedback
-        await collection.update_one(
-            {"_id": ObjectId(feedback_id)},
+        now = datetime.now()
+        # Отзыв, который прямо сейчас переносится в архив, не меняется — иначе правка потерялась бы
+        before = await collection.find_one_and_update(
+            {"_id": ObjectId(feedback_id), "archive_batch": {"$exists": False}, **lease_condition(admin_id, now)},
             {"$set": {
                 "is_moderated": True,
-                "is_approved": True,
+                "is_approved": approved,
                 "admin_comment": admin_comment,
-                "moderated_at": datetime.now()
-            }}
+                "moderated_at": now
+            }, "$unset": LEASE_FIELDS},
+            projection={"user_id": 1, "created_at": 1, "is_moderated": 1, "is_approved": 1, "duplicates": 1},
+            return_document=ReturnDocument.BEFORE
         )
+        if before is None:
+            holder = await collection.find_one(
+                {"_id": ObjectId(feedback_id), "lease_until": {"$gt": now}}, {"lease_owner": 1, "lease_until": 1}
+            ) if admin_id is not None else None
+            if holder is not None:
+                raise LeaseConflict(holder["lease_owner"], holder["lease_until"])
+            return None
+        
+        if self._search_index is not None:
+            self._search_index.update(before["_id"], is_moderated=True, is_approved=approved)
+        
+        await self._touch_users([before["user_id"]])
+        delta = transition_delta(before, approved)
+        await self._inc_stats(delta)
+        await self._inc_rollups(moderation_deltas([before], delta))
+        
+        before["cluster"] = []
+        if before.get("duplicates"):
+            before["cluster"] = await self._moderate_many(
+                {"cluster_id": before["_id"]}, approved, admin_comment, admin_id
+            )
+        return before
     
-    async def reject_feedback(self, feedback_id: str, admin_comment: str = None):
+    async def approve_feedback(
+        self, feedback_id: str, admin_comment: str = None, admin_id: Optional[int] = None
+    ) -> Optional[dict]:
+        """Одобрение отзыва"""
+        return await self._moderate_feedback(feedback_id, True, admin_comment, admin_id)
+    
+    async def reject_feedback(
+        self, feedback_id: str, admin_comment: str = None, admin_id: Optional[int] = None
+    ) -> Optional[dict]:
         """Отклонение отзыва"""
-        from bson import ObjectId
+        return await self._moderate_feedback(feedback_id, False, admin_comment, admin_id)
+    
+    @query_shapes(QueryShape("_moderate_many(batch)", "feedback", {"moderation_batch": _ID}))
+    async def _moderate_many(
+        self, query: dict, approved: bool, admin_comment: str = None, admin_id: Optional[int] = None
+    ) -> List[dict]:
+        """Модерация всех ещё не проверенных отзывов под условием одним update_many
+
+        С admin_id отзывы, закреплённые за другими администраторами, пропускаются.
+        """
         collection = self.db.feedback
-        await collection.update_one(
-            {"_id": ObjectId(feedback_id)},
+        now = datetime.now()
+        conditions = {**query, "is_moderated": False}
+        if admin_id is not None:
+            conditions = {"$and": [conditions, lease_condition(admin_id, now)]}
+        # Метка пачки позволяет узнать, какие именно отзывы изменил update_many
+        batch = ObjectId()
+        result = await collection.update_many(
+            conditions,
             {"$set": {
                 "is_moderated": True,
-                "is_approved": False,
+                "is_approved": approved,
                 "admin_comment": admin_comment,
-                "moderated_at": datetime.now()
-            }}
+                "moderated_at": now,
+                "moderation_batch": batch
+            }, "$unset": LEASE_FIELDS}
         )
+        if not result.modified_count:
+            return []
+        
+        applied = await collection.find(
+            {"moderation_batch": batch}, {"user_id": 1, "created_at": 1}
+        ).to_list(length=result.modified_count)
+        await self._inc_stats({
+            "pending": -len(applied),
+            "moderated": len(applied),
+            "approved" if approved else "rejected": len(applied),
+        })
+        await self._inc_rollups(moderation_deltas(applied, {"approved" if approved else "rejected": 1}))
+        await self._touch_users(doc["user_id"] for doc in applied)
+        if self._search_index is not None:
+            for doc in applied:
+                self._search_index.update(doc["_id"], is_moderated=True, is_approved=approved)
+        return applied
     
+    @query_shapes(QueryShape(
+        "bulk_moderate", "feedback",
+        {"$or": [{"_id": {"$in": [_ID]}}, {"cluster_id": {"$in": [_ID]}}], "is_moderated": False},
+    ))
+    async def bulk_moderate(
+        self, feedback_ids: List[str], approved: bool, admin_id: Optional[int] = None
+    ) -> BulkModeration:
+        """Модерация выбранных отзывов вместе с их кластерами; уже проверенные и чужие пропускаются"""
+        ids = list({ObjectId(feedback_id) for feedback_id in feedback_ids})
+        applied = await self._moderate_many(
+            {"$or": [{"_id": {"$in": ids}}, {"cluster_id": {"$in": ids}}]}, approved, admin_id=admin_id
+        )
+        selected = {doc["_id"] for doc in applied} & set(ids)
+        return BulkModeration(applied, skipped=len(ids) - len(selected))
+    
+    @query_shapes(
+        QueryShape(
+            "moderate_by_rule", "feedback",
+            {"rating": {"$gte": 4, "$lte": 5}, "created_at": {"$lt": _AT}, "is_moderated": False},
+        ),
+        QueryShape("moderate_by_rule(cluster)", "feedback", {"cluster_id": {"$in": [_ID]}, "is_moderated": False}),
+    )
+    async def moderate_by_rule(
+        self,
+        approved: bool,
+        min_rating: int = 1,
+        max_rating: int = 5,
+        older_than: Optional[datetime] = None,
+        admin_id: Optional[int] = None,
+    ) -> BulkModeration:
+        """Модерация ожидающих отзывов с оценкой в диапазоне, созданных раньше older_than
+
+        Вместе с попавшими под правило головами модерируются их кластеры —
+        почти-дубликаты с другой оценкой или новее older_than иначе остались бы
+        скрытыми из очереди навсегда.
+        """
+        query = {"rating": {"$gte": min_rating, "$lte": max_rating}}
+        query["created_at"] = {"$lt": older_than or datetime.now()}
+        # Подходящие под правило до модерации: разница с изменёнными — проверенные
+        # тем временем или закреплённые за другими администраторами
+        matched = await self.db.feedback.count_documents({**query, "is_moderated": False})
+        applied = await self._moderate_many(query, approved, admin_id=admin_id)
+        skipped = max(matched - len(applied), 0)
+        if applied:
+            applied += await self._moderate_many(
+                {"cluster_id": {"$in": [doc["_id"] for doc in applied]}}, approved, admin_id=admin_id
+            )
+        return BulkModeration(applied, skipped=skipped)
+    
+    @query_shapes()
+    async def get_feedback_version(self) -> int:
+        """Версия отзывов: растёт при каждой записи, модерации, переносе в архив и удалении"""
+        doc = await self.db[USER_VERSIONS_COLLECTION].find_one({"_id": FEEDBACK_VERSION_ID})
+        return doc["version"] if doc else 0
+    
+    @query_shapes()
     async def get_feedback_stats(self):
         """Получение статистики по отзывам"""
+        stats = self._stats_cache.get(FEEDBACK_STATS_ID)
+        if stats is not None:
+            return stats
+        
+        doc = await self.db[STATS_COLLECTION].find_one({"_id": FEEDBACK_STATS_ID})
+        if doc is None:
+            stats = await self.rebuild_feedback_stats()
+        else:
+            stats = {field: doc.get(field, 0) for field in STATS_FIELDS}
+        
+        self._stats_cache.set(FEEDBACK_STATS_ID, stats)
+        return stats
+    
+    async def rebuild_feedback_stats(self):
+        """Пересчёт счётчиков статистики за один проход"""
+        stats = await rebuild_feedback_stats(self.db)
+        self._stats_cache.invalidate()
+        return stats
+    
+    @query_shapes(QueryShape("get_feedback_trends", ROLLUP_COLLECTION, {"_id": {"$gte": "2024-01-01"}}))
+    async def get_feedback_trends(self) -> dict:
+        """Средние оценки за 7/30/90 дней и динамика за неделю — по дневным корзинам"""
+        today = datetime.now()
+        since = day_key(today - timedelta(days=max(TREND_WINDOWS) - 1))
+        buckets = await self.db[ROLLUP_COLLECTION].find(
+            {"_id": {"$gte": since}}, {"rebuilt_at": 0, "day": 0}
+        ).to_list(length=max(TREND_WINDOWS))
+        return summarize_trends(buckets, today)
+    
+    async def rebuild_feedback_rollups(self):
+        """Пересчёт дневных корзин"""
+        await rebuild_feedback_rollups(self.db)
+    
+    @query_shapes(
+        QueryShape(
+            "iter_feedback_batches(pending, period)", "feedback",
+            {"is_moderated": False, "created_at": {"$gte": _AT, "$lt": _AT + timedelta(days=31)}}, _OLDEST,
+        ),
+        QueryShape("iter_feedback_batches(approved)", "feedback", {"is_approved": True}, _OLDEST),
+        QueryShape("iter_feedback_batches(archive, approved)", ARCHIVE_COLLECTION, {"is_approved": True}, _OLDEST),
+    )
+    async def iter_feedback_batches(
+        self,
+        query: dict,
+        projection: Optional[dict] = None,
+        batch_size: int = 1000,
+        include_archive: bool = False,
+    ) -> AsyncIterator[List[dict]]:
+        """Отзывы под условием пачками в порядке создания (для выгрузок)
+
+        С include_archive курсоры по оперативной коллекции и архиву
+        сливаются в общий порядок — без сортировки на сервере.
+        """
+        cursor = self.db.feedback.find(query, projection).sort(_OLDEST).batch_size(batch_size)
+        if not include_archive:
+            while batch := await cursor.to_list(length=batch_size):
+                yield batch
+            return
+        
+        archive = self.db[ARCHIVE_COLLECTION].find(query, projection).sort(_OLDEST).batch_size(batch_size)
+        async for batch in merge_sorted(
+            [cursor, archive], lambda doc: (doc["created_at"], doc["_id"]), batch_size
+        ):
+            yield batch
+    
+    @query_shapes()
+    async def iter_report_batches(self, batch_size: int = 10000) -> AsyncIterator[List[dict]]:
+        """Строки отчёта по всей истории пачками — полный проход по обеим коллекциям"""
+        cursor = self.db.feedback.aggregate(REPORT_PIPELINE, batchSize=batch_size)
+        while batch := await cursor.to_list(length=batch_size):
+            yield batch
+    
+    @query_shapes(
+        QueryShape("archive_feedback", "feedback", {**archivable(_AT), **unbatched(_ID)}),
+        QueryShape("archive_feedback(batch)", "feedback", {"archive_batch": _ID}),
+    )
+    async def archive_feedback(self, older_than: datetime, batch_size: int = 500) -> int:
+        """Перенос пачки отзывов, проверенных раньше older_than, в архив. Возвращает их число
+
+        Копия в архиве пишется до удаления из feedback: если реплика упадёт
+        посередине, пачку после STALE_BATCH перенесёт заново другая.
+        """
+        token, docs = await claim_batch(self.db.feedback, archivable(older_than), batch_size)
+        if not docs:
+            return 0
+        
+        archived_at = datetime.now()
+        await self.db[ARCHIVE_COLLECTION].bulk_write(
+            [ReplaceOne({"_id": doc["_id"]}, archived(doc, archived_at), upsert=True) for doc in docs],
+            ordered=False,
+        )
+        await self.db.feedback.delete_many({"archive_batch": token})
+        await self.db[ARCHIVE_USERS_COLLECTION].bulk_write(count_updates(docs), ordered=False)
+        
+        # Счётчики и корзины считают отзывы в обеих коллекциях — перенос их не меняет
+        await self._touch_users(doc["user_id"] for doc in docs)
+        if self._search_index is not None:
+            for doc in docs:
+                self._search_index.remove(doc["_id"])
+        return len(docs)
+    
+    @query_shapes(
+        QueryShape("purge_archive", ARCHIVE_COLLECTION, {"created_at": {"$lt": _AT}, **unbatched(_ID)}),
+        QueryShape("purge_archive(batch)", ARCHIVE_COLLECTION, {"archive_batch": _ID}),
+    )
+    async def purge_archive(self, created_before: datetime, batch_size: int = 500) -> int:
+        """Удаление пачки архивных отзывов, созданных раньше created_before. Возвращает их число"""
+        archive = self.db[ARCHIVE_COLLECTION]
+        token, docs = await claim_batch(archive, {"created_at": {"$lt": created_before}}, batch_size, PURGE_PROJECTION)
+        if not docs:
+            return 0
+        
+        await archive.delete_many({"archive_batch": token})
+        await self.db[ARCHIVE_USERS_COLLECTION].bulk_write(count_updates(docs, sign=-1), ordered=False)
+        await self._inc_stats(removal_delta(docs))
+        await self._inc_rollups(removal_deltas(docs))
+        await self._touch_users(doc["user_id"] for doc in docs)
+        return len(docs)
+    
+    def _index_feedback(self, doc: dict):
+        self._search_index.add(doc["_id"], doc["message"], {
+            field: doc.get(field) for field in ("rating", "is_moderated", "is_approved", "created_at")
+        })
+    
+    async def _build_search_index(self):
+        """Построение обратного индекса в памяти (SEARCH_BACKEND=memory)"""
+        self._search_index = InvertedIndex()
+        projection = {"message": 1, "rating": 1, "is_moderated": 1, "is_approved": 1, "created_at": 1}
+        async for batch in self.iter_feedback_batches({}, projection):
+            for doc in batch:
+                self._index_feedback(doc)
+        print(f"🔎 Поисковый индекс в памяти: {len(self._search_index)} отзывов")
+    
+    @query_shapes(
+        QueryShape("search_feedback", "feedback", {"$text": {"$search": "доставка"}, "rating": {"$gte": 4, "$lte": 5}}),
+        QueryShape("search_feedback(memory)", "feedback", {"_id": {"$in": [_ID]}}),
+    )
+    async def search_feedback(
+        self,
+        text: str,
+        feedback_filter: FeedbackFilter = FeedbackFilter(),
+        offset: int = 0,
+        page_size: Optional[int] = None,
+    ) -> Page:
+        """Страница результатов поиска по тексту, от самых релевантных"""
+        page_size = page_size or settings.PAGE_SIZE
+        
+        if self._search_index is not None:
+            ids = self._search_index.search(text, feedback_filter.matches)[offset:offset + page_size + 1]
+            found = {
+                doc["_id"]: doc
+                async for doc in self.db.feedback.find({"_id": {"$in": ids}}, ROW_PROJECTION)
+            }
+            docs = [found[i] for i in ids if i in found]
+        else:
+            found = self.db.feedback.find(
+                {"$text": {"$search": text}, **feedback_filter.query()},
+                {**ROW_PROJECTION, "score": {"$meta": "textScore"}},
+            ).sort([("score", {"$meta": "textScore"}), ("_id", -1)]).skip(offset).limit(page_size + 1)
+            docs = await found.to_list(length=page_size + 1)
+        
+        results = [FeedbackRow.from_doc(doc) for doc in docs[:page_size]]
+        return Page(results, has_prev=offset > 0, has_next=len(docs) > page_size)
+    
+    @query_shapes(
+        QueryShape("get_user_summary", "feedback", {"user_id": 0}, [("created_at", -1)]),
+        QueryShape("get_user_summary(count)", "feedback", {"user_id": 0}),
+    )
+    async def get_user_summary(self, user_id: int) -> UserSummary:
+        """Число отзывов пользователя и первая страница (для «Мои отзывы»)
+
+        Кэш сверяется с версией в базе одним чтением по _id: сводка,
+        посчитанная до чужой записи в другом процессе, не показывается.
+        """
+        versioned = await self.db[USER_VERSIONS_COLLECTION].find_one({"_id": user_id})
+        key = (user_id, versioned["version"] if versioned else 0)
+        summary = self._summary_cache.get(key)
+        if summary is not None:
+            return summary
+        
+        page_size = settings.PAGE_SIZE
         collection = self.db.feedback
-        total = await collection.count_documents({})
-        moderated = await collection.count_documents({"is_moderated": True})
-        approved = await collection.count_documents({"is_approved": True})
-        rejected = await collection.count_documents({"is_approved": False})
-        pending = await collection.count_documents({"is_moderated": False})
-        
-        return {
-            "total": total,
-            "moderated": moderated,
-            "approved": approved,
-            "rejected": rejected,
-            "pending": pending
-        }
-    
-    async def get_user_feedback(self, user_id: int):
-        """Получение отзывов пользователя"""
-        collection = self.db.feedback
-        cursor = collection.find({"user_id": user_id}).sort("created_at", -1)
-        results = await cursor.to_list(length=100)
-        # Конвертируем ObjectId в строку
-        for doc in results:
-            doc["_id"] = str(doc["_id"])
-        return results
+        recent, hot, counter = await asyncio.gather(
+            collection.find({"user_id": user_id}, SUMMARY_PROJECTION).sort("created_at", -1)
+            .limit(page_size).to_list(length=page_size),
+            collection.count_documents({"user_id": user_id}),
+            self.db[ARCHIVE_USERS_COLLECTION].find_one({"_id": user_id}),
+        )
+        archived_count = max(counter["archived"], 0) if counter else 0
+        if len(recent) < page_size and archived_count:
+            recent += await self._archived_history(user_id, 0, page_size - len(recent))
+        
+        summary = UserSummary(hot + archived_count, [SummaryRow.from_doc(doc) for doc in recent], archived_count)
+        self._summary_cache.set(key, summary)
+        return summary
+    
+    @query_shapes(QueryShape("_archived_history", ARCHIVE_COLLECTION, {"user_id": 0}, [("created_at", -1)]))
+    async def _archived_history(self, user_id: int, skip: int, limit: int) -> List[dict]:
+        return await self.db[ARCHIVE_COLLECTION].find({"user_id": user_id}, SUMMARY_PROJECTION).sort(
+            "created_at", -1
+        ).skip(skip).limit(limit).to_list(length=limit)
+    
+    @query_shapes(QueryShape("get_user_history", "feedback", {"user_id": 0}, [("created_at", -1)]))
+    async def get_user_history(self, user_id: int, offset: int = 0) -> Tuple[UserSummary, List[SummaryRow]]:
+        """Сводка и страница отзывов пользователя начиная с offset
+
+        Сначала идут отзывы из оперативной коллекции, архив читается,
+        только когда страница заходит за них.
+        """
+        summary = await self.get_user_summary(user_id)
+        if offset == 0:
+            return summary, summary.recent
+        
+        page_size = settings.PAGE_SIZE
+        hot = summary.total - summary.archived
+        docs = []
+        if offset < hot:
+            docs = await self.db.feedback.find({"user_id": user_id}, SUMMARY_PROJECTION).sort(
+                "created_at", -1
+            ).skip(offset).limit(page_size).to_list(length=page_size)
+        if len(docs) < page_size and summary.archived:
+            docs += await self._archived_history(user_id, max(offset - hot, 0), page_size - len(docs))
+        return summary, [SummaryRow.from_doc(doc) for doc in docs]
+
+
+def create_database() -> Storage:
+    """Хранилище по STORAGE_BACKEND: mongo (MongoDB) или memory (в памяти процесса)"""
+    if settings.STORAGE_BACKEND == "memory":
+        from database.memory import MemoryDatabase
+        return MemoryDatabase()
+    return Database()
+
 
+db = create_database()
 
-db = Database()
+if isinstance(db, Database):
+    registry.register(Gauge(
+        "user_summary_cache_hits_total", "Попадания в кэш «Мои отзывы»", lambda: db._summary_cache.hits
+    ))
+    registry.register(Gauge(
+        "user_summary_cache_misses_total", "Промахи кэша «Мои отзывы»", lambda: db._summary_cache.misses
+    ))
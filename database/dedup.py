@@ -0,0 +1,61 @@
+from datetime import timedelta
+from typing import Iterable, Optional
+
+from bson import ObjectId
+from pymongo import UpdateOne
+
+from utils.minhash import bands, signature, similarity
+
+
+# Поля кандидата, нужные для сравнения; сам текст не читается
+DEDUP_PROJECTION = {"user_id": 1, "created_at": 1, "minhash": 1, "cluster_id": 1}
+# Сколько отзывов с общей полосой проверять — обычно их единицы
+DEDUP_CANDIDATES = 50
+
+
+def fingerprint(message: str) -> dict:
+    """Поля отпечатка для документа отзыва: подпись и ключи её полос"""
+    sig = signature(message)
+    return {"minhash": sig, "lsh_bands": bands(sig)}
+
+
+def candidate_query(doc: dict, window: timedelta, user_window: timedelta) -> dict:
+    """Ожидающие модерации отзывы с общей полосой отпечатка — по частичному индексу lsh_bands"""
+    return {
+        "lsh_bands": {"$in": doc["lsh_bands"]},
+        "is_moderated": False,
+        "created_at": {"$gte": doc["created_at"] - max(window, user_window)},
+    }
+
+
+def pick_cluster(doc: dict, candidates: Iterable[dict], threshold: float, window: timedelta) -> Optional[ObjectId]:
+    """Голова кластера самого похожего почти-дубликата или None
+
+    Отзывы того же автора сравниваются за всё окно запроса, чужие —
+    только за window: повтор одной жалобы разными людьми через неделю
+    уже не спам.
+    """
+    since = doc["created_at"] - window
+    best, best_score = None, threshold
+    for candidate in candidates:
+        if candidate["user_id"] != doc["user_id"] and candidate["created_at"] < since:
+            continue
+        score = similarity(candidate["minhash"], doc["minhash"])
+        if score >= best_score:
+            best, best_score = candidate, score
+    if best is None:
+        return None
+    return best.get("cluster_id") or best["_id"]
+
+
+async def backfill_fingerprints(database, batch_size: int = 1000):
+    """Отпечатки для ожидающих отзывов, записанных до появления дедупликации"""
+    cursor = database.feedback.find(
+        {"is_moderated": False, "minhash": {"$exists": False}}, {"message": 1}
+    ).batch_size(batch_size)
+    while batch := await cursor.to_list(length=batch_size):
+        await database.feedback.bulk_write(
+            [UpdateOne({"_id": doc["_id"]}, {"$set": fingerprint(doc["message"])}) for doc in batch],
+            ordered=False,
+        )
+
@@ -0,0 +1,148 @@
+import asyncio
+import logging
+from datetime import datetime
+from typing import Any, Dict, Mapping, Optional
+
+from aiogram.fsm.state import State
+from aiogram.fsm.storage.base import BaseStorage, DefaultKeyBuilder, KeyBuilder, StateType, StorageKey
+from pymongo import DeleteOne, UpdateOne
+from pymongo.errors import OperationFailure
+
+from utils.cache import TTLCache
+
+
+logger = logging.getLogger(__name__)
+
+FSM_COLLECTION = "fsm_states"
+
+
+class MongoStorage(BaseStorage):
+    """FSM-хранилище в MongoDB с отложенной записью и необязательным кэшем
+
+    Изменения копятся flush_delay секунд и уходят одной пачкой, поэтому
+    пара set_state + update_data из одного хендлера превращается в один
+    upsert; до записи и во время неё процесс видит свои изменения поверх
+    базы. Брошенные диалоги удаляет TTL-индекс.
+
+    С cache_ttl > 0 состояния читаются через LRU-кэш, который сбрасывают
+    только записи этого процесса. При нескольких репликах без привязки
+    пользователя к реплике кэш устаревает: реплика, закэшировавшая
+    waiting_for_message, не увидит waiting_for_rating, записанный другой,
+    и отбросит нажатие оценки. Поэтому по умолчанию кэша нет (cache_ttl=0)
+    и каждое чтение идёт в базу; включать его можно только для одной реплики.
+    """
+
+    def __init__(
+        self,
+        database,
+        cache_size: int = 10000,
+        cache_ttl: float = 0,
+        flush_delay: float = 0.05,
+        state_ttl: int = 86400,
+        key_builder: Optional[KeyBuilder] = None,
+    ):
+        self._database = database
+        self._cache = TTLCache(maxsize=cache_size, ttl=cache_ttl) if cache_ttl > 0 else None
+        self._pending: Dict[str, dict] = {}
+        # Пачка, которая сейчас пишется: база её ещё может не отражать
+        self._flushing: Dict[str, dict] = {}
+        self._flush_delay = flush_delay
+        self._flush_task: Optional[asyncio.Task] = None
+        self._flush_lock = asyncio.Lock()
+        self._state_ttl = state_ttl
+        self._key_builder = key_builder or DefaultKeyBuilder(with_bot_id=True, with_destiny=True)
+
+    @property
+    def collection(self):
+        return self._database.db[FSM_COLLECTION]
+
+    async def setup(self):
+        """TTL-индекс для брошенных диалогов"""
+        try:
+            await self.collection.create_index(
+                "updated_at", name="fsm_ttl", expireAfterSeconds=self._state_ttl
+            )
+        except OperationFailure:
+            # Индекс уже есть с другим сроком — меняем срок на месте
+            await self._database.db.command({
+                "collMod": FSM_COLLECTION,
+                "index": {"name": "fsm_ttl", "expireAfterSeconds": self._state_ttl},
+            })
+
+    async def _load(self, key: str) -> dict:
+        record = self._cache.get(key) if self._cache is not None else None
+        if record is None:
+            doc = await self.collection.find_one({"_id": key}, {"state": 1, "data": 1})
+            record = {
+                "state": doc.get("state") if doc else None,
+                "data": (doc.get("data") or {}) if doc else {},
+            }
+            if self._cache is not None:
+                self._cache.set(key, record)
+        # Ещё не записанные изменения важнее того, что лежит в базе
+        return {**record, **self._flushing.get(key, {}), **self._pending.get(key, {})}
+
+    def _write(self, key: str, **fields):
+        record = self._cache.get(key) if self._cache is not None else None
+        if record is not None:
+            self._cache.set(key, {**record, **fields})
+        self._pending.setdefault(key, {}).update(fields)
+
+        if self._flush_task is None:
+            self._flush_task = asyncio.create_task(self._flush_later())
+
+    async def _flush_later(self):
+        await asyncio.sleep(self._flush_delay)
+        self._flush_task = None
+        await self.flush()
+
+    async def flush(self):
+        """Запись накопленных изменений одной пачкой"""
+        async with self._flush_lock:
+            pending, self._pending = self._pending, {}
+            if not pending:
+                return
+            self._flushing = pending
+
+            now = datetime.now()
+            requests = []
+            for key, fields in pending.items():
+                if fields.get("state", ...) is None and fields.get("data", ...) == {}:
+                    requests.append(DeleteOne({"_id": key}))
+                else:
+                    requests.append(UpdateOne(
+                        {"_id": key},
+                        {"$set": {**fields, "updated_at": now}},
+                        upsert=True,
+                    ))
+
+            try:
+                await self.collection.bulk_write(requests, ordered=False)
+            except Exception:
+                logger.exception("❌ Не удалось сохранить FSM-состояния, повторим позже")
+                for key, fields in pending.items():
+                    self._pending[key] = {**fields, **self._pending.get(key, {})}
+                if self._flush_task is None:
+                    self._flush_task = asyncio.create_task(self._flush_later())
+            finally:
+                self._flushing = {}
+
+    async def set_state(self, key: StorageKey, state: StateType = None) -> None:
+        self._write(
+            self._key_builder.build(key),
+            state=state.state if isinstance(state, State) else state,
+        )
+
+    async def get_state(self, key: StorageKey) -> Optional[str]:
+        return (await self._load(self._key_builder.build(key)))["state"]
+
+    async def set_data(self, key: StorageKey, data: Mapping[str, Any]) -> None:
+        self._write(self._key_builder.build(key), data=dict(data))
+
+    async def get_data(self, key: StorageKey) -> Dict[str, Any]:
+        return dict((await self._load(self._key_builder.build(key)))["data"])
+
+    async def close(self) -> None:
+        if self._flush_task is not None:
+            await self._flush_task
+        await self.flush()
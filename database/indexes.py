@@ -0,0 +1,351 @@
+import asyncio
+import inspect
+import logging
+import re
+import sys
+from datetime import datetime
+from typing import Awaitable, Callable, Dict, List, NamedTuple, Optional, Set, Tuple
+
+from pymongo import ASCENDING, DESCENDING, TEXT, IndexModel
+from pymongo.errors import CollectionInvalid, DuplicateKeyError, OperationFailure
+
+from database.archive import ARCHIVE_COLLECTION
+
+
+logger = logging.getLogger(__name__)
+
+MIGRATIONS_COLLECTION = "schema_migrations"
+
+
+class Migration(NamedTuple):
+    """Версионированная миграция схемы"""
+    version: int
+    description: str
+    apply: Callable[..., Awaitable[None]]
+
+
+class QueryShape(NamedTuple):
+    """Форма запроса, для которой обязателен индекс"""
+    name: str
+    collection: str
+    filter: dict
+    sort: Optional[list] = None
+
+
+class IndexCoverageError(Exception):
+    """Запрос выполняется без подходящего индекса"""
+
+
+# Формы запросов методов хранилища; пополняется декоратором query_shapes
+QUERY_SHAPES: List[QueryShape] = []
+
+
+def query_shapes(*shapes: QueryShape):
+    """Декоратор метода хранилища: формы его запросов для verify_indexes()
+
+    Метод, который обращается к коллекциям только по _id или читает их
+    целиком, объявляется без форм — @query_shapes(). Метод с запросами
+    без декоратора находит unregistered_queries().
+    """
+    def register(method):
+        method.query_shapes = shapes
+        QUERY_SHAPES.extend(shapes)
+        return method
+    return register
+
+
+_QUERY_CALL = re.compile(
+    r"\.(find|find_one|find_one_and_update|update_one|update_many|delete_many|count_documents|aggregate)\("
+    r"|\bclaim_batch\("
+)
+
+
+def unregistered_queries(cls) -> List[str]:
+    """Методы класса, которые обращаются к коллекциям, но не объявили формы запросов"""
+    return [
+        name for name, member in vars(cls).items()
+        if inspect.isfunction(member) and not hasattr(member, "query_shapes")
+        and _QUERY_CALL.search(inspect.getsource(member))
+    ]
+
+
+# Текущий набор индексов; миграции создают индексы отсюда по имени, а
+# supporting_index() по нему проверяет формы запросов без сервера
+INDEXES: Dict[str, List[IndexModel]] = {
+    "feedback": [
+        IndexModel([("user_id", ASCENDING), ("created_at", DESCENDING)], name="user_created"),
+        IndexModel(
+            [("is_moderated", ASCENDING), ("created_at", DESCENDING), ("_id", DESCENDING)],
+            name="pending_created_id",
+        ),
+        IndexModel([("created_at", DESCENDING), ("_id", DESCENDING)], name="created_id"),
+        IndexModel([("moderation_batch", ASCENDING)], name="moderation_batch", sparse=True),
+        # Оценка и статус — суффикс текстового индекса: фильтры /search
+        # проверяются при сканировании индекса, а не по документам
+        IndexModel(
+            [("message", TEXT), ("rating", ASCENDING), ("is_moderated", ASCENDING),
+             ("is_approved", ASCENDING), ("created_at", DESCENDING)],
+            name="message_text",
+            default_language="russian",
+            language_override="search_language",
+        ),
+        # Полосы отпечатков нужны только пока отзыв ждёт модерации — частичный
+        # индекс не растёт вместе с архивом проверенных отзывов
+        IndexModel(
+            [("lsh_bands", ASCENDING), ("created_at", DESCENDING)],
+            name="pending_lsh_bands",
+            partialFilterExpression={"is_moderated": False},
+        ),
+        IndexModel([("cluster_id", ASCENDING)], name="cluster", sparse=True),
+        # Свободные отзывы очередь берёт по pending_created_id; этот индекс —
+        # для продления своих аренд, он содержит только ожидающие отзывы
+        IndexModel(
+            [("lease_owner", ASCENDING), ("created_at", ASCENDING), ("_id", ASCENDING)],
+            name="pending_lease_owner",
+            partialFilterExpression={"is_moderated": False},
+        ),
+        IndexModel([("moderated_at", ASCENDING)], name="moderated_at", sparse=True),
+        IndexModel([("archive_batch", ASCENDING)], name="archive_batch", sparse=True),
+    ],
+    ARCHIVE_COLLECTION: [
+        IndexModel([("user_id", ASCENDING), ("created_at", DESCENDING)], name="user_created"),
+        IndexModel([("created_at", ASCENDING), ("_id", ASCENDING)], name="created_id"),
+        IndexModel([("archive_batch", ASCENDING)], name="archive_batch", sparse=True),
+    ],
+}
+
+
+def _indexes(collection: str, *names: str) -> List[IndexModel]:
+    models = {model.document["name"]: model for model in INDEXES[collection]}
+    return [models[name] for name in names]
+
+
+def _condition_fields(query: dict) -> Tuple[Set[str], Set[str]]:
+    """Поля условия, задающие границы в индексе: (все, только с равенством)
+
+    Из $or берутся поля, общие для всех веток; $ne, $not и $exists
+    границ не задают.
+    """
+    fields, equal = set(), set()
+    for field, condition in query.items():
+        if field in ("$or", "$and"):
+            branches = [_condition_fields(branch) for branch in condition]
+            combine = set.intersection if field == "$or" else set.union
+            fields |= combine(*(f for f, _ in branches))
+            equal |= combine(*(e for _, e in branches))
+        elif field == "$text":
+            fields.add(field)
+        elif not isinstance(condition, dict):
+            fields.add(field)
+            equal.add(field)
+        elif not set(condition) & {"$ne", "$not", "$exists"}:
+            fields.add(field)
+    return fields, equal
+
+
+def _serves(index: IndexModel, shape: QueryShape) -> bool:
+    document = index.document
+    keys = list(document["key"].items())
+    fields, equal = _condition_fields(shape.filter)
+    partial = document.get("partialFilterExpression", {})
+    if any(shape.filter.get(field) != value for field, value in partial.items()):
+        return False
+    if document.get("sparse") and keys[0][0] not in fields:
+        return False
+    if keys[0][1] == TEXT:
+        return "$text" in fields and not shape.sort
+
+    if shape.sort:
+        # После полей с равенством ключи индекса должны начинаться с сортировки — прямой или обратной
+        rest = keys
+        while rest and rest[0][0] in equal:
+            rest = rest[1:]
+        prefix = rest[:len(shape.sort)]
+        return prefix in (list(shape.sort), [(field, -direction) for field, direction in shape.sort])
+    return keys[0][0] in fields
+
+
+def supporting_index(shape: QueryShape, indexes: Optional[Dict[str, List[IndexModel]]] = None) -> Optional[str]:
+    """Имя индекса, который обслужит форму запроса без SORT в памяти, или None
+
+    Проверка без сервера и грубее explain: первое поле индекса должно
+    быть в условии, либо индекс должен давать порядок сортировки.
+    """
+    models = INDEXES if indexes is None else indexes
+    for index in [IndexModel([("_id", ASCENDING)], name="_id_"), *models.get(shape.collection, [])]:
+        if _serves(index, shape):
+            return index.document["name"]
+    return None
+
+
+async def _drop_indexes(collection, *names: str):
+    for name in names:
+        try:
+            await collection.drop_index(name)
+        except OperationFailure:
+            pass  # уже удалён
+
+
+async def _m001_feedback_indexes(database):
+    await database.feedback.create_indexes([
+        IndexModel([("is_moderated", ASCENDING), ("created_at", DESCENDING)], name="pending_created"),
+        *_indexes("feedback", "user_created"),
+        IndexModel([("created_at", DESCENDING)], name="created"),
+    ])
+
+
+async def _m002_feedback_stats(database):
+    from database.stats import rebuild_feedback_stats
+    
+    await rebuild_feedback_stats(database)
+
+
+async def _m003_keyset_indexes(database):
+    # Пагинация по (created_at, _id); старые индексы — их префиксы
+    await database.feedback.create_indexes(_indexes("feedback", "pending_created_id", "created_id"))
+    await _drop_indexes(database.feedback, "pending_created", "created")
+
+
+async def _m004_moderation_batch_index(database):
+    await database.feedback.create_indexes(_indexes("feedback", "moderation_batch"))
+
+
+async def _m005_feedback_rollups(database):
+    from database.rollups import ROLLUP_COLLECTION, rebuild_feedback_rollups
+    
+    try:
+        await database.create_collection(ROLLUP_COLLECTION)
+    except CollectionInvalid:
+        pass  # уже есть
+    await rebuild_feedback_rollups(database)
+
+
+async def _m006_message_text_index(database):
+    try:
+        await database.feedback.create_indexes(_indexes("feedback", "message_text"))
+    except OperationFailure as e:
+        logger.warning(f"⚠️ Текстовый индекс не создан ({e}); для /search включите SEARCH_BACKEND=memory")
+
+
+async def _m007_near_duplicates(database):
+    from database.dedup import backfill_fingerprints
+    
+    await database.feedback.create_indexes(_indexes("feedback", "pending_lsh_bands", "cluster"))
+    await backfill_fingerprints(database)
+
+
+async def _m008_moderation_leases(database):
+    await database.feedback.create_indexes(_indexes("feedback", "pending_lease_owner"))
+
+
+async def _m009_feedback_archive(database):
+    from database.archive import rebuild_archive_counts
+    
+    await database.feedback.create_indexes(_indexes("feedback", "moderated_at", "archive_batch"))
+    await database[ARCHIVE_COLLECTION].create_indexes(
+        _indexes(ARCHIVE_COLLECTION, "user_created", "created_id", "archive_batch")
+    )
+    await rebuild_archive_counts(database)
+
+
+MIGRATIONS: List[Migration] = [
+    Migration(1, "индексы коллекции feedback", _m001_feedback_indexes),
+    Migration(2, "счётчики статистики отзывов", _m002_feedback_stats),
+    Migration(3, "индексы для keyset-пагинации", _m003_keyset_indexes),
+    Migration(4, "индекс меток массовой модерации", _m004_moderation_batch_index),
+    Migration(5, "дневные корзины оценок", _m005_feedback_rollups),
+    Migration(6, "текстовый индекс по отзывам", _m006_message_text_index),
+    Migration(7, "отпечатки и кластеры почти-дубликатов", _m007_near_duplicates),
+    Migration(8, "аренда отзывов в очереди модерации", _m008_moderation_leases),
+    Migration(9, "архив проверенных отзывов", _m009_feedback_archive),
+]
+
+
+async def apply_migrations(database) -> int:
+    """Применение ещё не выполненных миграций. Возвращает текущую версию схемы"""
+    meta = database[MIGRATIONS_COLLECTION]
+    applied = {doc["_id"] async for doc in meta.find({}, {"_id": 1})}
+
+    for migration in sorted(MIGRATIONS, key=lambda m: m.version):
+        if migration.version in applied:
+            continue
+
+        # Миграции идемпотентны, поэтому одновременный запуск нескольких
+        # реплик безопасен: запись о версии просто достанется первой
+        await migration.apply(database)
+        try:
+            await meta.insert_one({
+                "_id": migration.version,
+                "description": migration.description,
+                "applied_at": datetime.now(),
+            })
+        except DuplicateKeyError:
+            pass
+        applied.add(migration.version)
+        logger.info(f"🧱 Миграция {migration.version}: {migration.description}")
+
+    return max(applied, default=0)
+
+
+def _plan_stages(plan: dict) -> List[str]:
+    """Список стадий плана запроса (рекурсивно)"""
+    stages = [plan.get("stage", "")]
+    if "inputStage" in plan:
+        stages += _plan_stages(plan["inputStage"])
+    for child in plan.get("inputStages", []):
+        stages += _plan_stages(child)
+    return stages
+
+
+async def explain_shape(database, shape: QueryShape) -> List[str]:
+    """Стадии выигравшего плана для формы запроса"""
+    cursor = database[shape.collection].find(shape.filter)
+    if shape.sort:
+        cursor = cursor.sort(shape.sort)
+    explain = await cursor.explain()
+    winning = explain["queryPlanner"]["winningPlan"]
+    # SBE-движок (MongoDB 7+) вкладывает план в queryPlan
+    return _plan_stages(winning.get("queryPlan", winning))
+
+
+async def verify_indexes(database, shapes: Optional[List[QueryShape]] = None):
+    """Проверка, что индексы из INDEXES созданы и каждая форма запроса обслуживается индексом без SORT в памяти"""
+    problems = []
+    for collection, models in INDEXES.items():
+        existing = await database[collection].index_information()
+        for model in models:
+            if model.document["name"] not in existing:
+                problems.append(f"{collection}.{model.document['name']}: индекс не создан")
+    for shape in shapes if shapes is not None else QUERY_SHAPES:
+        stages = await explain_shape(database, shape)
+        if "COLLSCAN" in stages or "SORT" in stages or "IXSCAN" not in stages:
+            problems.append(f"{shape.name}: {' <- '.join(stages)}")
+
+    if problems:
+        raise IndexCoverageError("Запросы без покрывающего индекса:\n" + "\n".join(problems))
+
+
+async def _main():
+    from database.connection import Database
+
+    unregistered = unregistered_queries(Database)
+    if unregistered:
+        raise IndexCoverageError(f"Методы без форм запросов (@query_shapes): {', '.join(unregistered)}")
+    
+    # Проверяется MongoDB независимо от STORAGE_BACKEND
+    db = Database()
+    await db.connect()
+    try:
+        await verify_indexes(db.db)
+    finally:
+        await db.disconnect()
+    print(f"✅ Все {len(QUERY_SHAPES)} форм запросов используют индексы")
+
+
+if __name__ == "__main__":
+    # python -m database.indexes — проверка покрытия индексами (для CI)
+    try:
+        asyncio.run(_main())
+    except IndexCoverageError as e:
+        print(f"❌ {e}")
+        sys.exit(1)
@@ -0,0 +1,37 @@
+from datetime import datetime
+from typing import Optional
+
+
+# Поля аренды очищаются модерацией
+LEASE_FIELDS = {"lease_owner": "", "lease_until": ""}
+
+
+class LeaseConflict(Exception):
+    """Отзыв закреплён за другим администратором"""
+
+    def __init__(self, owner: int, until: datetime):
+        super().__init__(f"отзыв закреплён за {owner} до {until:%H:%M}")
+        self.owner = owner
+        self.until = until
+
+
+def unclaimed(now: datetime) -> dict:
+    """Отзыв ни за кем не закреплён или аренда истекла"""
+    return {"lease_until": {"$not": {"$gt": now}}}
+
+
+def held_by(admin_id: int, now: datetime) -> dict:
+    return {"lease_owner": admin_id, "lease_until": {"$gt": now}}
+
+
+def lease_condition(admin_id: Optional[int], now: datetime) -> dict:
+    """Условие модерации: отзыв свободен или закреплён за admin_id (без admin_id — любой)"""
+    if admin_id is None:
+        return {}
+    return {"$or": [unclaimed(now), {"lease_owner": admin_id}]}
+
+
+def is_free_for(doc: dict, admin_id: Optional[int], now: datetime) -> bool:
+    """То же условие для документа в памяти"""
+    until = doc.get("lease_until")
+    return admin_id is None or until is None or until <= now or doc.get("lease_owner") == admin_id
@@ -0,0 +1,485 @@
+import asyncio
+import bisect
+import heapq
+from collections import defaultdict
+from datetime import datetime, timedelta
+from itertools import chain, islice
+from typing import AsyncIterator, Dict, Iterator, List, Optional, Tuple
+
+from bson import ObjectId
+
+from config.settings import settings
+from database.archive import archived
+from database.base import Storage
+from database.dedup import DEDUP_CANDIDATES, fingerprint, pick_cluster
+from database.leases import LeaseConflict, is_free_for
+from database.models import BulkModeration, FeedbackModel, UserSummary
+from database.pagination import Page, PageCursor
+from database.report import report_row
+from database.records import ROW_PREVIEW, SUMMARY_PREVIEW, FeedbackRow, SummaryRow
+from database.rollups import (
+    ROLLUP_FIELDS, TREND_WINDOWS, creation_deltas, day_key, moderation_deltas,
+    removal_deltas, summarize_trends,
+)
+from database.stats import STATS_FIELDS, removal_delta, transition_delta
+from utils.filters import FeedbackFilter
+from utils.search import InvertedIndex
+
+
+_OPERATORS = {
+    "$gt": lambda value, bound: value is not None and value > bound,
+    "$gte": lambda value, bound: value is not None and value >= bound,
+    "$lt": lambda value, bound: value is not None and value < bound,
+    "$lte": lambda value, bound: value is not None and value <= bound,
+}
+
+
+def matches(doc: dict, query: dict) -> bool:
+    """Проверка документа условием запроса: равенство и $gt/$gte/$lt/$lte (как в FeedbackFilter.query)"""
+    for field, condition in query.items():
+        value = doc.get(field)
+        if isinstance(condition, dict):
+            if not all(_OPERATORS[op](value, bound) for op, bound in condition.items()):
+                return False
+        elif value != condition:
+            return False
+    return True
+
+
+def _stored(moment: datetime) -> datetime:
+    """Время с точностью до миллисекунды, как его хранит MongoDB — на этом держатся курсоры страниц"""
+    return moment.replace(microsecond=moment.microsecond // 1000 * 1000)
+
+
+def _projected(doc: dict, preview: int) -> dict:
+    """То, что вернула бы проекция с $substrCP"""
+    return {**doc, "preview": doc["message"][:preview], "message_length": len(doc["message"])}
+
+
+def _key(doc: dict) -> Tuple[datetime, ObjectId]:
+    return doc["created_at"], doc["_id"]
+
+
+class SortedIndex:
+    """Ключи (поле, _id) по возрастанию — как индексы *_created_id в MongoDB"""
+
+    def __init__(self, field: str = "created_at"):
+        self._field = field
+        self._keys: List[Tuple[datetime, ObjectId]] = []
+
+    def __len__(self) -> int:
+        return len(self._keys)
+
+    def add(self, doc: dict):
+        bisect.insort(self._keys, (doc[self._field], doc["_id"]))
+
+    def remove(self, doc: dict):
+        key = (doc[self._field], doc["_id"])
+        i = bisect.bisect_left(self._keys, key)
+        if i < len(self._keys) and self._keys[i] == key:
+            del self._keys[i]
+
+    def scan(self, bound: Optional[tuple] = None, descending: bool = False) -> Iterator[ObjectId]:
+        """_id строго после bound в порядке обхода"""
+        keys = self._keys
+        if descending:
+            end = bisect.bisect_left(keys, bound) if bound is not None else len(keys)
+            return (keys[i][1] for i in range(end - 1, -1, -1))
+        start = bisect.bisect_right(keys, bound) if bound is not None else 0
+        return (keys[i][1] for i in range(start, len(keys)))
+
+    def before(self, value) -> Iterator[ObjectId]:
+        """_id с полем меньше value по возрастанию — диапазон {поле: {"$lt": value}}"""
+        keys = self._keys
+        return (keys[i][1] for i in range(bisect.bisect_left(keys, (value,))))
+
+
+class MemoryDatabase(Storage):
+    """Хранилище в памяти процесса (STORAGE_BACKEND=memory)
+
+    Для одного инстанса без MongoDB, тестов и бенчмарков. Семантика та
+    же, что у Database: счётчики, дневные корзины, кластеры почти-дубликатов,
+    аренды и архив. Вместо индексов MongoDB — отсортированные списки
+    ключей (лента, очередь, все ожидающие, проверенные по moderated_at,
+    архив, отзывы пользователя) и словари полос отпечатков, кластеров и
+    аренд администраторов: очередь, модерация по правилу, архивирование
+    и очистка архива читают только свой диапазон. Данные живут, пока жив процесс.
+    """
+
+    def __init__(self):
+        self.feedback: Dict[ObjectId, dict] = {}
+        self.archive: Dict[ObjectId, dict] = {}
+        self.stats = dict.fromkeys(STATS_FIELDS, 0)
+        self.rollups: Dict[str, dict] = {}
+        # Версия отзывов: растёт при записи, модерации, переносе в архив и удалении
+        self.version = 0
+        self._created = SortedIndex()
+        # Очередь модерации: ожидающие отзывы, кроме почти-дубликатов
+        self._queue = SortedIndex()
+        # Все ожидающие (для модерации по правилу), проверенные по времени решения
+        # (для архивирования) и архив по времени создания (для очистки)
+        self._pending = SortedIndex()
+        self._moderated = SortedIndex("moderated_at")
+        self._archived = SortedIndex()
+        # Администратор → закреплённые за ним отзывы
+        self._leases: Dict[int, set] = defaultdict(set)
+        self._by_user: Dict[int, SortedIndex] = defaultdict(SortedIndex)
+        self._archived_by_user: Dict[int, SortedIndex] = defaultdict(SortedIndex)
+        # Ключ полосы → ожидающие отзывы, как частичный индекс pending_lsh_bands
+        self._bands: Dict[int, Dict[ObjectId, dict]] = defaultdict(dict)
+        # Голова кластера → её ожидающие почти-дубликаты
+        self._clusters: Dict[ObjectId, set] = defaultdict(set)
+        self._search_index = InvertedIndex()
+
+    async def connect(self):
+        print("🧠 Хранилище в памяти: отзывы не переживут перезапуск")
+
+    async def ping(self):
+        pass
+
+    async def flush(self):
+        pass
+
+    async def disconnect(self):
+        pass
+
+    def _inc_stats(self, delta: dict):
+        for field, value in delta.items():
+            self.stats[field] += value
+
+    def _inc_rollups(self, deltas: Dict[str, dict]):
+        for day, delta in deltas.items():
+            bucket = self.rollups.setdefault(day, dict.fromkeys(ROLLUP_FIELDS, 0))
+            for field, value in delta.items():
+                bucket[field] += value
+
+    async def create_feedback(self, feedback: FeedbackModel) -> dict:
+        doc = feedback.model_dump()
+        doc["created_at"] = _stored(doc["created_at"])
+        if settings.DEDUP_ENABLED and len(doc["message"]) >= settings.DEDUP_MIN_LENGTH:
+            doc.update(await asyncio.to_thread(fingerprint, doc["message"]))
+            self._assign_cluster(doc)
+        doc["_id"] = ObjectId()
+
+        self.feedback[doc["_id"]] = doc
+        self._created.add(doc)
+        self._pending.add(doc)
+        self._by_user[doc["user_id"]].add(doc)
+        if doc.get("is_duplicate"):
+            self._clusters[doc["cluster_id"]].add(doc["_id"])
+        else:
+            self._queue.add(doc)
+        for key in doc.get("lsh_bands", ()):
+            self._bands[key][doc["_id"]] = doc
+        self._search_index.add(doc["_id"], doc["message"], {
+            field: doc.get(field) for field in ("rating", "is_moderated", "is_approved", "created_at")
+        })
+
+        self._inc_stats({"total": 1, "pending": 1})
+        self._inc_rollups(creation_deltas([doc]))
+        self.version += 1
+        self._settle_duplicate(doc)
+        return {**doc, "_id": str(doc["_id"])}
+
+    def _assign_cluster(self, doc: dict):
+        window = timedelta(hours=settings.DEDUP_WINDOW_HOURS)
+        since = doc["created_at"] - max(window, timedelta(days=settings.DEDUP_USER_WINDOW_DAYS))
+        candidates = {
+            other["_id"]: other
+            for key in doc["lsh_bands"] for other in self._bands.get(key, {}).values()
+            if other["created_at"] >= since
+        }
+        cluster_id = pick_cluster(
+            doc, list(candidates.values())[:DEDUP_CANDIDATES], settings.DEDUP_SIMILARITY, window
+        )
+        head = self.feedback.get(cluster_id) if cluster_id is not None else None
+        if head is not None and not head["is_moderated"]:
+            head["duplicates"] = head.get("duplicates", 0) + 1
+            doc.update(cluster_id=cluster_id, is_duplicate=True)
+
+    def _settle_duplicate(self, doc: dict):
+        """Итог головы для дубликата, чья голова проверена до записи — как Database._settle_duplicates"""
+        head = self.feedback.get(doc.get("cluster_id")) if doc.get("is_duplicate") else None
+        if head is not None and head["is_moderated"]:
+            self._moderate_many([doc], head["is_approved"], head.get("admin_comment"))
+
+    def _set_moderated(self, doc: dict, approved: bool, admin_comment: Optional[str], now: datetime):
+        """Итог модерации в документе; ожидающий отзыв уходит из очереди, полос и кластера"""
+        if doc["is_moderated"]:
+            self._moderated.remove(doc)
+        else:
+            self._queue.remove(doc)
+            self._pending.remove(doc)
+            for key in doc.get("lsh_bands", ()):
+                band = self._bands.get(key)
+                if band is not None:
+                    band.pop(doc["_id"], None)
+                    if not band:
+                        del self._bands[key]
+            if doc.get("cluster_id") in self._clusters:
+                self._clusters[doc["cluster_id"]].discard(doc["_id"])
+        doc.update(is_moderated=True, is_approved=approved, admin_comment=admin_comment, moderated_at=now)
+        self._moderated.add(doc)
+        self.version += 1
+        owner = doc.pop("lease_owner", None)
+        if owner is not None:
+            self._leases[owner].discard(doc["_id"])
+        doc.pop("lease_until", None)
+        self._search_index.update(doc["_id"], is_moderated=True, is_approved=approved)
+
+    async def get_feedback_page(
+        self,
+        cursor: Optional[PageCursor] = None,
+        backward: bool = False,
+        page_size: Optional[int] = None,
+    ) -> Page:
+        page_size = page_size or settings.PAGE_SIZE
+        bound = (cursor.created_at, cursor.id) if cursor is not None else None
+        ids = list(islice(self._created.scan(bound, descending=not backward), page_size + 1))
+
+        has_more = len(ids) > page_size
+        results = [FeedbackRow.from_doc(_projected(self.feedback[i], ROW_PREVIEW)) for i in ids[:page_size]]
+        if backward:
+            results.reverse()
+            return Page(results, has_prev=has_more, has_next=True)
+        return Page(results, has_prev=cursor is not None, has_next=has_more)
+
+    async def claim_feedback(self, admin_id: int, count: Optional[int] = None) -> Page:
+        count = count or settings.PAGE_SIZE
+        now = _stored(datetime.now())
+        until = now + timedelta(minutes=settings.MODERATION_LEASE_MINUTES)
+
+        # Свои аренды продлеваются все, показываются первые count; остальное — из свободных
+        held = sorted(
+            (self.feedback[i] for i in self._leases.get(admin_id, ()) if self.feedback[i]["lease_until"] > now),
+            key=_key,
+        )
+        for doc in held:
+            doc["lease_until"] = until
+        held = held[:count]
+        free = []
+        for feedback_id in self._queue.scan():
+            if len(free) >= count - len(held):
+                break
+            doc = self.feedback[feedback_id]
+            if doc.get("lease_until") is None or doc["lease_until"] <= now:
+                free.append(doc)
+        for doc in free:
+            self._lease(doc, admin_id, until)
+
+        docs = sorted(held + free, key=_key)
+        return Page([FeedbackRow.from_doc(_projected(doc, ROW_PREVIEW)) for doc in docs], False, False)
+
+    def _lease(self, doc: dict, admin_id: int, until: datetime):
+        owner = doc.get("lease_owner")
+        if owner is not None:
+            self._leases[owner].discard(doc["_id"])
+        doc.update(lease_owner=admin_id, lease_until=until)
+        self._leases[admin_id].add(doc["_id"])
+
+    async def _moderate_feedback(
+        self, feedback_id: str, approved: bool, admin_comment: str = None, admin_id: Optional[int] = None
+    ) -> Optional[dict]:
+        doc = self.feedback.get(ObjectId(feedback_id))
+        if doc is None:
+            return None
+        now = _stored(datetime.now())
+        if not is_free_for(doc, admin_id, now):
+            raise LeaseConflict(doc["lease_owner"], doc["lease_until"])
+
+        before = {
+            field: doc[field] for field in ("_id", "user_id", "created_at", "is_moderated", "is_approved", "duplicates")
+            if field in doc
+        }
+        self._set_moderated(doc, approved, admin_comment, now)
+        delta = transition_delta(before, approved)
+        self._inc_stats(delta)
+        self._inc_rollups(moderation_deltas([before], delta))
+
+        before["cluster"] = []
+        if doc.get("duplicates"):
+            before["cluster"] = self._moderate_many(self._cluster(doc["_id"]), approved, admin_comment, admin_id)
+        return before
+
+    async def approve_feedback(
+        self, feedback_id: str, admin_comment: str = None, admin_id: Optional[int] = None
+    ) -> Optional[dict]:
+        return await self._moderate_feedback(feedback_id, True, admin_comment, admin_id)
+
+    async def reject_feedback(
+        self, feedback_id: str, admin_comment: str = None, admin_id: Optional[int] = None
+    ) -> Optional[dict]:
+        return await self._moderate_feedback(feedback_id, False, admin_comment, admin_id)
+
+    def _cluster(self, head_id: ObjectId) -> List[dict]:
+        return [self.feedback[i] for i in self._clusters.get(head_id, ())]
+
+    def _moderate_many(
+        self, docs: List[dict], approved: bool, admin_comment: str = None, admin_id: Optional[int] = None
+    ) -> List[dict]:
+        now = _stored(datetime.now())
+        applied = []
+        for doc in docs:
+            if doc["is_moderated"] or not is_free_for(doc, admin_id, now):
+                continue
+            self._set_moderated(doc, approved, admin_comment, now)
+            applied.append({"_id": doc["_id"], "user_id": doc["user_id"], "created_at": doc["created_at"]})
+
+        outcome = "approved" if approved else "rejected"
+        self._inc_stats({"pending": -len(applied), "moderated": len(applied), outcome: len(applied)})
+        self._inc_rollups(moderation_deltas(applied, {outcome: 1}))
+        return applied
+
+    async def bulk_moderate(
+        self, feedback_ids: List[str], approved: bool, admin_id: Optional[int] = None
+    ) -> BulkModeration:
+        ids = {ObjectId(feedback_id) for feedback_id in feedback_ids}
+        docs = [self.feedback[i] for i in ids if i in self.feedback]
+        docs += [member for i in ids for member in self._cluster(i)]
+        applied = self._moderate_many(docs, approved, admin_id=admin_id)
+        return BulkModeration(applied, skipped=len(ids) - len({doc["_id"] for doc in applied} & ids))
+
+    async def moderate_by_rule(
+        self,
+        approved: bool,
+        min_rating: int = 1,
+        max_rating: int = 5,
+        older_than: Optional[datetime] = None,
+        admin_id: Optional[int] = None,
+    ) -> BulkModeration:
+        older_than = older_than or datetime.now()
+        docs = [
+            doc for doc in map(self.feedback.get, self._pending.before(older_than))
+            if doc["rating"] is not None and min_rating <= doc["rating"] <= max_rating
+        ]
+        applied = self._moderate_many(docs, approved, admin_id=admin_id)
+        skipped = len(docs) - len(applied)
+        cluster = [member for doc in applied for member in self._cluster(doc["_id"])]
+        applied += self._moderate_many(cluster, approved, admin_id=admin_id)
+        return BulkModeration(applied, skipped=skipped)
+
+    async def get_feedback_version(self) -> int:
+        return self.version
+
+    async def get_feedback_stats(self) -> dict:
+        return dict(self.stats)
+
+    async def rebuild_feedback_stats(self) -> dict:
+        docs = [*self.feedback.values(), *self.archive.values()]
+        self.stats = {
+            "total": len(docs),
+            "moderated": sum(1 for doc in docs if doc["is_moderated"]),
+            "approved": sum(1 for doc in docs if doc["is_approved"] is True),
+            "rejected": sum(1 for doc in docs if doc["is_approved"] is False),
+            "pending": sum(1 for doc in docs if not doc["is_moderated"]),
+        }
+        return dict(self.stats)
+
+    async def get_feedback_trends(self) -> dict:
+        today = datetime.now()
+        since = day_key(today - timedelta(days=max(TREND_WINDOWS) - 1))
+        buckets = [{"_id": day, **bucket} for day, bucket in self.rollups.items() if day >= since]
+        return summarize_trends(buckets, today)
+
+    async def rebuild_feedback_rollups(self):
+        docs = [*self.feedback.values(), *self.archive.values()]
+        self.rollups = {}
+        self._inc_rollups(creation_deltas(docs))
+        for field, approved in (("approved", True), ("rejected", False)):
+            outcome = [doc for doc in docs if doc["is_approved"] is approved]
+            self._inc_rollups(moderation_deltas(outcome, {field: 1}))
+
+    async def iter_feedback_batches(
+        self,
+        query: dict,
+        projection: Optional[dict] = None,
+        batch_size: int = 1000,
+        include_archive: bool = False,
+    ) -> AsyncIterator[List[dict]]:
+        # Снимок на момент начала, как у курсора: записи во время выгрузки её не сбивают
+        docs = [self.feedback[i] for i in self._created.scan()]
+        if include_archive:
+            docs = list(heapq.merge(docs, (self.archive[i] for i in self._archived.scan()), key=_key))
+        fields = [field for field, include in (projection or {}).items() if include]
+
+        batch = []
+        for doc in docs:
+            if not matches(doc, query):
+                continue
+            batch.append({"_id": doc["_id"], **{f: doc[f] for f in fields if f in doc}} if fields else dict(doc))
+            if len(batch) == batch_size:
+                yield batch
+                batch = []
+                await asyncio.sleep(0)
+        if batch:
+            yield batch
+
+    async def iter_report_batches(self, batch_size: int = 10000) -> AsyncIterator[List[dict]]:
+        docs = [*self.feedback.values(), *self.archive.values()]
+        for start in range(0, len(docs), batch_size):
+            yield [report_row(doc) for doc in docs[start:start + batch_size]]
+            await asyncio.sleep(0)
+
+    async def archive_feedback(self, older_than: datetime, batch_size: int = 500) -> int:
+        docs = [self.feedback[i] for i in islice(self._moderated.before(older_than), batch_size)]
+        archived_at = datetime.now()
+        for doc in docs:
+            del self.feedback[doc["_id"]]
+            self._created.remove(doc)
+            self._moderated.remove(doc)
+            self._by_user[doc["user_id"]].remove(doc)
+            self._search_index.remove(doc["_id"])
+            self.archive[doc["_id"]] = archived(doc, archived_at)
+            self._archived.add(doc)
+            self._archived_by_user[doc["user_id"]].add(doc)
+        self.version += len(docs)
+        return len(docs)
+
+    async def purge_archive(self, created_before: datetime, batch_size: int = 500) -> int:
+        docs = [self.archive[i] for i in islice(self._archived.before(created_before), batch_size)]
+        for doc in docs:
+            del self.archive[doc["_id"]]
+            self._archived.remove(doc)
+            self._archived_by_user[doc["user_id"]].remove(doc)
+        self._inc_stats(removal_delta(docs))
+        self._inc_rollups(removal_deltas(docs))
+        self.version += len(docs)
+        return len(docs)
+
+    async def search_feedback(
+        self,
+        text: str,
+        feedback_filter: FeedbackFilter = FeedbackFilter(),
+        offset: int = 0,
+        page_size: Optional[int] = None,
+    ) -> Page:
+        page_size = page_size or settings.PAGE_SIZE
+        ids = self._search_index.search(text, feedback_filter.matches)[offset:offset + page_size + 1]
+        docs = [self.feedback[i] for i in ids if i in self.feedback]
+        results = [FeedbackRow.from_doc(_projected(doc, ROW_PREVIEW)) for doc in docs[:page_size]]
+        return Page(results, has_prev=offset > 0, has_next=len(docs) > page_size)
+
+    def _user_rows(self, user_id: int, offset: int, limit: int) -> List[SummaryRow]:
+        """Отзывы пользователя новые сверху: сначала оперативные, затем архивные"""
+        hot = self._by_user.get(user_id)
+        cold = self._archived_by_user.get(user_id)
+        ids = islice(chain(
+            hot.scan(descending=True) if hot else (), cold.scan(descending=True) if cold else ()
+        ), offset, offset + limit)
+        return [
+            SummaryRow.from_doc(_projected(self.feedback.get(i) or self.archive[i], SUMMARY_PREVIEW))
+            for i in ids
+        ]
+
+    async def get_user_summary(self, user_id: int) -> UserSummary:
+        hot = self._by_user.get(user_id)
+        cold = self._archived_by_user.get(user_id)
+        archived_count = len(cold) if cold else 0
+        total = (len(hot) if hot else 0) + archived_count
+        return UserSummary(total, self._user_rows(user_id, 0, settings.PAGE_SIZE), archived_count)
+
+    async def get_user_history(self, user_id: int, offset: int = 0) -> Tuple[UserSummary, List[SummaryRow]]:
+        summary = await self.get_user_summary(user_id)
+        if offset == 0:
+            return summary, summary.recent
+        return summary, self._user_rows(user_id, offset, settings.PAGE_SIZE)
@@ -1,6 +1,7 @@
 from datetime import datetime
-from typing import Optional
+from typing import List, NamedTuple, Optional
 from pydantic import BaseModel, Field
+from database.records import SummaryRow
 
 
 class FeedbackModel(BaseModel):
@@ -15,9 +16,26 @@ class FeedbackModel(BaseModel):
     created_at: datetime = Field(default_factory=datetime.now)
     is_moderated: bool = False
     is_approved: Optional[bool] = None
+    # Почти-дубликат ожидающего отзыва (голова кластера — в cluster_id)
+    is_duplicate: bool = False
     admin_comment: Optional[str] = None
     
     class Config:
         json_encoders = {
             datetime: lambda v: v.isoformat()
         }
+
+
+class UserSummary(NamedTuple):
+    """Сводка отзывов пользователя: общее число (с архивом), первая страница и сколько из них в архиве"""
+    
+    total: int
+    recent: List[SummaryRow]
+    archived: int = 0
+
+
+class BulkModeration(NamedTuple):
+    """Результат массовой модерации"""
+    
+    applied: List[dict]
+    skipped: int
@@ -0,0 +1,65 @@
+from datetime import datetime, timedelta
+from typing import List, NamedTuple, Optional
+
+from bson import ObjectId
+
+from database.records import FeedbackRow
+
+
+_EPOCH = datetime(1970, 1, 1)
+_MS = timedelta(milliseconds=1)
+
+
+class PageCursor(NamedTuple):
+    """Позиция в выдаче: ключ сортировки (created_at, _id)"""
+    created_at: datetime
+    id: ObjectId
+    
+    @classmethod
+    def of(cls, row: FeedbackRow) -> "PageCursor":
+        """Курсор по строке выдачи (FeedbackRow)"""
+        return cls(row.created_at, ObjectId(row.id))
+    
+    def encode(self) -> str:
+        """Компактное представление для callback_data (MongoDB хранит время с точностью до мс)"""
+        return f"{(self.created_at - _EPOCH) // _MS}.{self.id}"
+    
+    @classmethod
+    def decode(cls, token: str) -> "PageCursor":
+        ms, oid = token.split(".")
+        return cls(_EPOCH + int(ms) * _MS, ObjectId(oid))
+
+
+class Page(NamedTuple):
+    """Страница выдачи"""
+    items: List[FeedbackRow]
+    has_prev: bool
+    has_next: bool
+    
+    @property
+    def first(self) -> Optional[PageCursor]:
+        return PageCursor.of(self.items[0]) if self.items else None
+    
+    @property
+    def last(self) -> Optional[PageCursor]:
+        return PageCursor.of(self.items[-1]) if self.items else None
+
+
+def keyset_filter(query: dict, cursor: Optional[PageCursor], backward: bool = False) -> dict:
+    """Условие «после курсора» для сортировки (created_at, _id) по убыванию
+
+    Диапазон по created_at задаёт границы сканирования индекса, а $or
+    отсекает документы с тем же created_at по _id.
+    """
+    if cursor is None:
+        return query
+    
+    strict, inclusive = ("$gt", "$gte") if backward else ("$lt", "$lte")
+    return {
+        **query,
+        "created_at": {inclusive: cursor.created_at},
+        "$or": [
+            {"created_at": {strict: cursor.created_at}},
+            {"_id": {strict: cursor.id}},
+        ],
+    }
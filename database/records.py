@@ -0,0 +1,88 @@
+from datetime import datetime
+from typing import Optional
+
+
+# Длина превью в списках: админ-панель и поиск / «Мои отзывы»
+ROW_PREVIEW = 200
+SUMMARY_PREVIEW = 50
+
+
+def _preview(length: int) -> dict:
+    """Проекция превью: сервер отрезает текст сам, длинный message не передаётся"""
+    return {
+        "preview": {"$substrCP": ["$message", 0, length]},
+        "message_length": {"$strLenCP": "$message"},
+    }
+
+
+# Проекции find() под записи ниже — только поля, которые показывают хендлеры
+ROW_PROJECTION = {
+    "user_id": 1, "username": 1, "first_name": 1, "rating": 1,
+    "is_approved": 1, "created_at": 1, "duplicates": 1, **_preview(ROW_PREVIEW),
+}
+SUMMARY_PROJECTION = {"_id": 0, "rating": 1, "is_approved": 1, **_preview(SUMMARY_PREVIEW)}
+
+
+class FeedbackRow:
+    """Строка списка отзывов (страницы админ-панели, поиск)
+
+    Создаётся прямо из документа с проекцией ROW_PROJECTION, без валидации:
+    данные пишет только сам бот через FeedbackModel.
+    """
+
+    __slots__ = (
+        "id", "user_id", "username", "first_name", "rating",
+        "is_approved", "created_at", "preview", "truncated", "duplicates",
+    )
+
+    id: str
+    user_id: int
+    username: Optional[str]
+    first_name: str
+    rating: Optional[int]
+    is_approved: Optional[bool]
+    created_at: datetime
+    preview: str
+    truncated: bool
+    duplicates: int
+
+    @classmethod
+    def from_doc(cls, doc: dict) -> "FeedbackRow":
+        row = cls.__new__(cls)
+        row.id = str(doc["_id"])
+        row.user_id = doc["user_id"]
+        row.username = doc.get("username")
+        row.first_name = doc["first_name"]
+        row.rating = doc.get("rating")
+        row.is_approved = doc.get("is_approved")
+        row.created_at = doc["created_at"]
+        row.preview = doc["preview"]
+        row.truncated = doc["message_length"] > ROW_PREVIEW
+        row.duplicates = doc.get("duplicates", 0)
+        return row
+
+    def __repr__(self) -> str:
+        return f"FeedbackRow(id={self.id!r}, rating={self.rating!r}, preview={self.preview[:20]!r})"
+
+
+class SummaryRow:
+    """Отзыв в «Мои отзывы»: оценка, статус и превью"""
+
+    __slots__ = ("rating", "is_approved", "preview", "truncated")
+
+    rating: Optional[int]
+    is_approved: Optional[bool]
+    preview: str
+    truncated: bool
+
+    @classmethod
+    def from_doc(cls, doc: dict) -> "SummaryRow":
+        row = cls.__new__(cls)
+        row.rating = doc.get("rating")
+        row.is_approved = doc.get("is_approved")
+        row.preview = doc["preview"]
+        row.truncated = doc["message_length"] > SUMMARY_PREVIEW
+        return row
+
+    def __repr__(self) -> str:
+        return f"SummaryRow(rating={self.rating!r}, preview={self.preview[:20]!r})"
@@ -0,0 +1,46 @@
+from datetime import datetime, timedelta
+
+from database.archive import ARCHIVE_COLLECTION
+
+
+# Столбцы строки отчёта: оценка (0 — без оценки), итог (1 — одобрен, 0 — отклонён,
+# −1 — не проверен), время создания и задержка модерации в мс (−1 — не проверен), длина текста
+REPORT_FIELDS = ("rating", "approved", "created", "delay", "length")
+
+# Значения считает сервер: по сети идут пять чисел на отзыв, а не текст
+REPORT_PROJECTION = {
+    "_id": 0,
+    "rating": {"$ifNull": ["$rating", 0]},
+    "approved": {"$switch": {
+        "branches": [
+            {"case": {"$eq": ["$is_approved", True]}, "then": 1},
+            {"case": {"$eq": ["$is_approved", False]}, "then": 0},
+        ],
+        "default": -1,
+    }},
+    "created": {"$toLong": "$created_at"},
+    "delay": {"$ifNull": [{"$subtract": ["$moderated_at", "$created_at"]}, -1]},
+    "length": {"$strLenCP": "$message"},
+}
+
+# Вся история: оперативная коллекция и архив
+REPORT_PIPELINE = [
+    {"$project": REPORT_PROJECTION},
+    {"$unionWith": {"coll": ARCHIVE_COLLECTION, "pipeline": [{"$project": REPORT_PROJECTION}]}},
+]
+
+_EPOCH = datetime(1970, 1, 1)
+_MS = timedelta(milliseconds=1)
+
+
+def report_row(doc: dict) -> dict:
+    """Строка отчёта из документа — то же, что REPORT_PROJECTION на сервере"""
+    created = (doc["created_at"] - _EPOCH) // _MS
+    moderated_at = doc.get("moderated_at")
+    return {
+        "rating": doc.get("rating") or 0,
+        "approved": {True: 1, False: 0}.get(doc.get("is_approved"), -1),
+        "created": created,
+        "delay": (moderated_at - _EPOCH) // _MS - created if moderated_at else -1,
+        "length": len(doc["message"]),
+    }
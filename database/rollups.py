@@ -0,0 +1,116 @@
+from collections import defaultdict
+from datetime import datetime, timedelta
+from typing import Dict, Iterable, List
+
+from pymongo import UpdateOne
+
+from database.archive import ARCHIVE_COLLECTION
+
+
+ROLLUP_COLLECTION = "feedback_daily"
+RATINGS = (1, 2, 3, 4, 5)
+# Счётчики дневной корзины: всего, по оценкам, без оценки и итоги модерации
+ROLLUP_FIELDS = ("total",) + tuple(f"rating_{r}" for r in RATINGS) + ("rating_none", "approved", "rejected")
+TREND_WINDOWS = (7, 30, 90)
+
+
+def day_key(moment: datetime) -> str:
+    """Ключ дневной корзины (_id документа) — сортируется как строка"""
+    return moment.strftime("%Y-%m-%d")
+
+
+def rating_field(rating) -> str:
+    return f"rating_{rating}" if rating in RATINGS else "rating_none"
+
+
+def creation_deltas(docs: Iterable[dict]) -> Dict[str, dict]:
+    """Изменения корзин при записи новых отзывов"""
+    deltas: Dict[str, dict] = defaultdict(lambda: defaultdict(int))
+    for doc in docs:
+        delta = deltas[day_key(doc["created_at"])]
+        delta["total"] += 1
+        delta[rating_field(doc.get("rating"))] += 1
+    return deltas
+
+
+def moderation_deltas(docs: Iterable[dict], delta: dict) -> Dict[str, dict]:
+    """Изменения корзин при модерации: итог учитывается в день создания отзыва"""
+    outcome = {field: value for field, value in delta.items() if field in ("approved", "rejected")}
+    deltas: Dict[str, dict] = defaultdict(lambda: defaultdict(int))
+    if not outcome:
+        return deltas
+    for doc in docs:
+        for field, value in outcome.items():
+            deltas[day_key(doc["created_at"])][field] += value
+    return deltas
+
+
+def removal_deltas(docs: List[dict]) -> Dict[str, dict]:
+    """Изменения корзин при удалении проверенных отзывов: вычитаются создание и итог"""
+    deltas = creation_deltas(docs)
+    for doc in docs:
+        deltas[day_key(doc["created_at"])]["approved" if doc.get("is_approved") else "rejected"] += 1
+    return {day: {field: -value for field, value in delta.items()} for day, delta in deltas.items()}
+
+
+def rollup_updates(deltas: Dict[str, dict]) -> List[UpdateOne]:
+    """Операции bulk_write для изменений корзин"""
+    return [
+        UpdateOne(
+            {"_id": day},
+            {"$inc": dict(delta), "$setOnInsert": {"day": datetime.strptime(day, "%Y-%m-%d")}},
+            upsert=True,
+        )
+        for day, delta in deltas.items() if delta
+    ]
+
+
+def _rollup_pipeline(rebuilt_at: datetime) -> list:
+    counters = {"total": {"$sum": 1}}
+    for rating in RATINGS:
+        counters[f"rating_{rating}"] = {"$sum": {"$cond": [{"$eq": ["$rating", rating]}, 1, 0]}}
+    counters["rating_none"] = {"$sum": {"$cond": [{"$in": ["$rating", list(RATINGS)]}, 0, 1]}}
+    counters["approved"] = {"$sum": {"$cond": [{"$eq": ["$is_approved", True]}, 1, 0]}}
+    counters["rejected"] = {"$sum": {"$cond": [{"$eq": ["$is_approved", False]}, 1, 0]}}
+
+    return [
+        {"$unionWith": ARCHIVE_COLLECTION},
+        {"$group": {"_id": {"$dateToString": {"format": "%Y-%m-%d", "date": "$created_at"}}, **counters}},
+        {"$set": {"day": {"$dateFromString": {"dateString": "$_id", "format": "%Y-%m-%d"}}, "rebuilt_at": rebuilt_at}},
+        {"$merge": {"into": ROLLUP_COLLECTION, "whenMatched": "replace", "whenNotMatched": "insert"}},
+    ]
+
+
+async def rebuild_feedback_rollups(database):
+    """Пересчёт дневных корзин по коллекциям feedback и архива одним $group + $merge"""
+    rebuilt_at = datetime.now()
+    await database.feedback.aggregate(_rollup_pipeline(rebuilt_at)).to_list(length=None)
+    # Дни, отзывов за которые больше нет; корзины, созданные во время пересчёта, не трогаем
+    await database[ROLLUP_COLLECTION].delete_many({"rebuilt_at": {"$lt": rebuilt_at}})
+
+
+def _window_summary(buckets: List[dict]) -> dict:
+    counts = {field: sum(bucket.get(field, 0) for bucket in buckets) for field in ROLLUP_FIELDS}
+    rated = sum(counts[f"rating_{r}"] for r in RATINGS)
+    moderated = counts["approved"] + counts["rejected"]
+    return {
+        "total": counts["total"],
+        "average": sum(r * counts[f"rating_{r}"] for r in RATINGS) / rated if rated else None,
+        "distribution": {r: counts[f"rating_{r}"] for r in RATINGS},
+        "no_rating": counts["rating_none"],
+        "approval_rate": counts["approved"] / moderated if moderated else None,
+    }
+
+
+def summarize_trends(buckets: List[dict], today: datetime) -> dict:
+    """Сводка за последние 7/30/90 дней и сравнение недели с предыдущей"""
+    def since(days: int, until: int = 0) -> List[dict]:
+        start = day_key(today - timedelta(days=days - 1))
+        end = day_key(today - timedelta(days=until - 1)) if until else None
+        return [b for b in buckets if b["_id"] >= start and (end is None or b["_id"] < end)]
+
+    return {
+        "windows": {days: _window_summary(since(days)) for days in TREND_WINDOWS},
+        "week": _window_summary(since(7)),
+        "previous_week": _window_summary(since(14, until=7)),
+    }
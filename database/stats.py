@@ -0,0 +1,61 @@
+from typing import List, Optional
+
+from database.archive import ARCHIVE_COLLECTION
+
+
+STATS_COLLECTION = "stats"
+FEEDBACK_STATS_ID = "feedback"
+STATS_FIELDS = ("total", "moderated", "approved", "rejected", "pending")
+
+
+def _count(match: Optional[dict] = None) -> list:
+    stages = [{"$match": match}] if match else []
+    return stages + [{"$count": "n"}]
+
+
+# Все счётчики за один проход по оперативной коллекции и архиву
+FEEDBACK_STATS_PIPELINE = [
+    {"$unionWith": ARCHIVE_COLLECTION},
+    {"$facet": {
+        "total": _count(),
+        "moderated": _count({"is_moderated": True}),
+        "approved": _count({"is_approved": True}),
+        "rejected": _count({"is_approved": False}),
+        "pending": _count({"is_moderated": False}),
+    }},
+]
+
+
+def transition_delta(before: dict, approved: bool) -> dict:
+    """Изменение счётчиков при модерации отзыва из состояния before"""
+    new_field = "approved" if approved else "rejected"
+    
+    if not before.get("is_moderated"):
+        return {"pending": -1, "moderated": 1, new_field: 1}
+    
+    if before.get("is_approved") == approved:
+        return {}
+    
+    # Повторная модерация: отзыв переходит из одного итога в другой
+    old_field = "rejected" if approved else "approved"
+    return {old_field: -1, new_field: 1}
+
+
+def removal_delta(docs: List[dict]) -> dict:
+    """Изменение счётчиков при удалении проверенных отзывов (срок хранения архива)"""
+    approved = sum(1 for doc in docs if doc.get("is_approved"))
+    return {"total": -len(docs), "moderated": -len(docs), "approved": -approved, "rejected": approved - len(docs)}
+
+
+async def rebuild_feedback_stats(database) -> dict:
+    """Пересчёт счётчиков по коллекциям feedback и архива (сверка)"""
+    result = await database.feedback.aggregate(FEEDBACK_STATS_PIPELINE).to_list(length=1)
+    facets = result[0] if result else {}
+    stats = {
+        field: facets[field][0]["n"] if facets.get(field) else 0
+        for field in STATS_FIELDS
+    }
+    await database[STATS_COLLECTION].replace_one(
+        {"_id": FEEDBACK_STATS_ID}, stats, upsert=True
+    )
+    return stats
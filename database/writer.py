@@ -0,0 +1,100 @@
+import asyncio
+import logging
+from typing import Awaitable, Callable, List, Optional, Tuple
+
+from bson import ObjectId
+from pymongo.errors import BulkWriteError, WriteError
+
+
+logger = logging.getLogger(__name__)
+
+
+class BatchWriter:
+    """Групповая запись документов (group commit)
+
+    Документы копятся не дольше window секунд или до max_docs штук и
+    записываются одним неупорядоченным insert_many. Каждый вызывающий
+    получает свой _id после подтверждения записи либо исключение,
+    если не записался именно его документ.
+    """
+    
+    def __init__(
+        self,
+        get_collection: Callable,
+        on_inserted: Optional[Callable[[List[dict]], Awaitable[None]]] = None,
+        window: float = 0.005,
+        max_docs: int = 100,
+    ):
+        self._get_collection = get_collection
+        self._on_inserted = on_inserted
+        self.window = window
+        self.max_docs = max_docs
+        self._batch: List[Tuple[dict, asyncio.Future]] = []
+        self._timer: Optional[asyncio.TimerHandle] = None
+        self._flushing: set = set()
+    
+    async def insert(self, doc: dict) -> ObjectId:
+        """Поставить документ в пачку и дождаться его записи"""
+        doc.setdefault("_id", ObjectId())
+        future = asyncio.get_running_loop().create_future()
+        self._batch.append((doc, future))
+        
+        if len(self._batch) >= self.max_docs:
+            self._start_flush()
+        elif self._timer is None:
+            self._timer = asyncio.get_running_loop().call_later(self.window, self._start_flush)
+        
+        return await future
+    
+    def _start_flush(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        batch, self._batch = self._batch, []
+        if not batch:
+            return
+        
+        task = asyncio.create_task(self._write(batch))
+        self._flushing.add(task)
+        task.add_done_callback(self._flushing.discard)
+    
+    async def _write(self, batch: List[Tuple[dict, asyncio.Future]]):
+        docs = [doc for doc, _ in batch]
+        errors = {}
+        try:
+            await self._get_collection().insert_many(docs, ordered=False)
+        except BulkWriteError as e:
+            # При ordered=False остальные документы пачки записаны
+            errors = {error["index"]: error for error in e.details.get("writeErrors", [])}
+        except Exception as e:
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+        
+        inserted = []
+        for index, (doc, future) in enumerate(batch):
+            if index in errors:
+                error = errors[index]
+                exception = WriteError(error.get("errmsg", ""), error.get("code"), error)
+                if not future.done():
+                    future.set_exception(exception)
+            else:
+                inserted.append((doc, future))
+        
+        # Обработчик пачки — до пробуждения вызывающих: они получают _id,
+        # когда счётчики и версии уже учли запись, а документы пачки ещё не тронуты
+        if inserted and self._on_inserted is not None:
+            try:
+                await self._on_inserted([doc for doc, _ in inserted])
+            except Exception:
+                logger.exception("❌ Ошибка обработки записанной пачки")
+        for doc, future in inserted:
+            if not future.done():
+                future.set_result(doc["_id"])
+    
+    async def close(self):
+        """Запись остатка и ожидание незавершённых пачек"""
+        self._start_flush()
+        if self._flushing:
+            await asyncio.gather(*self._flushing, return_exceptions=True)
@@ -1,14 +1,35 @@
+import asyncio
+import logging
+import zlib
+from collections import Counter
+from datetime import datetime, timedelta
+from html import escape
 from aiogram import Router, F
-from aiogram.types import Message, CallbackQuery
+from aiogram.exceptions import TelegramBadRequest
+from aiogram.types import Message, CallbackQuery, InlineKeyboardMarkup
 from aiogram.fsm.context import FSMContext
 from aiogram.fsm.state import State, StatesGroup
-from config.settings import settings
+from database.admins import ROLE_MODERATOR, roster
 from database.connection import db
-from keyboards.main import get_admin_keyboard, get_moderation_keyboard
-from aiogram.filters import Command
+from database.leases import LeaseConflict
+from database.pagination import Page, PageCursor
+from database.records import FeedbackRow
+from bot.sender import sender
+from keyboards.main import SELECT_OFF, SELECT_ON, get_admin_keyboard, get_claim_keyboard, get_page_keyboard, get_search_keyboard
+from middlewares.admin import AdminMiddleware
+from aiogram.filters import Command, CommandObject
+from config.settings import settings
+from utils.export import EXPORT_PROJECTION, UPLOAD_LIMIT, SpooledInputFile, parse_export_args, write_export
+from utils.filters import FeedbackFilter, parse_feedback_filter
+from utils.report import FeedbackReport, ReportBuilder
+
 
+logger = logging.getLogger(__name__)
 
 router = Router()
+# Все хендлеры роутера — только для администраторов
+router.message.middleware(AdminMiddleware(roster))
+router.callback_query.middleware(AdminMiddleware(roster))
 
 
 class AdminState(StatesGroup):
@@ -16,17 +37,9 @@ class AdminState(StatesGroup):
     waiting_for_comment = State()
 
 
-def is_admin(user_id: int) -> bool:
-    """Проверка на администратора"""
-    return user_id in settings.admin_ids_list
-
-
 @router.message(Command("admin"))
 async def cmd_admin(message: Message):
     """Админ-панель"""
-    if not is_admin(message.from_user.id):
-        return
-    
     await message.answer(
         "🛠 <b>Админ-панель</b>\n\n"
         "Выберите действие:",
@@ -35,38 +48,81 @@ async def cmd_admin(message: Message):
     )
 
 
-@router.message(F.text == "📋 Новые отзывы")
-async def new_feedback(message: Message):
-    """Просмотр новых отзывов"""
-    if not is_admin(message.from_user.id):
-        return
+def render_item(number: int, fb: FeedbackRow) -> str:
+    """Карточка отзыва в списке"""
+    status = "✅" if fb.is_approved else "❌" if fb.is_approved is False else "⏳"
+    rating = f"⭐️ {fb.rating}/5" if fb.rating else "Без оценки"
+    lines = [
+        f"<b>{number}.</b> {status} {rating}",
+        f"👤 @{fb.username or 'нет'} / {escape(fb.first_name)} (<code>{fb.user_id}</code>)",
+        f"📝 {escape(fb.preview)}{'...' if fb.truncated else ''}",
+    ]
+    if fb.duplicates:
+        lines.append(f"🔁 Похожих: {fb.duplicates} — модерируются вместе с этим")
+    lines.append(f"🆔 <code>{fb.id}</code>")
+    return "\n".join(lines)
+
+
+def render_claim(page: Page):
+    """Текст и клавиатура отзывов, закреплённых за администратором"""
+    if not page.items:
+        return "✅ Все отзывы обработаны!\n\nНовых отзывов нет.", None
     
-    pending = await db.get_pending_feedback()
+    blocks = ["📋 <b>Новые отзывы</b>"]
+    blocks += [render_item(i, fb) for i, fb in enumerate(page.items, 1)]
+    blocks.append(
+        f"🔒 Отзывы закреплены за вами на {settings.MODERATION_LEASE_MINUTES:g} мин — "
+        "другим администраторам они не выдаются."
+    )
+    return "\n\n".join(blocks), get_claim_keyboard([fb.id for fb in page.items])
+
+
+def render_page(page: Page, paged: bool = False):
+    """Текст и клавиатура страницы всех отзывов"""
+    if not page.items:
+        if paged:
+            return "📭 Здесь отзывов больше нет.", get_page_keyboard(prev_token="first")
+        return "📭 Пока нет отзывов.", None
     
-    if not pending:
-        await message.answer("✅ Все отзывы обработаны!\n\nНовых отзывов нет.")
-        return
+    blocks = ["🔍 <b>Все отзывы</b>"]
+    blocks += [render_item(i, fb) for i, fb in enumerate(page.items, 1)]
     
-    for fb in pending[:10]:  # Максимум 10 за раз
-        rating = f"⭐️ {fb['rating']}/5" if fb.get('rating') else "Без оценки"
-        await message.answer(
-            f"🔔 <b>Новый отзыв</b>\n\n"
-            f"👤 <b>От:</b> @{fb.get('username', 'нет')} / {fb['first_name']}\n"
-            f"🆔 ID: <code>{fb['user_id']}</code>\n"
-            f"{rating}\n\n"
-            f"📝 <b>Текст:</b>\n{fb['message']}\n\n"
-            f"🆔 <code>{fb['_id']}</code>",
-            parse_mode="HTML",
-            reply_markup=get_moderation_keyboard(fb['_id'])
-        )
+    keyboard = get_page_keyboard(
+        prev_token=page.first.encode() if page.has_prev else None,
+        next_token=page.last.encode() if page.has_next else None,
+    )
+    return "\n\n".join(blocks), keyboard
+
+
+@router.message(F.text == "📋 Новые отзывы")
+async def new_feedback(message: Message):
+    """Очередь модерации: следующие отзывы закрепляются за администратором
+
+    Вместо листания — пачка: после модерации «📋 Новые отзывы» выдаёт следующую.
+    """
+    page = await db.claim_feedback(message.from_user.id)
+    text, keyboard = render_claim(page)
+    await message.answer(text, parse_mode="HTML", reply_markup=keyboard)
+
+
+@router.callback_query(F.data.startswith(("page_prev_", "page_next_")))
+async def page_navigation(callback: CallbackQuery):
+    """Листание страниц всех отзывов в том же сообщении"""
+    _, direction, token = callback.data.split("_", 2)
+    cursor = None if token == "first" else PageCursor.decode(token)
+    page = await db.get_feedback_page(cursor=cursor, backward=direction == "prev" and cursor is not None)
+    text, keyboard = render_page(page, paged=cursor is not None)
+    
+    try:
+        await callback.message.edit_text(text, parse_mode="HTML", reply_markup=keyboard)
+    except TelegramBadRequest:
+        pass  # страница не изменилась
+    await callback.answer()
 
 
 @router.message(F.text == "📊 Статистика")
 async def stats_command(message: Message):
     """Статистика отзывов"""
-    if not is_admin(message.from_user.id):
-        return
-    
     stats = await db.get_feedback_stats()
     
     text = (
@@ -82,73 +138,357 @@ async def stats_command(message: Message):
     await message.answer(text, parse_mode="HTML", reply_markup=get_admin_keyboard())
 
 
-@router.message(F.text == "🔍 Все отзывы")
-async def all_feedback(message: Message):
-    """Все отзывы"""
-    if not is_admin(message.from_user.id):
-        return
+def format_change(current, previous, digits: int = 0, suffix: str = "") -> str:
+    """Изменение к прошлому периоду: «+12%», «−0.3»"""
+    if current is None or previous is None:
+        return "—"
+    if suffix == "%":
+        if not previous:
+            return "—"
+        change = (current - previous) / previous * 100
+    else:
+        change = current - previous
+    return f"{'+' if change >= 0 else '−'}{abs(change):.{digits}f}{suffix}"
+
+
+@router.message(F.text == "📈 Тренды")
+async def trends_command(message: Message):
+    """Средние оценки и динамика по дневным корзинам"""
+    trends = await db.get_feedback_trends()
+    
+    lines = ["📈 <b>Оценки и динамика</b>\n"]
+    for days, window in trends["windows"].items():
+        average = f"⭐️ {window['average']:.2f}" if window["average"] is not None else "нет оценок"
+        approval = f", одобрено {round(window['approval_rate'] * 100)}%" if window["approval_rate"] is not None else ""
+        lines.append(f"📅 {days} дн.: {average} — отзывов {window['total']}{approval}")
+    
+    week, previous = trends["week"], trends["previous_week"]
+    week_average = f"{week['average']:.2f}" if week["average"] is not None else "—"
+    lines.append(
+        f"\n🔁 <b>Неделя к неделе:</b>\n"
+        f"Отзывов: {week['total']} ({format_change(week['total'], previous['total'], suffix='%')})\n"
+        f"Средняя оценка: {week_average} ({format_change(week['average'], previous['average'], digits=2)})"
+    )
+    
+    month = trends["windows"][30]
+    lines.append("\n📊 <b>Распределение за 30 дней:</b>")
+    for rating in sorted(month["distribution"], reverse=True):
+        lines.append(f"{'⭐️' * rating}: {month['distribution'][rating]}")
+    lines.append(f"Без оценки: {month['no_rating']}")
+    
+    await message.answer("\n".join(lines), parse_mode="HTML", reply_markup=get_admin_keyboard())
+
+
+# Отчёт по всей истории: один на все запросы, пока не изменилась версия отзывов
+_report_cache = {}
+_report_lock = asyncio.Lock()
+WEEKDAYS = ("понедельник", "вторник", "среда", "четверг", "пятница", "суббота", "воскресенье")
+
+
+async def get_report() -> FeedbackReport:
+    """Отчёт из кэша или полным проходом по истории, если с прошлого раза отзывы менялись"""
+    async with _report_lock:
+        version = await db.get_feedback_version()
+        if version not in _report_cache:
+            builder = ReportBuilder()
+            async for batch in db.iter_report_batches(settings.REPORT_BATCH_SIZE):
+                await asyncio.to_thread(builder.add, batch)
+            _report_cache.clear()
+            _report_cache[version] = builder.result()
+        return _report_cache[version]
+
+
+def format_minutes(minutes) -> str:
+    """Длительность: «45 мин», «3.5 ч», «2.0 дн»"""
+    if minutes is None:
+        return "—"
+    if minutes < 60:
+        return f"{minutes} мин"
+    if minutes < 24 * 60:
+        return f"{minutes / 60:.1f} ч"
+    return f"{minutes / 60 / 24:.1f} дн"
+
+
+def render_report(report: FeedbackReport) -> str:
+    """Текст отчёта /report"""
+    if not report.total:
+        return "📭 Отзывов пока нет"
+    
+    def share(count: int, total: int) -> str:
+        return f"{round(count / total * 100)}%" if total else "—"
+    
+    def label(rating: int) -> str:
+        return "⭐️" * rating if rating else "Без оценки"
     
-    feedbacks = await db.get_all_feedback(limit=20)
+    lines = [f"📑 <b>Отчёт по всем отзывам</b> ({report.total})\n", "📊 <b>Оценки:</b>"]
+    for rating in range(5, -1, -1):
+        lines.append(f"{label(rating)}: {report.distribution[rating]} ({share(report.distribution[rating], report.total)})")
     
-    if not feedbacks:
-        await message.answer("📭 Пока нет отзывов.")
+    lines.append("\n✅ <b>Одобрено по оценкам:</b>")
+    for rating in range(5, -1, -1):
+        rate = report.approval_by_rating[rating]
+        if rate is not None:
+            lines.append(f"{label(rating)}: {round(rate * 100)}% из {report.moderated_by_rating[rating]}")
+    
+    minutes = report.moderation_minutes
+    lines.append(
+        f"\n⏱ <b>Время до модерации:</b> медиана {format_minutes(minutes[50])}, "
+        f"90% — до {format_minutes(minutes[90])}"
+    )
+    length = report.length
+    lines.append(f"✏️ <b>Длина текста:</b> медиана {length[50]}, 90% — до {length[90]}, 99% — до {length[99]}")
+    
+    busiest = [hour for hour in sorted(range(24), key=lambda hour: -report.hours[hour])[:3] if report.hours[hour]]
+    lines.append("\n🕐 <b>Самые загруженные часы:</b>")
+    for hour in busiest:
+        lines.append(f"{hour:02d}:00–{hour:02d}:59 — {share(report.hours[hour], report.total)}")
+    weekday = max(range(7), key=lambda day: report.weekdays[day])
+    lines.append(f"📅 Чаще всего пишут: {WEEKDAYS[weekday]} ({share(report.weekdays[weekday], report.total)})")
+    
+    return "\n".join(lines)
+
+
+@router.message(Command("report"))
+async def report_command(message: Message):
+    """Сводка по всей истории отзывов, включая архив"""
+    try:
+        report = await get_report()
+    except Exception as e:
+        logger.exception(f"❌ Ошибка отчёта: {e}")
+        await message.answer("❌ Не удалось построить отчёт, попробуйте позже.")
         return
+    await message.answer(render_report(report), parse_mode="HTML", reply_markup=get_admin_keyboard())
+
+
+async def render_search(args: str, offset: int):
+    """Текст и клавиатура страницы результатов /search"""
+    feedback_filter, words = parse_feedback_filter(args.split())
+    text = " ".join(words)
+    page = await db.search_feedback(text, feedback_filter, offset=offset)
     
-    for fb in feedbacks[:5]:
-        status = "✅" if fb.get("is_approved") else "❌" if fb.get("is_approved") is False else "⏳"
-        rating = f"⭐️ {fb['rating']}/5" if fb.get('rating') else "Без оценки"
+    title = f"🔎 <b>Поиск:</b> {escape(text)}"
+    if feedback_filter != FeedbackFilter():
+        title += f" ({feedback_filter.describe()})"
+    if not page.items:
+        return f"{title}\n\n📭 Ничего не найдено.", None
+    
+    blocks = [title] + [render_item(offset + i, fb) for i, fb in enumerate(page.items, 1)]
+    keyboard = get_search_keyboard(
+        f"{zlib.crc32(args.encode()):08x}", offset, settings.PAGE_SIZE, page.has_prev, page.has_next
+    )
+    return "\n\n".join(blocks), keyboard
+
+
+@router.message(Command("search"))
+async def search_command(message: Message, command: CommandObject, state: FSMContext):
+    """Поиск по тексту отзывов с фильтрами"""
+    try:
+        _, words = parse_feedback_filter((command.args or "").split())
+    except ValueError:
+        words = []
+    if not words:
         await message.answer(
-            f"{status} <b>Отзыв</b>\n\n"
-            f"👤 @{fb.get('username', 'нет')} / {fb['first_name']}\n"
-            f"{rating}\n\n"
-            f"📝 {fb['message'][:200]}{'...' if len(fb['message']) > 200 else ''}\n\n"
-            f"🆔 <code>{fb['_id']}</code>",
+            "ℹ️ Использование: <code>/search &lt;слова&gt; [оценки] [pending|approved|rejected] [период]</code>\n\n"
+            "Например, <code>/search доставка курьер 1-2 2024-01-01..2024-03-31</code>",
             parse_mode="HTML"
         )
+        return
+    
+    # Запрос хранится в FSM: в callback_data он не помещается
+    await state.update_data(search=command.args)
+    text, keyboard = await render_search(command.args, offset=0)
+    await message.answer(text, parse_mode="HTML", reply_markup=keyboard)
 
 
-@router.callback_query(F.data.startswith("approve_"))
-async def approve_feedback(callback: CallbackQuery):
-    """Одобрение отзыва"""
-    if not is_admin(callback.from_user.id):
-        await callback.answer("❌ Нет прав", show_alert=True)
+@router.callback_query(F.data.startswith("search_"))
+async def search_navigation(callback: CallbackQuery, state: FSMContext):
+    """Листание результатов поиска"""
+    _, offset, tag = callback.data.split("_", 2)
+    args = (await state.get_data()).get("search")
+    if args is None or f"{zlib.crc32(args.encode()):08x}" != tag:
+        await callback.answer("⚠️ Это результаты старого поиска, повторите /search", show_alert=True)
         return
     
+    text, keyboard = await render_search(args, offset=int(offset))
+    try:
+        await callback.message.edit_text(text, parse_mode="HTML", reply_markup=keyboard)
+    except TelegramBadRequest:
+        pass  # страница не изменилась
+    await callback.answer()
+
+
+@router.message(F.text == "🔍 Все отзывы")
+async def all_feedback(message: Message):
+    """Все отзывы"""
+    page = await db.get_feedback_page()
+    text, keyboard = render_page(page)
+    await message.answer(text, parse_mode="HTML", reply_markup=keyboard)
+
+
+def without_feedback_buttons(markup: InlineKeyboardMarkup, feedback_ids: list):
+    """Клавиатура без строк модерации указанных отзывов"""
+    if markup is None:
+        return None
+    feedback_ids = set(feedback_ids)
+    rows = [
+        row for row in markup.inline_keyboard
+        if not any((button.callback_data or "").split("_", 1)[-1] in feedback_ids for button in row)
+    ]
+    # Кнопки массовой модерации не нужны, если модерировать на странице больше нечего
+    if not any((button.callback_data or "").startswith("select_") for row in rows for button in row):
+        rows = [row for row in rows if not any((button.callback_data or "").startswith("bulk_") for button in row)]
+    return InlineKeyboardMarkup(inline_keyboard=rows) if rows else None
+
+
+def notify_authors(feedbacks: list, approved: bool, comment: str = None):
+    """Уведомления авторам об итогах модерации — одной пачкой, по сообщению на автора"""
+    counts = Counter(fb["user_id"] for fb in feedbacks)
+    messages = []
+    for user_id, count in counts.items():
+        if approved:
+            text = "✅ Ваш отзыв одобрен! Спасибо за обратную связь." if count == 1 else f"✅ Одобрено ваших отзывов: {count}. Спасибо!"
+        else:
+            text = "❌ Ваш отзыв отклонён модератором." if count == 1 else f"❌ Отклонено ваших отзывов: {count}."
+        if comment:
+            text += f"\n\n💬 <b>Комментарий:</b> {escape(comment)}"
+        messages.append((user_id, text))
+    sender.notify_many(messages)
+
+
+async def moderate_one(callback: CallbackQuery, approved: bool):
+    """Одобрение или отклонение одного отзыва"""
     feedback_id = callback.data.split("_")[1]
-    await db.approve_feedback(feedback_id)
+    moderate = db.approve_feedback if approved else db.reject_feedback
+    try:
+        before = await moderate(feedback_id, admin_id=callback.from_user.id)
+    except LeaseConflict as e:
+        await callback.answer(
+            f"🔒 Отзыв проверяет другой администратор (до {e.until:%H:%M})", show_alert=True
+        )
+        return
+    if before is None:
+        await callback.answer("⚠️ Отзыв не найден", show_alert=True)
+        return
     
-    await callback.answer("✅ Отзыв одобрен!")
-    await callback.message.edit_reply_markup(reply_markup=None)
+    cluster = f" (и похожих: {len(before['cluster'])})" if before["cluster"] else ""
+    await callback.answer(("✅ Отзыв одобрен!" if approved else "❌ Отзыв отклонён") + cluster)
+    await callback.message.edit_reply_markup(
+        reply_markup=without_feedback_buttons(callback.message.reply_markup, [feedback_id])
+    )
     
-    # Уведомление пользователю
-    try:
-        # Нужно получить user_id из отзыва
-        pass  # Можно доработать
-    except Exception:
-        pass
+    # Уведомление пользователю, если итог модерации изменился
+    if before.get("is_approved") is not approved:
+        notify_authors([before] + before["cluster"], approved)
+    elif before["cluster"]:
+        notify_authors(before["cluster"], approved)
+
 
+@router.callback_query(F.data.startswith("approve_"), flags={"admin_role": ROLE_MODERATOR})
+async def approve_feedback(callback: CallbackQuery):
+    """Одобрение отзыва"""
+    await moderate_one(callback, approved=True)
 
-@router.callback_query(F.data.startswith("reject_"))
+
+@router.callback_query(F.data.startswith("reject_"), flags={"admin_role": ROLE_MODERATOR})
 async def reject_feedback(callback: CallbackQuery):
     """Отклонение отзыва"""
-    if not is_admin(callback.from_user.id):
-        await callback.answer("❌ Нет прав", show_alert=True)
+    await moderate_one(callback, approved=False)
+
+
+@router.callback_query(F.data.startswith("select_"), flags={"admin_role": ROLE_MODERATOR})
+async def toggle_selection(callback: CallbackQuery):
+    """Отметка отзыва для массовой модерации (меняется только клавиатура)"""
+    rows = []
+    for row in callback.message.reply_markup.inline_keyboard:
+        buttons = []
+        for button in row:
+            if button.callback_data == callback.data:
+                mark, number = button.text.split(" ", 1)
+                mark = SELECT_OFF if mark == SELECT_ON else SELECT_ON
+                button = button.model_copy(update={"text": f"{mark} {number}"})
+            buttons.append(button)
+        rows.append(buttons)
+    
+    await callback.message.edit_reply_markup(reply_markup=InlineKeyboardMarkup(inline_keyboard=rows))
+    await callback.answer()
+
+
+@router.callback_query(F.data.in_({"bulk_approve", "bulk_reject"}), flags={"admin_role": ROLE_MODERATOR})
+async def bulk_moderation(callback: CallbackQuery):
+    """Массовая модерация отмеченных отзывов пачки"""
+    approved = callback.data == "bulk_approve"
+    selected = [
+        button for row in callback.message.reply_markup.inline_keyboard for button in row
+        if (button.callback_data or "").startswith("select_") and button.text.startswith(SELECT_ON)
+    ]
+    if not selected:
+        # Случайное нажатие не должно решать судьбу всей пачки
+        await callback.answer(f"Отметьте отзывы кнопками {SELECT_OFF}, затем нажмите ещё раз", show_alert=True)
         return
+    feedback_ids = [button.callback_data.split("_", 1)[1] for button in selected]
     
-    feedback_id = callback.data.split("_")[1]
-    await db.reject_feedback(feedback_id)
+    result = await db.bulk_moderate(feedback_ids, approved, admin_id=callback.from_user.id)
+    notify_authors(result.applied, approved)
     
-    await callback.answer("❌ Отзыв отклонён")
-    await callback.message.edit_reply_markup(reply_markup=None)
+    await callback.answer(
+        f"{'✅ Одобрено' if approved else '❌ Отклонено'}: {len(result.applied)}"
+        f", пропущено (уже проверены или у другого администратора): {result.skipped}",
+        show_alert=True
+    )
+    await callback.message.edit_reply_markup(
+        reply_markup=without_feedback_buttons(callback.message.reply_markup, feedback_ids)
+    )
 
 
-@router.callback_query(F.data.startswith("comment_"))
-async def add_comment(callback: CallbackQuery, state: FSMContext):
-    """Добавление комментария к отзыву"""
-    if not is_admin(callback.from_user.id):
-        await callback.answer("❌ Нет прав", show_alert=True)
+def parse_bulk_rule(args: str):
+    """Разбор правила «approve|reject <оценки> [возраст]», например «approve 4-5 3d»"""
+    parts = (args or "").split()
+    if len(parts) not in (2, 3) or parts[0] not in ("approve", "reject"):
+        raise ValueError(args)
+    
+    low, _, high = parts[1].partition("-")
+    min_rating, max_rating = int(low), int(high or low)
+    if not 1 <= min_rating <= max_rating <= 5:
+        raise ValueError(args)
+    
+    age = timedelta(0)
+    if len(parts) == 3:
+        units = {"h": "hours", "d": "days"}
+        if parts[2][-1] not in units:
+            raise ValueError(args)
+        age = timedelta(**{units[parts[2][-1]]: int(parts[2][:-1])})
+    
+    return parts[0] == "approve", min_rating, max_rating, age
+
+
+@router.message(Command("bulk"), flags={"admin_role": ROLE_MODERATOR})
+async def bulk_by_rule(message: Message, command: CommandObject):
+    """Массовая модерация ожидающих отзывов по правилу"""
+    try:
+        approved, min_rating, max_rating, age = parse_bulk_rule(command.args)
+    except ValueError:
+        await message.answer(
+            "ℹ️ Использование: <code>/bulk approve|reject &lt;оценки&gt; [возраст]</code>\n\n"
+            "Например, <code>/bulk approve 4-5 3d</code> — одобрить ожидающие отзывы "
+            "с оценкой 4–5 старше 3 дней (возраст: 12h, 7d).",
+            parse_mode="HTML"
+        )
         return
     
+    result = await db.moderate_by_rule(
+        approved, min_rating, max_rating, older_than=datetime.now() - age, admin_id=message.from_user.id
+    )
+    notify_authors(result.applied, approved)
+    await message.answer(
+        f"{'✅ Одобрено' if approved else '❌ Отклонено'} отзывов: {len(result.applied)}"
+        f", пропущено (уже проверены или у другого администратора): {result.skipped}",
+        reply_markup=get_admin_keyboard()
+    )
+
+
+@router.callback_query(F.data.startswith("comment_"), flags={"admin_role": ROLE_MODERATOR})
+async def add_comment(callback: CallbackQuery, state: FSMContext):
+    """Добавление комментария к отзыву"""
     feedback_id = callback.data.split("_")[1]
     await state.update_data(feedback_id=feedback_id)
     await state.set_state(AdminState.waiting_for_comment)
@@ -157,28 +497,94 @@ async def add_comment(callback: CallbackQuery, state: FSMContext):
     await callback.message.answer("💬 Введите комментарий:")
 
 
-@router.message(AdminState.waiting_for_comment)
+@router.message(AdminState.waiting_for_comment, flags={"admin_role": ROLE_MODERATOR})
 async def process_comment(message: Message, state: FSMContext):
     """Обработка комментария"""
-    if not is_admin(message.from_user.id):
-        return
-    
     data = await state.get_data()
     feedback_id = data.get("feedback_id")
     
     if feedback_id:
-        await db.approve_feedback(feedback_id, message.text)
-        await message.answer("✅ Комментарий добавлен!")
+        try:
+            before = await db.approve_feedback(feedback_id, message.text, admin_id=message.from_user.id)
+        except LeaseConflict:
+            await message.answer("🔒 Отзыв уже проверяет другой администратор, комментарий не сохранён.")
+            await state.clear()
+            return
+        if before is None:
+            await message.answer("⚠️ Отзыв не найден или уже перенесён в архив — он не изменён, комментарий не сохранён.")
+        else:
+            notify_authors([before] + before["cluster"], True, comment=message.text)
+            await message.answer("✅ Комментарий добавлен!")
     
     await state.clear()
 
 
+# Выгрузки идут в фоне; одновременно — не больше EXPORT_MAX_CONCURRENT
+_export_slots = asyncio.Semaphore(settings.EXPORT_MAX_CONCURRENT)
+_export_tasks = set()
+
+
+async def send_export(message: Message, options):
+    """Выгрузка отзывов файлом: курсор пачками → временный файл → документ"""
+    async with _export_slots:
+        writer = None
+        try:
+            writer = await write_export(
+                db.iter_feedback_batches(
+                    options.filter.query(), EXPORT_PROJECTION,
+                    batch_size=settings.EXPORT_BATCH_SIZE, include_archive=True,
+                ),
+                options.format, options.compress,
+                spool_size=settings.EXPORT_SPOOL_MB * 1024 * 1024,
+            )
+            file, size = await asyncio.to_thread(writer.finish)
+            if size > UPLOAD_LIMIT:
+                await message.answer(
+                    f"⚠️ Файл получился {size / 1024 / 1024:.0f} МБ — больше лимита Telegram в 50 МБ.\n"
+                    "Добавьте <code>gz</code> или сузьте период.",
+                    parse_mode="HTML"
+                )
+                return
+            await message.answer_document(
+                SpooledInputFile(file, options.filename),
+                caption=f"📦 Выгрузка: {writer.rows} отзывов ({options.filter.describe()})",
+                request_timeout=600,
+            )
+        except Exception as e:
+            logger.exception(f"❌ Ошибка выгрузки: {e}")
+            await message.answer("❌ Не удалось подготовить выгрузку, попробуйте позже.")
+        finally:
+            if writer is not None:
+                writer.file.close()
+
+
+@router.message(Command("export"))
+async def export_command(message: Message, command: CommandObject):
+    """Выгрузка отзывов в CSV/JSONL"""
+    try:
+        options = parse_export_args(command.args)
+    except ValueError:
+        await message.answer(
+            "ℹ️ Использование: <code>/export [csv|jsonl] [gz] [оценки] [pending|approved|rejected] [период]</code>\n\n"
+            "Период: <code>2024-01-01..2024-01-31</code>, <code>2024-01-01</code> (с этого дня) "
+            "или <code>..2024-01-31</code>.\n"
+            "Например, <code>/export jsonl gz approved 2024-01-01..2024-03-31</code>",
+            parse_mode="HTML"
+        )
+        return
+    
+    queued = " (в очереди)" if _export_slots.locked() else ""
+    await message.answer(f"⏳ Готовлю выгрузку{queued}: {options.filter.describe()}…")
+    
+    # Не держим хендлер: обработка других обновлений продолжается
+    task = asyncio.create_task(send_export(message, options))
+    _export_tasks.add(task)
+    task.add_done_callback(_export_tasks.discard)
+
+
 @router.message(F.text == "🔙 Главное меню")
 async def back_to_main(message: Message):
     """Возврат в главное меню"""
-    if not is_admin(message.from_user.id):
-        return
-    
     from keyboards.main import get_main_keyboard
     await message.answer(
         "🔙 Возврат в главное меню",
@@ -1,11 +1,14 @@
 from aiogram import Router, F
+from aiogram.exceptions import TelegramBadRequest
 from aiogram.types import Message, CallbackQuery
 from aiogram.fsm.context import FSMContext
 from aiogram.fsm.state import State, StatesGroup
-from config.settings import settings
+from database.admins import roster
 from database.connection import db
-from database.models import FeedbackModel
-from keyboards.main import get_main_keyboard, get_rating_keyboard
+from database.models import FeedbackModel, UserSummary
+from bot.sender import sender
+from config.settings import settings
+from keyboards.main import get_history_keyboard, get_main_keyboard, get_rating_keyboard
 from aiogram.filters import CommandStart
 
 
@@ -73,21 +76,18 @@ async def process_rating(callback: CallbackQuery, state: FSMContext):
     
     result = await db.create_feedback(feedback)
     
-    # Уведомление администраторам
-    for admin_id in settings.admin_ids_list:
-        try:
-            await callback.bot.send_message(
-                admin_id,
-                f"🔔 <b>Новый отзыв!</b>\n\n"
-                f"👤 <b>От:</b> {callback.from_user.get_mention(as_html=True)}\n"
-                f"🆔 ID: <code>{callback.from_user.id}</code>\n"
-                f"⭐️ <b>Оценка:</b> {'⭐️' * (rating or 0)}{'-' * (5 - (rating or 5))} ({rating or 'нет'})\n\n"
-                f"📝 <b>Текст:</b>\n{data['message']}\n\n"
-                f"🆔 Отзыв: <code>{result['_id']}</code>",
-                parse_mode="HTML"
-            )
-        except Exception:
-            pass
+    # Уведомление администраторам (отправляется в фоне, всплески склеиваются в дайджест).
+    # Почти-дубликат ожидающего отзыва лишь пополняет его кластер — о нём не сообщаем
+    if not result.get("is_duplicate"):
+        sender.notify_admins(
+            f"🔔 <b>Новый отзыв!</b>\n\n"
+            f"👤 <b>От:</b> {callback.from_user.mention_html()}\n"
+            f"🆔 ID: <code>{callback.from_user.id}</code>\n"
+            f"⭐️ <b>Оценка:</b> {'⭐️' * (rating or 0)}{'-' * (5 - (rating or 5))} ({rating or 'нет'})\n\n"
+            f"📝 <b>Текст:</b>\n{data['message']}\n\n"
+            f"🆔 Отзыв: <code>{result['_id']}</code>",
+            roster.ids
+        )
     
     await state.clear()
     await callback.message.answer(
@@ -97,12 +97,24 @@ async def process_rating(callback: CallbackQuery, state: FSMContext):
     )
 
 
+def render_history(summary: UserSummary, rows: list, offset: int):
+    """Текст и клавиатура страницы «Мои отзывы»"""
+    text = f"📊 <b>Ваши отзывы</b> ({summary.total}):\n\n"
+    for i, fb in enumerate(rows, offset + 1):
+        status = "✅ Одобрено" if fb.is_approved else "❌ Отклонено" if fb.is_approved is False else "⏳ На проверке"
+        rating = f"⭐️ {fb.rating}/5" if fb.rating else "Без оценки"
+        text += f"{i}. {rating} — {status}\n"
+        text += f"   «{fb.preview}{'...' if fb.truncated else ''}»\n\n"
+    
+    return text, get_history_keyboard(offset, settings.PAGE_SIZE, summary.total)
+
+
 @router.message(F.text == "📊 Мои отзывы")
 async def my_feedback(message: Message):
     """Просмотр своих отзывов"""
-    user_feedbacks = await db.get_user_feedback(message.from_user.id)
+    summary = await db.get_user_summary(message.from_user.id)
     
-    if not user_feedbacks:
+    if not summary.total:
         await message.answer(
             "📭 У вас пока нет отзывов.\n\n"
             "Вы можете оставить первый отзыв, выбрав «📝 Оставить отзыв»",
@@ -110,17 +122,22 @@ async def my_feedback(message: Message):
         )
         return
     
-    text = f"📊 <b>Ваши отзывы</b> ({len(user_feedbacks)}):\n\n"
-    for i, fb in enumerate(user_feedbacks[:5], 1):
-        status = "✅ Одобрено" if fb.get("is_approved") else "❌ Отклонено" if fb.get("is_approved") is False else "⏳ На проверке"
-        rating = f"⭐️ {fb['rating']}/5" if fb.get('rating') else "Без оценки"
-        text += f"{i}. {rating} — {status}\n"
-        text += f"   «{fb['message'][:50]}...»\n\n"
-    
-    if len(user_feedbacks) > 5:
-        text += f"... и ещё {len(user_feedbacks) - 5} отзывов"
+    text, keyboard = render_history(summary, summary.recent, offset=0)
+    await message.answer(text, parse_mode="HTML", reply_markup=keyboard or get_main_keyboard())
+
+
+@router.callback_query(F.data.startswith("mine_"))
+async def my_feedback_page(callback: CallbackQuery):
+    """Листание своих отзывов; архив читается только за пределами оперативных"""
+    offset = int(callback.data.split("_", 1)[1])
+    summary, rows = await db.get_user_history(callback.from_user.id, offset)
+    text, keyboard = render_history(summary, rows, offset)
     
-    await message.answer(text, parse_mode="HTML", reply_markup=get_main_keyboard())
+    try:
+        await callback.message.edit_text(text, parse_mode="HTML", reply_markup=keyboard)
+    except TelegramBadRequest:
+        pass  # страница не изменилась
+    await callback.answer()
 
 
 @router.message(F.text == "ℹ️ Помощь")
@@ -1,3 +1,4 @@
+from typing import Optional
 from aiogram.types import InlineKeyboardMarkup, InlineKeyboardButton, KeyboardButton, ReplyKeyboardMarkup
 
 
@@ -39,7 +40,8 @@ def get_admin_keyboard() -> ReplyKeyboardMarkup:
     keyboard = ReplyKeyboardMarkup(
         keyboard=[
             [KeyboardButton(text="📋 Новые отзывы"), KeyboardButton(text="📊 Статистика")],
-            [KeyboardButton(text="🔍 Все отзывы"), KeyboardButton(text="🔙 Главное меню")]
+            [KeyboardButton(text="🔍 Все отзывы"), KeyboardButton(text="📈 Тренды")],
+            [KeyboardButton(text="🔙 Главное меню")]
         ],
         resize_keyboard=True
     )
@@ -60,3 +62,57 @@ def get_moderation_keyboard(feedback_id: str) -> InlineKeyboardMarkup:
         ]
     )
     return keyboard
+
+
+SELECT_OFF = "☐"
+SELECT_ON = "☑️"
+
+
+def get_search_keyboard(tag: str, offset: int, page_size: int, has_prev: bool, has_next: bool) -> Optional[InlineKeyboardMarkup]:
+    """Навигация по результатам поиска; tag сверяет кнопки с последним запросом"""
+    nav = []
+    if has_prev:
+        nav.append(InlineKeyboardButton(text="◀", callback_data=f"search_{max(offset - page_size, 0)}_{tag}"))
+    if has_next:
+        nav.append(InlineKeyboardButton(text="▶", callback_data=f"search_{offset + page_size}_{tag}"))
+    return InlineKeyboardMarkup(inline_keyboard=[nav]) if nav else None
+
+
+def get_history_keyboard(offset: int, page_size: int, total: int) -> Optional[InlineKeyboardMarkup]:
+    """Листание «Мои отзывы»: новее / старше"""
+    nav = []
+    if offset > 0:
+        nav.append(InlineKeyboardButton(text="⬅️ Новее", callback_data=f"mine_{max(offset - page_size, 0)}"))
+    if offset + page_size < total:
+        nav.append(InlineKeyboardButton(text="Старше ➡️", callback_data=f"mine_{offset + page_size}"))
+    return InlineKeyboardMarkup(inline_keyboard=[nav]) if nav else None
+
+
+def get_claim_keyboard(feedback_ids: list) -> InlineKeyboardMarkup:
+    """Клавиатура закреплённых отзывов: модерация по номеру и массовая модерация"""
+    rows = []
+    for i, feedback_id in enumerate(feedback_ids, 1):
+        rows.append([
+            InlineKeyboardButton(text=f"{SELECT_OFF} {i}", callback_data=f"select_{feedback_id}"),
+            InlineKeyboardButton(text=f"✅ {i}", callback_data=f"approve_{feedback_id}"),
+            InlineKeyboardButton(text=f"❌ {i}", callback_data=f"reject_{feedback_id}"),
+            InlineKeyboardButton(text=f"💬 {i}", callback_data=f"comment_{feedback_id}"),
+        ])
+    if feedback_ids:
+        # Массовая модерация отмеченных отзывов
+        rows.append([
+            InlineKeyboardButton(text="✅ Выбранные", callback_data="bulk_approve"),
+            InlineKeyboardButton(text="❌ Выбранные", callback_data="bulk_reject"),
+        ])
+    
+    return InlineKeyboardMarkup(inline_keyboard=rows)
+
+
+def get_page_keyboard(prev_token: str = None, next_token: str = None) -> Optional[InlineKeyboardMarkup]:
+    """Навигация ◀ / ▶ по страницам всех отзывов"""
+    nav = []
+    if prev_token:
+        nav.append(InlineKeyboardButton(text="◀", callback_data=f"page_prev_{prev_token}"))
+    if next_token:
+        nav.append(InlineKeyboardButton(text="▶", callback_data=f"page_next_{next_token}"))
+    return InlineKeyboardMarkup(inline_keyboard=[nav]) if nav else None
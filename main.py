@@ -1,56 +1,269 @@
+import time
+
+# Отсчёт холодного старта — до импорта aiogram, motor и остального
+STARTED_AT = time.perf_counter()
+
 import asyncio
 import logging
+import signal
 import sys
+from contextlib import suppress
+from datetime import timedelta
+from typing import Optional
+from aiohttp import web
 from aiogram import Bot, Dispatcher
+from aiogram.fsm.storage.memory import MemoryStorage
 from aiogram.client.default import DefaultBotProperties
 from aiogram.enums import ParseMode
 from config.settings import settings
+from database.admins import roster
+from database.archive import FeedbackArchiver
 from database.connection import db
-from handlers import user, admin
+from database.fsm_storage import MongoStorage
+from middlewares.throttling import Budget, MemoryBucketStore, MongoBucketStore, ThrottlingMiddleware
+from bot.dispatch import ProcessUpdateDispatcher, UpdateDispatcher
+from bot.sender import sender
+from bot.webhook import run_webhook, setup_webhook
+from middlewares.metrics import ApiMetricsMiddleware, HandlerMetricsMiddleware, UpdateMetricsMiddleware
+from utils.health import Health, setup_health
+from utils.metrics import Gauge, registry, setup_metrics
 
 
-async def main():
-    """Запуск бота"""
-    
+health = Health(started=STARTED_AT)
+registry.register(Gauge(
+    "bot_startup_seconds", "Длительность холодного старта", lambda: health.startup_seconds
+))
+archiver = FeedbackArchiver(
+    db,
+    after=timedelta(days=settings.ARCHIVE_AFTER_DAYS),
+    batch_size=settings.ARCHIVE_BATCH_SIZE,
+    pause=settings.ARCHIVE_BATCH_PAUSE,
+    interval=settings.ARCHIVE_INTERVAL_MINUTES * 60,
+    ttl=timedelta(days=settings.ARCHIVE_TTL_DAYS) if settings.ARCHIVE_TTL_DAYS > 0 else None,
+)
+
+
+def setup_logging():
+    """Настройка логирования"""
     logging.basicConfig(
         level=logging.INFO,
         format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
         stream=sys.stdout
     )
-    
-    # Подключение к MongoDB
-    try:
-        await db.connect()
-    except Exception as e:
-        logging.error(f"❌ Ошибка подключения к MongoDB: {e}")
-        sys.exit(1)
-    
-    # Инициализация бота
+
+
+def create_bot(session=None) -> Bot:
+    """Бот с middleware исходящих запросов"""
     bot = Bot(
         token=settings.BOT_TOKEN,
+        session=session,
         default=DefaultBotProperties(parse_mode=ParseMode.HTML)
     )
     
-    # Диспетчер
-    dp = Dispatcher()
+    # Все исходящие запросы идут через планировщик с лимитами
+    bot.session.middleware(sender)
+    bot.session.middleware(ApiMetricsMiddleware())
+    return bot
+
+
+async def create_storage():
+    """FSM-хранилище по настройкам"""
+    if settings.FSM_STORAGE == "mongo":
+        storage = MongoStorage(
+            db,
+            cache_size=settings.FSM_CACHE_SIZE,
+            cache_ttl=settings.FSM_CACHE_TTL,
+            flush_delay=settings.FSM_FLUSH_DELAY,
+            state_ttl=settings.FSM_STATE_TTL,
+        )
+        await storage.setup()
+        return storage
+    return MemoryStorage()
+
+
+def load_routers():
+    """Импорт хендлеров — откладывается до старта, чтобы идти параллельно с подключением"""
+    from handlers import admin, user
+    return user.router, admin.router
+
+
+async def create_dispatcher(storage, routers=None) -> Dispatcher:
+    """Диспетчер с middleware и роутерами"""
+    routers = routers or load_routers()
+    dp = Dispatcher(storage=storage)
+    dp.update.outer_middleware(UpdateMetricsMiddleware())
+    
+    # Ограничение частоты — до роутеров и обращений к базе
+    if settings.THROTTLE_ENABLED:
+        if settings.THROTTLE_STORAGE == "mongo":
+            bucket_store = MongoBucketStore(db)
+            await bucket_store.setup()
+        else:
+            bucket_store = MemoryBucketStore(maxsize=settings.THROTTLE_MAX_USERS)
+        throttling = ThrottlingMiddleware(bucket_store, {
+            "submit": Budget(settings.THROTTLE_SUBMIT_PER_MINUTE / 60, settings.THROTTLE_SUBMIT_BURST),
+            "read": Budget(settings.THROTTLE_READ_PER_MINUTE / 60, settings.THROTTLE_READ_BURST),
+            "default": Budget(settings.THROTTLE_DEFAULT_PER_MINUTE / 60, settings.THROTTLE_DEFAULT_BURST),
+        })
+        dp.message.outer_middleware(throttling)
+        dp.callback_query.outer_middleware(throttling)
     
     # Регистрируем роутеры
-    dp.include_router(user.router)
-    dp.include_router(admin.router)
+    dp.include_routers(*routers)
+    
+    handler_metrics = HandlerMetricsMiddleware()
+    for router in routers:
+        router.message.middleware(handler_metrics)
+        router.callback_query.middleware(handler_metrics)
+    
+    return dp
+
+
+def check_storage():
+    """Хранилище в памяти есть только у одного процесса — всё, что делит данные через MongoDB, с ним не работает"""
+    if settings.STORAGE_BACKEND != "memory":
+        return
+    conflicts = [name for name, enabled in (
+        ("FSM_STORAGE=mongo", settings.FSM_STORAGE == "mongo"),
+        ("THROTTLE_STORAGE=mongo", settings.THROTTLE_ENABLED and settings.THROTTLE_STORAGE == "mongo"),
+        ("ADMINS_FROM_DB=true", settings.ADMINS_FROM_DB),
+        ("DISPATCH_MODE=processes", settings.DISPATCH_MODE == "processes"),
+    ) if enabled]
+    if conflicts:
+        raise RuntimeError(f"STORAGE_BACKEND=memory несовместим с {', '.join(conflicts)}")
+
+
+async def create_app(bot: Optional[Bot] = None):
+    """Подключение к MongoDB, бот и диспетчер"""
+    check_storage()
+    bot = bot or create_bot()
+    await sender.start(bot)
+    
+    # Подключение (с повторами) ждёт сеть в потоках Motor — тем временем импортируем хендлеры
+    connecting = asyncio.create_task(db.connect())
+    await asyncio.sleep(0)
+    routers = load_routers()
+    health.mark("handlers")
+    await connecting
+    health.mark("mongodb")
+    
+    if settings.ADMINS_FROM_DB:
+        roster.start(db.db, interval=settings.ADMINS_REFRESH_INTERVAL)
+    
+    dp = await create_dispatcher(await create_storage(), routers)
+    health.mark("dispatcher")
+    
+    return bot, dp
+
+
+async def prepare_bot(bot: Bot):
+    """Проверка токена и снятие вебхука для polling — параллельно с подключением к MongoDB"""
+    await bot.me()
+    if settings.BOT_MODE != "webhook":
+        # Накопившиеся за время рестарта обновления не сбрасываем
+        await bot.delete_webhook(drop_pending_updates=False)
+
+
+async def close_app(bot: Bot, dp: Optional[Dispatcher] = None, timeout: float = 10):
+    """Освобождение ресурсов: отложенные записи и уведомления уходят до закрытия клиентов"""
+    await roster.stop()
+    await archiver.stop()
+    await sender.stop(timeout=timeout)
+    if dp is not None:
+        await dp.storage.close()
+    await db.flush()
+    await db.disconnect()
+    await bot.session.close()
+
+
+async def main():
+    """Запуск бота"""
+    
+    setup_logging()
+    
+    # SIGTERM от платформы (и Ctrl+C) — мягкая остановка
+    loop = asyncio.get_running_loop()
+    stopping = asyncio.Event()
+    for sig in (signal.SIGTERM, signal.SIGINT):
+        with suppress(NotImplementedError):
+            loop.add_signal_handler(sig, stopping.set)
+    
+    # HTTP-сервер поднимается первым: /healthz отвечает уже во время старта
+    app = web.Application()
+    if settings.HEALTH_ENABLED:
+        setup_health(app, health)
+        health.add_check("mongodb", db.ping)
+    if settings.METRICS_ENABLED:
+        setup_metrics(app)
+    webhook = setup_webhook(app) if settings.BOT_MODE == "webhook" else None
+    runner = web.AppRunner(app)
+    if webhook or settings.HEALTH_ENABLED or settings.METRICS_ENABLED:
+        await runner.setup()
+        await web.TCPSite(runner, settings.WEBAPP_HOST, settings.PORT).start()
+        logging.info(f"🌐 HTTP-сервер слушает {settings.WEBAPP_HOST}:{settings.PORT}")
+    
+    bot = create_bot()
+    preparing = asyncio.create_task(prepare_bot(bot))
+    try:
+        bot, dp = await create_app(bot)
+        await preparing
+    except Exception as e:
+        logging.error(f"❌ Ошибка запуска: {e}")
+        preparing.cancel()
+        await runner.cleanup()
+        await sender.stop()
+        await bot.session.close()
+        sys.exit(1)
+    
+    # Обновления раскладываются по воркерам по пользователю
+    if settings.DISPATCH_MODE == "processes":
+        dispatcher = ProcessUpdateDispatcher(
+            dp, bot,
+            processes=settings.DISPATCH_PROCESSES,
+            workers=settings.DISPATCH_WORKERS,
+            queue_size=settings.DISPATCH_QUEUE_SIZE,
+        )
+    else:
+        dispatcher = UpdateDispatcher(
+            dp, bot,
+            workers=settings.DISPATCH_WORKERS,
+            queue_size=settings.DISPATCH_QUEUE_SIZE,
+        )
+    await dispatcher.start()
+    
+    # Перенос в архив — только в основном процессе, не в воркерах DISPATCH_MODE=processes
+    if settings.ARCHIVE_ENABLED:
+        archiver.start()
     
     # Запуск
-    await bot.delete_webhook(drop_pending_updates=True)
+    if webhook:
+        webhook.dispatcher = dispatcher
+        intake = asyncio.create_task(run_webhook(dispatcher, webhook.secret))
+    else:
+        intake = asyncio.create_task(dispatcher.run_polling())
+    health.set_ready()
     logging.info("🚀 Бот запущен...")
     
     try:
-        await dp.start_polling(bot)
+        await asyncio.wait(
+            [intake, asyncio.create_task(stopping.wait())],
+            return_when=asyncio.FIRST_COMPLETED,
+        )
     finally:
-        await db.disconnect()
-        await bot.session.close()
+        # Приём прекращается, принятые обновления и отложенные записи дообрабатываются до дедлайна
+        deadline = loop.time() + settings.SHUTDOWN_TIMEOUT
+        health.draining = True
+        logging.info("🛑 Остановка: новые обновления не принимаются")
+        if webhook:
+            webhook.dispatcher = None
+        intake.cancel()
+        await asyncio.gather(intake, return_exceptions=True)
+        
+        await dispatcher.stop(timeout=max(deadline - loop.time(), 0))
+        await runner.cleanup()
+        await close_app(bot, dp, timeout=max(deadline - loop.time(), 1))
+        logging.info("👋 Бот остановлен")
 
 
 if __name__ == "__main__":
-    try:
-        asyncio.run(main())
-    except KeyboardInterrupt:
-        print("👋 Бот остановлен")
+    asyncio.run(main())
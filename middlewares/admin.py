@@ -0,0 +1,34 @@
+from typing import Any, Awaitable, Callable, Dict
+
+from aiogram import BaseMiddleware
+from aiogram.dispatcher.flags import get_flag
+from aiogram.types import CallbackQuery, TelegramObject
+
+from database.admins import ROLE_VIEWER, AdminRoster
+
+
+class AdminMiddleware(BaseMiddleware):
+    """Доступ к хендлерам роутера только для администраторов
+
+    Требуемая роль задаётся флагом хендлера admin_role (по умолчанию viewer).
+    """
+    
+    def __init__(self, roster: AdminRoster):
+        self.roster = roster
+    
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
+        event: TelegramObject,
+        data: Dict[str, Any],
+    ) -> Any:
+        user = data.get("event_from_user")
+        role = get_flag(data, "admin_role", default=ROLE_VIEWER)
+        
+        if user is None or not self.roster.allows(user.id, role):
+            if isinstance(event, CallbackQuery):
+                await event.answer("❌ Нет прав", show_alert=True)
+            return None
+        
+        data["admin_role"] = self.roster.role(user.id)
+        return await handler(event, data)
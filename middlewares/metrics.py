@@ -0,0 +1,60 @@
+import time
+from typing import Any, Awaitable, Callable, Dict
+
+from aiogram import BaseMiddleware
+from aiogram.client.session.middlewares.base import BaseRequestMiddleware
+from aiogram.types import TelegramObject, Update
+
+from utils.metrics import API_ERRORS, API_LATENCY, HANDLER_ERRORS, HANDLER_LATENCY, UPDATE_LATENCY, observe
+
+
+class UpdateMetricsMiddleware(BaseMiddleware):
+    """Полное время обработки обновления (внешний middleware диспетчера)"""
+    
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
+        event: TelegramObject,
+        data: Dict[str, Any],
+    ) -> Any:
+        started = time.perf_counter()
+        try:
+            return await handler(event, data)
+        finally:
+            event_type = event.event_type if isinstance(event, Update) else type(event).__name__
+            observe(UPDATE_LATENCY, time.perf_counter() - started, event_type)
+
+
+class HandlerMetricsMiddleware(BaseMiddleware):
+    """Время работы и ошибки каждого хендлера (внутренний middleware роутера)"""
+    
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
+        event: TelegramObject,
+        data: Dict[str, Any],
+    ) -> Any:
+        name = data["handler"].callback.__name__
+        started = time.perf_counter()
+        try:
+            return await handler(event, data)
+        except Exception:
+            HANDLER_ERRORS.inc(name)
+            raise
+        finally:
+            observe(HANDLER_LATENCY, time.perf_counter() - started, name)
+
+
+class ApiMetricsMiddleware(BaseRequestMiddleware):
+    """Время запросов к Bot API (middleware сессии бота)"""
+    
+    async def __call__(self, make_request, bot, method):
+        name = method.__api_method__
+        started = time.perf_counter()
+        try:
+            return await make_request(bot, method)
+        except Exception:
+            API_ERRORS.inc(name)
+            raise
+        finally:
+            observe(API_LATENCY, time.perf_counter() - started, name)
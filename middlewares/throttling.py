@@ -0,0 +1,156 @@
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, NamedTuple, Tuple
+
+from aiogram import BaseMiddleware
+from aiogram.types import CallbackQuery, Message, TelegramObject
+from pymongo import ReturnDocument
+from pymongo.errors import DuplicateKeyError, OperationFailure
+
+from database.admins import roster
+from utils.cache import TTLCache
+
+
+THROTTLE_COLLECTION = "throttle_buckets"
+
+
+class Budget(NamedTuple):
+    """Бюджет действия: пополнение (токенов в секунду) и ёмкость корзины"""
+    rate: float
+    burst: float
+
+
+class MemoryBucketStore:
+    """Token bucket'ы в памяти процесса
+
+    Корзина — пара (токены, время) в OrderedDict. При переполнении
+    вытесняются давно не активные пользователи: их корзины всё равно
+    уже наполнились, так что вытеснение ничего не меняет.
+    """
+
+    def __init__(self, maxsize: int = 100000):
+        self.maxsize = maxsize
+        self._buckets: "OrderedDict[Tuple[int, str], Tuple[float, float]]" = OrderedDict()
+
+    async def take(self, user_id: int, action: str, budget: Budget) -> bool:
+        key = (user_id, action)
+        now = time.monotonic()
+        tokens, updated = self._buckets.pop(key, (budget.burst, now))
+        tokens = min(budget.burst, tokens + (now - updated) * budget.rate)
+
+        allowed = tokens >= 1
+        self._buckets[key] = (tokens - 1 if allowed else tokens, now)
+        if len(self._buckets) > self.maxsize:
+            self._buckets.popitem(last=False)
+        return allowed
+
+
+class MongoBucketStore:
+    """Token bucket'ы в MongoDB — общие для всех реплик
+
+    Пополнение и списание выполняются одним атомарным pipeline-обновлением
+    на стороне сервера, неактивные корзины удаляет TTL-индекс.
+    """
+
+    def __init__(self, database, idle_ttl: int = 3600):
+        self._database = database
+        self._idle_ttl = idle_ttl
+
+    @property
+    def collection(self):
+        return self._database.db[THROTTLE_COLLECTION]
+
+    async def setup(self):
+        try:
+            await self.collection.create_index("ts", name="throttle_ttl", expireAfterSeconds=self._idle_ttl)
+        except OperationFailure:
+            await self._database.db.command({
+                "collMod": THROTTLE_COLLECTION,
+                "index": {"name": "throttle_ttl", "expireAfterSeconds": self._idle_ttl},
+            })
+
+    async def take(self, user_id: int, action: str, budget: Budget) -> bool:
+        elapsed = {"$divide": [{"$subtract": ["$$NOW", {"$ifNull": ["$ts", "$$NOW"]}]}, 1000]}
+        refilled = {"$min": [
+            budget.burst,
+            {"$add": [{"$ifNull": ["$tokens", budget.burst]}, {"$multiply": [elapsed, budget.rate]}]},
+        ]}
+        enough = {"$gte": ["$tokens", 1]}
+        key = f"{user_id}:{action}"
+        pipeline = [
+            {"$set": {"tokens": refilled, "ts": "$$NOW"}},
+            {"$set": {
+                "allowed": enough,
+                "tokens": {"$cond": [enough, {"$subtract": ["$tokens", 1]}, "$tokens"]},
+            }},
+        ]
+
+        try:
+            doc = await self._update(key, pipeline, upsert=True)
+        except DuplicateKeyError:
+            # Первые два обновления нового пользователя вставляли корзину одновременно —
+            # она уже есть, списываем из неё
+            doc = await self._update(key, pipeline, upsert=False)
+        # Корзину между попытками удалил TTL-индекс — значит, она была полной
+        return doc["allowed"] if doc is not None else True
+
+    async def _update(self, key: str, pipeline: list, upsert: bool):
+        return await self.collection.find_one_and_update(
+            {"_id": key},
+            pipeline,
+            projection={"allowed": 1},
+            upsert=upsert,
+            return_document=ReturnDocument.AFTER,
+        )
+
+
+def classify(event: TelegramObject) -> str:
+    """Действие, на бюджет которого списывается событие"""
+    if isinstance(event, Message):
+        if event.text == "📊 Мои отзывы":
+            return "read"
+    elif isinstance(event, CallbackQuery):
+        # Отзыв сохраняется (и рассылается админам) на выборе оценки —
+        # это самый дорогой шаг, его и ограничиваем. Если оценку отклонили,
+        # состояние FSM сохраняется и её можно выбрать позже.
+        if (event.data or "").startswith("rating_"):
+            return "submit"
+        if (event.data or "").startswith("mine_"):
+            return "read"
+    return "default"
+
+
+class ThrottlingMiddleware(BaseMiddleware):
+    """Ограничение частоты действий пользователя
+
+    Стоит внешним middleware диспетчера, поэтому лишние события
+    отбрасываются до роутеров и запросов к базе. Администраторы
+    не ограничиваются.
+    """
+
+    def __init__(self, store, budgets: Dict[str, Budget]):
+        self.store = store
+        self.budgets = budgets
+        # Кому уже сказали «слишком часто» — повторно не отвечаем
+        self._warned = TTLCache(maxsize=10000, ttl=10)
+
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
+        event: TelegramObject,
+        data: Dict[str, Any],
+    ) -> Any:
+        user = data.get("event_from_user")
+        if user is None or user.id in roster.ids:
+            return await handler(event, data)
+
+        action = classify(event)
+        if await self.store.take(user.id, action, self.budgets[action]):
+            return await handler(event, data)
+
+        if isinstance(event, CallbackQuery):
+            await event.answer("⏳ Слишком часто, попробуйте чуть позже")
+        elif self._warned.get(user.id) is None:
+            self._warned.set(user.id, True)
+            await event.answer("⏳ Слишком много запросов. Попробуйте через минуту.")
+        return None
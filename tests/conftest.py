@@ -0,0 +1,119 @@
+import asyncio
+import os
+
+import pytest
+
+
+# Обязательные настройки для импорта config.settings без .env
+os.environ.setdefault("BOT_TOKEN", "1:test")
+os.environ.setdefault("ADMIN_IDS", "1")
+
+
+def _matches(doc: dict, query: dict) -> bool:
+    """Подмножество языка запросов MongoDB, которым пользуются проверяемые методы"""
+    for field, condition in query.items():
+        if field == "$and":
+            if not all(_matches(doc, part) for part in condition):
+                return False
+            continue
+        if field == "$or":
+            if not any(_matches(doc, part) for part in condition):
+                return False
+            continue
+        value = doc.get(field)
+        if not isinstance(condition, dict):
+            if value != condition:
+                return False
+            continue
+        for op, operand in condition.items():
+            if op == "$not" and _matches(doc, {field: operand}):
+                return False
+            if op == "$in" and value not in operand:
+                return False
+            if op == "$ne" and value == operand:
+                return False
+            if op == "$exists" and (field in doc) != operand:
+                return False
+            if op == "$gt" and not (value is not None and value > operand):
+                return False
+            if op == "$lt" and not (value is not None and value < operand):
+                return False
+            if op == "$gte" and not (value is not None and value >= operand):
+                return False
+            if op == "$lte" and not (value is not None and value <= operand):
+                return False
+    return True
+
+
+class FakeCursor:
+    def __init__(self, docs):
+        self.docs = docs
+
+    def limit(self, count):
+        return FakeCursor(self.docs[:count])
+
+    async def to_list(self, length):
+        await asyncio.sleep(0)
+        return self.docs[:length] if length else list(self.docs)
+
+
+class FakeResult:
+    def __init__(self, modified_count=0):
+        self.modified_count = modified_count
+
+
+class FakeCollection:
+    """Коллекция MongoDB в памяти: insert_many, find, count_documents, update_many; прочие записи копятся в calls"""
+
+    def __init__(self):
+        self.docs = {}
+        self.calls = []
+
+    async def insert_many(self, docs, ordered=True):
+        await asyncio.sleep(0)
+        for doc in docs:
+            self.docs[doc["_id"]] = dict(doc)
+
+    def find(self, query, projection=None):
+        return FakeCursor([dict(doc) for doc in self.docs.values() if _matches(doc, query)])
+
+    async def count_documents(self, query):
+        await asyncio.sleep(0)
+        return sum(1 for doc in self.docs.values() if _matches(doc, query))
+
+    async def update_many(self, query, update):
+        await asyncio.sleep(0)
+        matched = [doc for doc in self.docs.values() if _matches(doc, query)]
+        for doc in matched:
+            doc.update(update.get("$set", {}))
+            for field in update.get("$unset", {}):
+                doc.pop(field, None)
+        return FakeResult(len(matched))
+
+    def __getattr__(self, name):
+        async def record(*args, **kwargs):
+            await asyncio.sleep(0)  # как сетевой вызов: отдаёт управление циклу
+            self.calls.append((name, args))
+            return FakeResult()
+        return record
+
+
+class FakeMongo:
+    def __init__(self):
+        self.collections = {}
+
+    def __getitem__(self, name):
+        return self.collections.setdefault(name, FakeCollection())
+
+    def __getattr__(self, name):
+        return self[name]
+
+
+@pytest.fixture
+def mongo_db():
+    """Database поверх FakeMongo — без сервера MongoDB"""
+    from database.connection import Database
+
+    db = Database()
+    db.db = FakeMongo()
+    return db
@@ -0,0 +1,70 @@
+import asyncio
+
+from pymongo.errors import AutoReconnect, OperationFailure, ServerSelectionTimeoutError
+
+from database.admins import ADMINS_COLLECTION, ROLE_MODERATOR, ROLE_VIEWER, WATCH_ATTEMPTS, AdminRoster
+
+
+class FakeCursor:
+    def __init__(self, docs):
+        self.docs = docs
+
+    def __aiter__(self):
+        return self._iter()
+
+    async def _iter(self):
+        for doc in self.docs:
+            yield doc
+
+
+class FakeCollection:
+    """Коллекция admins: find отдаёт docs, watch по очереди поднимает ошибки из watch_errors"""
+
+    def __init__(self, docs, watch_errors, find_errors=()):
+        self.docs = docs
+        self.watch_errors = list(watch_errors)
+        self.find_errors = list(find_errors)
+        self.watch_calls = 0
+        self.find_calls = 0
+
+    def find(self, query, projection):
+        self.find_calls += 1
+        if self.find_errors:
+            raise self.find_errors.pop(0)
+        return FakeCursor(list(self.docs))
+
+    def watch(self):
+        self.watch_calls += 1
+        raise self.watch_errors.pop(0) if self.watch_errors else OperationFailure("not a replica set")
+
+
+async def run_watch(collection, seconds: float = 0.2):
+    roster = AdminRoster([1])
+    roster.start({ADMINS_COLLECTION: collection}, interval=0.01)
+    await asyncio.sleep(seconds)
+    await roster.stop()
+    return roster
+
+
+def test_watch_retries_after_network_errors():
+    collection = FakeCollection(
+        [{"_id": 2, "role": ROLE_VIEWER}],
+        [ServerSelectionTimeoutError("failover"), AutoReconnect("primary stepped down")],
+    )
+    roster = asyncio.run(run_watch(collection))
+    assert collection.watch_calls == 3
+    assert roster.role(1) == ROLE_MODERATOR and roster.role(2) == ROLE_VIEWER
+
+
+def test_watch_survives_failed_initial_load():
+    collection = FakeCollection([{"_id": 2, "role": ROLE_VIEWER}], [], find_errors=[AutoReconnect("no primary")])
+    roster = asyncio.run(run_watch(collection))
+    assert roster.role(2) == ROLE_VIEWER
+
+
+def test_watch_falls_back_to_polling():
+    collection = FakeCollection([], [AutoReconnect("down")] * WATCH_ATTEMPTS)
+    asyncio.run(run_watch(collection, seconds=0.3))
+    assert collection.watch_calls == WATCH_ATTEMPTS
+    # после перехода на опрос коллекция продолжает перечитываться
+    assert collection.find_calls > WATCH_ATTEMPTS + 1
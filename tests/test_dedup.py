@@ -0,0 +1,142 @@
+import asyncio
+from datetime import datetime
+
+from bson import ObjectId
+
+from config.settings import settings
+from database.connection import Database
+from database.writer import BatchWriter
+from database.memory import MemoryDatabase
+from database.models import FeedbackModel
+
+MESSAGE = "Курьер опоздал на два часа, заказ привезли холодным и без соуса"
+
+
+def feedback(user_id: int, message: str = MESSAGE, rating: int = 1) -> FeedbackModel:
+    return FeedbackModel(user_id=user_id, first_name="u", message=message, rating=rating)
+
+
+def test_duplicate_takes_verdict_of_head_moderated_before_insert(monkeypatch):
+    """Голова проверена между $inc duplicates и записью дубликата"""
+    monkeypatch.setattr(settings, "DEDUP_ENABLED", True)
+    db = MemoryDatabase()
+    head = asyncio.run(db.create_feedback(feedback(1)))
+    assign_cluster = db._assign_cluster
+
+    def assign_then_moderate_head(doc):
+        assign_cluster(doc)
+        db._moderate_many([db.feedback[ObjectId(head["_id"])]], False, "спам")
+
+    monkeypatch.setattr(db, "_assign_cluster", assign_then_moderate_head)
+    duplicate = asyncio.run(db.create_feedback(feedback(2)))
+
+    assert duplicate["is_duplicate"] and duplicate["is_moderated"]
+    assert duplicate["is_approved"] is False and duplicate["admin_comment"] == "спам"
+    assert db.stats["pending"] == 0 and db.stats["rejected"] == 2
+
+
+def test_short_reviews_are_not_folded(monkeypatch):
+    monkeypatch.setattr(settings, "DEDUP_ENABLED", True)
+    db = MemoryDatabase()
+    asyncio.run(db.create_feedback(feedback(1, "Отлично!")))
+    second = asyncio.run(db.create_feedback(feedback(2, "Отлично!")))
+    assert not second.get("is_duplicate")
+    assert len(db._queue) == 2
+
+
+class Cursor:
+    def __init__(self, docs):
+        self.docs = docs
+
+    async def to_list(self, length):
+        return self.docs
+
+
+class HeadsCollection:
+    def __init__(self, heads):
+        self.heads = heads
+        self.queries = []
+
+    def find(self, query, projection):
+        self.queries.append(query)
+        return Cursor([head for head in self.heads if head["_id"] in query["_id"]["$in"]])
+
+
+class FakeDatabase:
+    def __init__(self, collection):
+        self.feedback = collection
+
+
+def test_settle_duplicates_copies_verdict_of_moderated_head():
+    head_id, other_id = ObjectId(), ObjectId()
+    db = Database()
+    db.db = FakeDatabase(HeadsCollection([{"_id": head_id, "is_approved": True, "admin_comment": "ок"}]))
+    moderated = []
+
+    async def moderate_many(query, approved, admin_comment=None, admin_id=None):
+        moderated.append((query, approved, admin_comment))
+        return [{"_id": i} for i in query["_id"]["$in"]]
+
+    db._moderate_many = moderate_many
+    docs = [
+        {"_id": ObjectId(), "is_duplicate": True, "cluster_id": head_id, "is_moderated": False},
+        {"_id": ObjectId(), "is_duplicate": True, "cluster_id": other_id, "is_moderated": False},
+        {"_id": ObjectId(), "is_moderated": False},
+    ]
+    asyncio.run(db._settle_duplicates(docs))
+
+    assert moderated == [({"_id": {"$in": [docs[0]["_id"]]}}, True, "ок")]
+    assert docs[0]["is_moderated"] and docs[0]["is_approved"] is True
+    assert not docs[1]["is_moderated"]
+
+
+def test_batch_writer_settles_duplicate_of_head_moderated_before_insert(monkeypatch, mongo_db):
+    """То же на пути групповой записи: голова проверена, пока дубликат ждал в пачке"""
+    monkeypatch.setattr(settings, "DEDUP_ENABLED", True)
+    feedback_docs = mongo_db.db.feedback.docs
+    head_id = ObjectId()
+    feedback_docs[head_id] = {"_id": head_id, "is_moderated": False, "duplicates": 0}
+    mongo_db._writer = BatchWriter(
+        lambda: mongo_db.db.feedback, on_inserted=mongo_db._on_feedback_inserted, window=0.001
+    )
+
+    async def assign_cluster(doc):
+        doc.update(cluster_id=head_id, is_duplicate=True)
+        feedback_docs[head_id].update(is_moderated=True, is_approved=True, admin_comment="ок")
+
+    monkeypatch.setattr(mongo_db, "_assign_cluster", assign_cluster)
+    result = asyncio.run(mongo_db.create_feedback(feedback(2)))
+
+    stored = feedback_docs[ObjectId(result["_id"])]
+    assert stored["is_duplicate"] and stored["is_moderated"]
+    assert stored["is_approved"] is True and stored["admin_comment"] == "ок"
+
+
+def test_rule_moderation_takes_clusters_of_matched_heads(monkeypatch):
+    monkeypatch.setattr(settings, "DEDUP_ENABLED", True)
+    db = MemoryDatabase()
+    asyncio.run(db.create_feedback(feedback(1, rating=5)))
+    duplicate = asyncio.run(db.create_feedback(feedback(2, rating=3)))
+    assert duplicate["is_duplicate"]
+
+    result = asyncio.run(db.moderate_by_rule(True, min_rating=4))
+
+    assert {doc["_id"] for doc in result.applied} == {ObjectId(doc_id) for doc_id in db.feedback}
+    assert db.feedback[ObjectId(duplicate["_id"])]["is_approved"] is True
+    assert db.stats["pending"] == 0
+
+
+def test_rule_moderation_takes_clusters_of_matched_heads_in_mongo(mongo_db):
+    docs = mongo_db.db.feedback.docs
+    head_id, duplicate_id = ObjectId(), ObjectId()
+    created = datetime(2024, 1, 1)
+    docs[head_id] = {"_id": head_id, "user_id": 1, "rating": 5, "created_at": created, "is_moderated": False}
+    docs[duplicate_id] = {
+        "_id": duplicate_id, "user_id": 2, "rating": 3, "created_at": created,
+        "is_moderated": False, "is_duplicate": True, "cluster_id": head_id,
+    }
+
+    result = asyncio.run(mongo_db.moderate_by_rule(False, min_rating=4))
+
+    assert [doc["_id"] for doc in result.applied] == [head_id, duplicate_id]
+    assert docs[duplicate_id]["is_moderated"] and docs[duplicate_id]["is_approved"] is False
@@ -0,0 +1,85 @@
+import asyncio
+
+from aiogram.fsm.storage.base import StorageKey
+from pymongo import DeleteOne
+
+from database.fsm_storage import FSM_COLLECTION, MongoStorage
+
+KEY = StorageKey(bot_id=1, chat_id=7, user_id=7)
+
+
+class StatesCollection:
+    """Коллекция fsm_states, общая для реплик"""
+
+    def __init__(self):
+        self.docs = {}
+        self.reads = 0
+        self.gate = None  # bulk_write ждёт его, прежде чем применить пачку
+
+    async def find_one(self, query, projection):
+        self.reads += 1
+        await asyncio.sleep(0)
+        doc = self.docs.get(query["_id"])
+        return dict(doc) if doc else None
+
+    async def bulk_write(self, requests, ordered):
+        await asyncio.sleep(0)
+        if self.gate is not None:
+            await self.gate.wait()
+        for request in requests:
+            key = request._filter["_id"]
+            if isinstance(request, DeleteOne):
+                self.docs.pop(key, None)
+            else:
+                self.docs.setdefault(key, {"_id": key}).update(request._doc["$set"])
+
+
+class Database:
+    def __init__(self, collection):
+        self.db = {FSM_COLLECTION: collection}
+
+
+def test_replicas_see_each_others_states():
+    collection = StatesCollection()
+    replica_a, replica_b = MongoStorage(Database(collection)), MongoStorage(Database(collection))
+
+    async def main():
+        await replica_b.set_state(KEY, "FeedbackState:waiting_for_message")
+        await replica_b.close()
+        assert await replica_b.get_state(KEY) == "FeedbackState:waiting_for_message"
+
+        await replica_a.set_state(KEY, "FeedbackState:waiting_for_rating")
+        await replica_a.close()
+        # Нажатие оценки пришло на другую реплику
+        assert await replica_b.get_state(KEY) == "FeedbackState:waiting_for_rating"
+
+    asyncio.run(main())
+
+
+def test_own_writes_are_visible_while_the_batch_is_written():
+    collection = StatesCollection()
+    storage = MongoStorage(Database(collection), flush_delay=0)
+
+    async def main():
+        collection.gate = asyncio.Event()
+        await storage.set_state(KEY, "FeedbackState:waiting_for_rating")
+        flushing = asyncio.create_task(storage.flush())
+        await asyncio.sleep(0)  # пачка ушла в bulk_write, база её ещё не отражает
+        assert await storage.get_state(KEY) == "FeedbackState:waiting_for_rating"
+        collection.gate.set()
+        await flushing
+        await storage.close()
+
+    asyncio.run(main())
+
+
+def test_read_cache_is_opt_in():
+    collection = StatesCollection()
+    storage = MongoStorage(Database(collection), cache_ttl=30)
+
+    async def main():
+        await storage.get_state(KEY)
+        await storage.get_state(KEY)
+
+    asyncio.run(main())
+    assert collection.reads == 1
@@ -0,0 +1,26 @@
+import pytest
+
+from database.connection import Database
+from database.indexes import QUERY_SHAPES, QueryShape, supporting_index, unregistered_queries
+
+
+def test_every_query_method_declares_shapes():
+    assert unregistered_queries(Database) == []
+
+
+@pytest.mark.parametrize("shape", QUERY_SHAPES, ids=lambda shape: shape.name)
+def test_every_shape_has_index(shape):
+    assert supporting_index(shape) is not None
+
+
+def test_shape_without_index_is_reported():
+    assert supporting_index(QueryShape("username", "feedback", {"username": "x"})) is None
+    assert supporting_index(QueryShape("sort", "feedback", {"is_approved": True}, [("rating", 1)])) is None
+
+
+def test_undeclared_query_method_is_reported():
+    class Storage(Database):
+        async def find_by_username(self, username):
+            return await self.db.feedback.find_one({"username": username})
+
+    assert unregistered_queries(Storage) == ["find_by_username"]
@@ -0,0 +1,62 @@
+import asyncio
+import random
+from datetime import datetime, timedelta
+
+from database.memory import MemoryDatabase
+from database.models import FeedbackModel
+
+
+def filled(count: int = 60) -> MemoryDatabase:
+    db = MemoryDatabase()
+    rng = random.Random(1)
+    start = datetime(2024, 1, 1)
+
+    async def main():
+        for n in range(count):
+            await db.create_feedback(FeedbackModel(
+                user_id=n % 7, first_name="u", message=f"отзыв {n}", rating=rng.choice([None, 1, 2, 3, 4, 5]),
+                created_at=start + timedelta(minutes=n),
+            ))
+
+    asyncio.run(main())
+    return db
+
+
+def test_claims_come_from_the_queue_and_renew_own_leases():
+    db = filled()
+
+    async def main():
+        first = await db.claim_feedback(1, count=5)
+        second = await db.claim_feedback(2, count=5)
+        again = await db.claim_feedback(1, count=5)
+        return first, second, again
+
+    first, second, again = asyncio.run(main())
+    oldest = sorted(db.feedback.values(), key=lambda doc: (doc["created_at"], doc["_id"]))
+    assert [row.id for row in first.items] == [str(doc["_id"]) for doc in oldest[:5]]
+    assert [row.id for row in second.items] == [str(doc["_id"]) for doc in oldest[5:10]]
+    assert [row.id for row in again.items] == [row.id for row in first.items]
+
+
+def test_rule_archive_and_purge_read_their_ranges():
+    db = filled()
+
+    async def main():
+        await db.approve_feedback(str(next(iter(db.feedback))))
+        result = await db.moderate_by_rule(False, min_rating=2, max_rating=3, older_than=datetime(2024, 1, 1, 0, 30))
+        expected = {
+            doc["_id"] for doc in db.feedback.values()
+            if doc["rating"] in (2, 3) and doc["created_at"] < datetime(2024, 1, 1, 0, 30)
+        } - {next(iter(db.feedback))}
+        assert {doc["_id"] for doc in result.applied} == expected
+
+        moderated = {i for i, doc in db.feedback.items() if doc["is_moderated"]}
+        assert await db.archive_feedback(datetime.now() + timedelta(seconds=1), batch_size=1000) == len(moderated)
+        assert set(db.archive) == moderated and not moderated & set(db.feedback)
+
+        cutoff = datetime(2024, 1, 1, 0, 10)
+        expected = sum(1 for doc in db.archive.values() if doc["created_at"] < cutoff)
+        assert expected and await db.purge_archive(cutoff) == expected
+        assert all(doc["created_at"] >= cutoff for doc in db.archive.values())
+
+    asyncio.run(main())
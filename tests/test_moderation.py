@@ -0,0 +1,40 @@
+import asyncio
+from datetime import datetime, timedelta
+
+from bson import ObjectId
+
+from database.memory import MemoryDatabase
+from database.models import FeedbackModel
+
+
+def test_rule_moderation_counts_items_leased_to_others():
+    db = MemoryDatabase()
+
+    async def main():
+        free = await db.create_feedback(FeedbackModel(user_id=1, first_name="u", message="отлично", rating=5))
+        leased = await db.create_feedback(FeedbackModel(user_id=2, first_name="u", message="хорошо", rating=4))
+        db.feedback[ObjectId(leased["_id"])].update(
+            lease_owner=2, lease_until=datetime.now() + timedelta(minutes=10)
+        )
+        result = await db.moderate_by_rule(True, min_rating=4, older_than=datetime.now() + timedelta(seconds=1), admin_id=1)
+        assert [str(doc["_id"]) for doc in result.applied] == [free["_id"]]
+        assert result.skipped == 1
+
+    asyncio.run(main())
+
+
+def test_rule_moderation_counts_items_leased_to_others_in_mongo(mongo_db):
+    docs = mongo_db.db.feedback.docs
+    created = datetime(2024, 1, 1)
+    free_id, leased_id = ObjectId(), ObjectId()
+    docs[free_id] = {"_id": free_id, "user_id": 1, "rating": 5, "created_at": created, "is_moderated": False}
+    docs[leased_id] = {
+        "_id": leased_id, "user_id": 2, "rating": 4, "created_at": created, "is_moderated": False,
+        "lease_owner": 2, "lease_until": datetime.now() + timedelta(minutes=10),
+    }
+
+    result = asyncio.run(mongo_db.moderate_by_rule(True, min_rating=4, admin_id=1))
+
+    assert [doc["_id"] for doc in result.applied] == [free_id]
+    assert result.skipped == 1
+    assert not docs[leased_id]["is_moderated"]
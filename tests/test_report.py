@@ -0,0 +1,39 @@
+import asyncio
+
+import handlers.admin as admin
+from database.memory import MemoryDatabase
+from database.models import FeedbackModel
+
+
+def test_report_is_cached_until_feedback_changes(monkeypatch):
+    db = MemoryDatabase()
+    monkeypatch.setattr(admin, "db", db)
+    monkeypatch.setattr(admin, "_report_cache", {})
+    scans = []
+    iter_report_batches = db.iter_report_batches
+
+    def counted(batch_size):
+        scans.append(batch_size)
+        return iter_report_batches(batch_size)
+
+    monkeypatch.setattr(db, "iter_report_batches", counted)
+
+    async def main():
+        five = await db.create_feedback(FeedbackModel(user_id=1, first_name="u", message="отлично", rating=5))
+        one = await db.create_feedback(FeedbackModel(user_id=2, first_name="u", message="плохо", rating=1))
+        await db.approve_feedback(five["_id"])
+        await db.reject_feedback(one["_id"])
+        first = await admin.get_report()
+        assert await admin.get_report() is first and len(scans) == 1
+        assert first.approval_by_rating[5] == 1.0
+
+        # Повторная модерация навстречу друг другу оставляет счётчики прежними
+        stats = await db.get_feedback_stats()
+        await db.reject_feedback(five["_id"])
+        await db.approve_feedback(one["_id"])
+        assert await db.get_feedback_stats() == stats
+        second = await admin.get_report()
+        assert len(scans) == 2
+        assert second.approval_by_rating[5] == 0.0 and second.approval_by_rating[1] == 1.0
+
+    asyncio.run(main())
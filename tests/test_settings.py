@@ -0,0 +1,19 @@
+import pytest
+from pydantic import ValidationError
+
+from config.settings import Settings
+
+
+def test_webhook_mode_requires_url():
+    with pytest.raises(ValidationError, match="WEBHOOK_URL"):
+        Settings(BOT_TOKEN="1:test", ADMIN_IDS="1", BOT_MODE="webhook", WEBHOOK_URL="")
+
+
+def test_unknown_bot_mode_is_rejected():
+    with pytest.raises(ValidationError, match="BOT_MODE"):
+        Settings(BOT_TOKEN="1:test", ADMIN_IDS="1", BOT_MODE="webhooks")
+
+
+def test_webhook_mode_with_url():
+    settings = Settings(BOT_TOKEN="1:test", ADMIN_IDS="1", BOT_MODE="webhook", WEBHOOK_URL="https://bot.example")
+    assert settings.WEBHOOK_URL == "https://bot.example"
@@ -0,0 +1,30 @@
+import asyncio
+
+from pymongo.errors import DuplicateKeyError
+
+from middlewares.throttling import Budget, MongoBucketStore
+
+
+class RacingCollection:
+    """Первая вставка проигрывает гонку конкурентному upsert"""
+
+    def __init__(self):
+        self.calls = []
+
+    async def find_one_and_update(self, query, pipeline, projection, upsert, return_document):
+        self.calls.append(upsert)
+        if upsert:
+            raise DuplicateKeyError("E11000 duplicate key error")
+        return {"_id": query["_id"], "allowed": True}
+
+
+class FakeDatabase:
+    def __init__(self, collection):
+        self.db = {"throttle_buckets": collection}
+
+
+def test_take_retries_without_upsert_after_duplicate_key():
+    collection = RacingCollection()
+    store = MongoBucketStore(FakeDatabase(collection))
+    assert asyncio.run(store.take(1, "submit", Budget(rate=1, burst=3))) is True
+    assert collection.calls == [True, False]
@@ -0,0 +1,57 @@
+import asyncio
+
+from bson import ObjectId
+
+from database.connection import USER_VERSIONS_COLLECTION
+from database.models import FeedbackModel
+from database.writer import BatchWriter
+from conftest import FakeCollection
+
+
+def test_on_inserted_runs_before_callers_wake_up():
+    collection = FakeCollection()
+    seen = []
+
+    async def on_inserted(docs):
+        await asyncio.sleep(0)
+        seen.extend(type(doc["_id"]) for doc in docs)
+
+    async def main():
+        writer = BatchWriter(lambda: collection, on_inserted=on_inserted, window=0.001)
+
+        async def insert(n):
+            doc = {"n": n}
+            inserted_id = await writer.insert(doc)
+            # Вызывающий просыпается только после обработчика пачки
+            assert len(seen) == 3
+            doc["_id"] = str(inserted_id)
+
+        await asyncio.gather(*(insert(n) for n in range(3)))
+
+    asyncio.run(main())
+    assert seen == [ObjectId] * 3
+
+
+def test_create_feedback_through_batch_writer(mongo_db):
+    ids_seen = []
+    on_inserted = mongo_db._on_feedback_inserted
+
+    async def record_ids(docs):
+        ids_seen.extend(type(doc["_id"]) for doc in docs)
+        await on_inserted(docs)
+
+    mongo_db._writer = BatchWriter(lambda: mongo_db.db.feedback, on_inserted=record_ids, window=0.001)
+    versions = mongo_db.db[USER_VERSIONS_COLLECTION]
+
+    async def main():
+        results = await asyncio.gather(*(
+            mongo_db.create_feedback(FeedbackModel(user_id=user_id, first_name="u", message="отзыв"))
+            for user_id in (1, 2)
+        ))
+        # Версии «Мои отзывы» подняты до того, как create_feedback вернул управление
+        assert [name for name, _ in versions.calls] == ["bulk_write"]
+        return results
+
+    results = asyncio.run(main())
+    assert ids_seen == [ObjectId, ObjectId]
+    assert all(isinstance(result["_id"], str) for result in results)
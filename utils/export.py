@@ -0,0 +1,119 @@
+import asyncio
+import csv
+import gzip
+import io
+import json
+from datetime import datetime
+from tempfile import SpooledTemporaryFile
+from typing import AsyncIterator, List, NamedTuple, Tuple
+
+from aiogram.types.input_file import InputFile
+
+from utils.filters import FeedbackFilter, parse_feedback_filter
+
+
+EXPORT_FORMATS = ("csv", "jsonl")
+EXPORT_FIELDS = (
+    "_id", "created_at", "user_id", "username", "first_name", "last_name", "rating",
+    "is_moderated", "is_approved", "admin_comment", "moderated_at", "message",
+)
+# Проекция запроса: только выгружаемые поля
+EXPORT_PROJECTION = {field: 1 for field in EXPORT_FIELDS}
+# Предел размера файла, который бот может отправить через Bot API
+UPLOAD_LIMIT = 50 * 1024 * 1024
+
+
+class ExportOptions(NamedTuple):
+    """Параметры /export"""
+    format: str
+    compress: bool
+    filter: FeedbackFilter
+
+    @property
+    def filename(self) -> str:
+        return f"feedback_{datetime.now():%Y%m%d_%H%M}.{self.format}" + (".gz" if self.compress else "")
+
+
+def parse_export_args(args: str) -> ExportOptions:
+    """Разбор «[csv|jsonl] [gz] [статус] [период]»; неизвестный аргумент — ValueError"""
+    feedback_filter, rest = parse_feedback_filter((args or "").split())
+    fmt, compress = "csv", False
+    for token in rest:
+        if token in EXPORT_FORMATS:
+            fmt = token
+        elif token == "gz":
+            compress = True
+        else:
+            raise ValueError(token)
+    return ExportOptions(fmt, compress, feedback_filter)
+
+
+def _plain(value):
+    if isinstance(value, datetime):
+        return value.isoformat()
+    if value is None or isinstance(value, (str, int, float, bool)):
+        return value
+    return str(value)  # ObjectId
+
+
+class ExportWriter:
+    """Построчная запись выгрузки в SpooledTemporaryFile
+
+    Пока выгрузка меньше spool_size, она лежит в памяти, дальше файл
+    переезжает на диск — память не растёт с размером коллекции.
+    """
+
+    def __init__(self, fmt: str, compress: bool, spool_size: int):
+        self.fmt = fmt
+        self.rows = 0
+        self.file = SpooledTemporaryFile(max_size=spool_size)
+        self._gzip = gzip.GzipFile(fileobj=self.file, mode="wb") if compress else None
+        # newline="" — переводы строк внутри текста отзывов csv экранирует сам
+        self._text = io.TextIOWrapper(self._gzip or self.file, encoding="utf-8", newline="")
+        if fmt == "csv":
+            self._csv = csv.writer(self._text)
+            self._csv.writerow(EXPORT_FIELDS)
+
+    def write(self, docs: List[dict]):
+        for doc in docs:
+            row = [_plain(doc.get(field)) for field in EXPORT_FIELDS]
+            if self.fmt == "csv":
+                self._csv.writerow(row)
+            else:
+                self._text.write(json.dumps(dict(zip(EXPORT_FIELDS, row)), ensure_ascii=False) + "\n")
+        self.rows += len(docs)
+
+    def finish(self) -> Tuple[SpooledTemporaryFile, int]:
+        """Завершение записи; возвращает файл (в начале) и его размер"""
+        self._text.flush()
+        self._text.detach()
+        if self._gzip:
+            self._gzip.close()  # fileobj при этом остаётся открытым
+        size = self.file.tell()
+        self.file.seek(0)
+        return self.file, size
+
+
+async def write_export(batches: AsyncIterator[List[dict]], fmt: str, compress: bool, spool_size: int) -> ExportWriter:
+    """Кодирование пачек курсора в файл; кодирование и сжатие — в потоке, цикл событий свободен"""
+    writer = ExportWriter(fmt, compress, spool_size)
+    try:
+        async for batch in batches:
+            await asyncio.to_thread(writer.write, batch)
+    except BaseException:
+        writer.file.close()
+        raise
+    return writer
+
+
+class SpooledInputFile(InputFile):
+    """Отправка временного файла выгрузки без чтения целиком в память"""
+
+    def __init__(self, file, filename: str, chunk_size: int = 64 * 1024):
+        super().__init__(filename=filename, chunk_size=chunk_size)
+        self.file = file
+
+    async def read(self, bot):
+        self.file.seek(0)
+        while chunk := await asyncio.to_thread(self.file.read, self.chunk_size):
+            yield chunk
@@ -0,0 +1,94 @@
+import re
+from datetime import datetime, timedelta
+from typing import Iterable, List, NamedTuple, Optional, Tuple
+
+
+# Статусы отзыва в аргументах команд и соответствующие условия запроса
+STATUSES = {
+    "pending": {"is_moderated": False},
+    "approved": {"is_approved": True},
+    "rejected": {"is_approved": False},
+}
+STATUS_TITLES = {"pending": "на проверке", "approved": "одобренные", "rejected": "отклонённые"}
+_RATING = re.compile(r"^([1-5])(?:-([1-5]))?$")
+
+
+class FeedbackFilter(NamedTuple):
+    """Фильтр отзывов по статусу, оценке и дате создания (until — не включая)"""
+    status: Optional[str] = None
+    since: Optional[datetime] = None
+    until: Optional[datetime] = None
+    min_rating: Optional[int] = None
+    max_rating: Optional[int] = None
+
+    def query(self) -> dict:
+        query = dict(STATUSES[self.status]) if self.status else {}
+        if self.min_rating:
+            query["rating"] = {"$gte": self.min_rating, "$lte": self.max_rating}
+        created = {}
+        if self.since:
+            created["$gte"] = self.since
+        if self.until:
+            created["$lt"] = self.until
+        if created:
+            query["created_at"] = created
+        return query
+
+    def matches(self, doc: dict) -> bool:
+        """Проверка документа тем же условием, что и query(), без MongoDB"""
+        if self.status and any(doc.get(field) != value for field, value in STATUSES[self.status].items()):
+            return False
+        if self.min_rating and (doc.get("rating") or 0) not in range(self.min_rating, self.max_rating + 1):
+            return False
+        if self.since and doc["created_at"] < self.since:
+            return False
+        return not (self.until and doc["created_at"] >= self.until)
+
+    def describe(self) -> str:
+        parts = [STATUS_TITLES[self.status]] if self.status else []
+        if self.min_rating:
+            ratings = f"{self.min_rating}–{self.max_rating}" if self.max_rating != self.min_rating else self.min_rating
+            parts.append(f"оценка {ratings}")
+        if self.since:
+            parts.append(f"с {self.since:%d.%m.%Y}")
+        if self.until:
+            parts.append(f"по {self.until - timedelta(days=1):%d.%m.%Y}")
+        return ", ".join(parts) or "все отзывы"
+
+
+def _parse_day(value: str) -> datetime:
+    return datetime.strptime(value, "%Y-%m-%d")
+
+
+def parse_feedback_filter(tokens: Iterable[str]) -> Tuple[FeedbackFilter, List[str]]:
+    """Разбор статуса, оценок «4-5» и периода «2024-01-01..2024-01-31» (или одной даты — с этого дня)
+
+    Возвращает фильтр и нераспознанные аргументы для самой команды.
+    Некорректная дата или повтор статуса/оценок/периода — ValueError.
+    """
+    status = since = until = min_rating = max_rating = None
+    rest = []
+    for token in tokens:
+        rating = _RATING.match(token)
+        if rating:
+            low, high = int(rating.group(1)), int(rating.group(2) or rating.group(1))
+            if min_rating or low > high:
+                raise ValueError(token)
+            min_rating, max_rating = low, high
+        elif token in STATUSES:
+            if status:
+                raise ValueError(token)
+            status = token
+        elif token[:1].isdigit() or token.startswith(".."):
+            if since or until:
+                raise ValueError(token)
+            start, dots, end = token.partition("..")
+            since = _parse_day(start) if start else None
+            until = _parse_day(end) + timedelta(days=1) if end else None
+            if not dots and since is None:
+                raise ValueError(token)
+            if since and until and since >= until:
+                raise ValueError(token)
+        else:
+            rest.append(token)
+    return FeedbackFilter(status, since, until, min_rating, max_rating), rest
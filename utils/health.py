@@ -0,0 +1,69 @@
+import asyncio
+import logging
+import time
+from typing import Awaitable, Callable, Dict
+
+from aiohttp import web
+
+
+logger = logging.getLogger(__name__)
+
+
+class Health:
+    """Состояние процесса для проверок платформы
+
+    /healthz — процесс жив и цикл событий отвечает. /readyz — старт
+    завершён, остановка не началась и зависимости (MongoDB) отвечают:
+    только тогда на инстанс стоит направлять трафик.
+    """
+
+    def __init__(self, started: float = None, check_timeout: float = 2):
+        self.check_timeout = check_timeout
+        self.ready = False
+        self.draining = False
+        self.stages: Dict[str, float] = {}
+        self._checks: Dict[str, Callable[[], Awaitable]] = {}
+        # Отсчёт — с переданного момента (начала импорта main), иначе с создания
+        self._started = started if started is not None else time.perf_counter()
+        self._last = self._started
+
+    def add_check(self, name: str, check: Callable[[], Awaitable]):
+        self._checks[name] = check
+
+    def mark(self, stage: str):
+        """Окончание этапа старта: время этапа в stages"""
+        now = time.perf_counter()
+        self.stages[stage] = now - self._last
+        self._last = now
+
+    @property
+    def startup_seconds(self) -> float:
+        return self._last - self._started if self.ready else 0.0
+
+    def set_ready(self):
+        self.mark("ready")
+        self.ready = True
+        stages = ", ".join(f"{name} {seconds * 1000:.0f} мс" for name, seconds in self.stages.items())
+        logger.info(f"⏱ Холодный старт: {self.startup_seconds * 1000:.0f} мс ({stages})")
+
+    async def liveness(self, request: web.Request) -> web.Response:
+        return web.Response(text="ok")
+
+    async def readiness(self, request: web.Request) -> web.Response:
+        if self.draining:
+            return web.Response(status=503, text="draining")
+        if not self.ready:
+            return web.Response(status=503, text="starting")
+
+        for name, check in self._checks.items():
+            try:
+                await asyncio.wait_for(check(), self.check_timeout)
+            except Exception as e:
+                logger.warning(f"⚠️ Проверка готовности {name} не прошла: {e}")
+                return web.Response(status=503, text=f"{name} unavailable")
+        return web.Response(text="ready")
+
+
+def setup_health(app: web.Application, health: Health):
+    app.router.add_get("/healthz", health.liveness)
+    app.router.add_get("/readyz", health.readiness)
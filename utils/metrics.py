@@ -0,0 +1,166 @@
+import logging
+import threading
+from typing import Callable, Dict, Sequence, Tuple
+
+from aiohttp import web
+from pymongo import monitoring
+
+from config.settings import settings
+
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+
+
+def _format_labels(names: Sequence[str], values: Tuple[str, ...], extra: str = "") -> str:
+    pairs = [f'{name}="{value}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+class Counter:
+    """Счётчик в формате Prometheus"""
+
+    kind = "counter"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values: Dict[Tuple[str, ...], float] = {}
+        # Обновляется и из потоков pymongo
+        self._lock = threading.Lock()
+
+    def inc(self, *labels: str, amount: float = 1):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def samples(self):
+        with self._lock:
+            items = list(self._values.items())
+        for labels, value in items:
+            yield f"{self.name}{_format_labels(self.labelnames, labels)} {value}"
+
+
+class Gauge(Counter):
+    """Значение, снимаемое функцией в момент запроса /metrics"""
+
+    kind = "gauge"
+
+    def __init__(self, name: str, documentation: str, read: Callable[[], float]):
+        super().__init__(name, documentation)
+        self._read = read
+
+    def samples(self):
+        yield f"{self.name} {self._read()}"
+
+
+class Histogram(Counter):
+    """Гистограмма в формате Prometheus"""
+
+    kind = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(buckets)
+
+    def observe(self, value: float, *labels: str):
+        with self._lock:
+            state = self._values.get(labels)
+            if state is None:
+                state = self._values[labels] = [[0] * len(self.buckets), 0, 0.0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    state[0][i] += 1
+            state[1] += 1
+            state[2] += value
+
+    def samples(self):
+        with self._lock:
+            items = [(labels, (list(s[0]), s[1], s[2])) for labels, s in self._values.items()]
+        for labels, (counts, count, total) in items:
+            for bound, bucket_count in zip(self.buckets, counts):
+                le = f'le="{bound}"'
+                yield f"{self.name}_bucket{_format_labels(self.labelnames, labels, le)} {bucket_count}"
+            inf = 'le="+Inf"'
+            yield f"{self.name}_bucket{_format_labels(self.labelnames, labels, inf)} {count}"
+            yield f"{self.name}_count{_format_labels(self.labelnames, labels)} {count}"
+            yield f"{self.name}_sum{_format_labels(self.labelnames, labels)} {total}"
+
+
+class Registry:
+    """Набор метрик процесса"""
+
+    def __init__(self):
+        self._metrics = []
+
+    def register(self, metric):
+        self._metrics.append(metric)
+        return metric
+
+    def render(self) -> str:
+        lines = []
+        for metric in self._metrics:
+            lines.append(f"# HELP {metric.name} {metric.documentation}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            lines.extend(metric.samples())
+        return "\n".join(lines) + "\n"
+
+
+registry = Registry()
+
+UPDATE_LATENCY = registry.register(Histogram(
+    "bot_update_duration_seconds", "Полное время обработки обновления", ("event_type",)
+))
+HANDLER_LATENCY = registry.register(Histogram(
+    "bot_handler_duration_seconds", "Время работы хендлера", ("handler",)
+))
+HANDLER_ERRORS = registry.register(Counter(
+    "bot_handler_errors_total", "Исключения в хендлерах", ("handler",)
+))
+MONGO_LATENCY = registry.register(Histogram(
+    "mongo_command_duration_seconds", "Время выполнения команд MongoDB", ("command",)
+))
+MONGO_ERRORS = registry.register(Counter(
+    "mongo_command_errors_total", "Ошибки команд MongoDB", ("command",)
+))
+API_LATENCY = registry.register(Histogram(
+    "telegram_api_duration_seconds", "Время запросов к Bot API", ("method",)
+))
+API_ERRORS = registry.register(Counter(
+    "telegram_api_errors_total", "Ошибки запросов к Bot API", ("method",)
+))
+
+
+def observe(histogram: Histogram, duration: float, label: str):
+    """Запись длительности и лог медленных операций"""
+    histogram.observe(duration, label)
+    if duration * 1000 >= settings.SLOW_OP_THRESHOLD_MS:
+        logger.warning(f"🐢 Медленная операция {histogram.name}[{label}]: {duration * 1000:.0f} мс")
+
+
+class MongoCommandTimer(monitoring.CommandListener):
+    """Длительность команд MongoDB (регистрируется в AsyncIOMotorClient)"""
+
+    def started(self, event):
+        pass
+
+    def succeeded(self, event):
+        observe(MONGO_LATENCY, event.duration_micros / 1e6, event.command_name)
+
+    def failed(self, event):
+        MONGO_ERRORS.inc(event.command_name)
+        observe(MONGO_LATENCY, event.duration_micros / 1e6, event.command_name)
+
+
+async def metrics_handler(request: web.Request) -> web.Response:
+    return web.Response(
+        body=registry.render().encode(),
+        headers={"Content-Type": "text/plain; version=0.0.4; charset=utf-8"},
+    )
+
+
+def setup_metrics(app: web.Application, path: str = "/metrics"):
+    app.router.add_get(path, metrics_handler)
@@ -0,0 +1,49 @@
+import hashlib
+import random
+from typing import List, Set
+
+from utils.search import terms
+
+
+NUM_HASHES = 48
+# Подпись режется на BANDS полос по ROWS значений. Отзыв попадает в кандидаты,
+# если совпала хотя бы одна полоса: при сходстве s вероятность 1 - (1 - s^ROWS)^BANDS —
+# 0.998 при s = 0.9, 0.91 при 0.8 и 0.12 при 0.5. Окончательно решает similarity()
+BANDS = 8
+ROWS = NUM_HASHES // BANDS
+_MASK64 = (1 << 64) - 1
+
+# Фиксированное зерно: подписи должны совпадать между процессами и перезапусками
+_rng = random.Random(20240101)
+_PERMUTATIONS = [(_rng.getrandbits(64) | 1, _rng.getrandbits(64)) for _ in range(NUM_HASHES)]
+
+
+def _hash(data: bytes) -> int:
+    # hash() строк солится при каждом запуске — нужен стабильный
+    return int.from_bytes(hashlib.blake2b(data, digest_size=8).digest(), "big")
+
+
+def shingles(text: str) -> Set[str]:
+    """Основы слов и пары соседних основ: регистр, пунктуация и окончания не влияют"""
+    words = terms(text)
+    return set(words) | {f"{a} {b}" for a, b in zip(words, words[1:])} or {""}
+
+
+def signature(text: str) -> List[int]:
+    """MinHash-подпись: доля совпавших позиций оценивает сходство Жаккара множеств шинглов"""
+    hashes = [_hash(shingle.encode()) for shingle in shingles(text)]
+    # (a·x + b) mod 2^64, старшие 32 бита — семейство почти независимых перестановок
+    return [min((x * a + b) & _MASK64 for x in hashes) >> 32 for a, b in _PERMUTATIONS]
+
+
+def bands(sig: List[int]) -> List[int]:
+    """Ключи полос для индекса; номер полосы в старших битах — полосы не смешиваются"""
+    return [
+        band << 56 | _hash(b"".join(v.to_bytes(4, "big") for v in sig[band * ROWS:(band + 1) * ROWS])) >> 8
+        for band in range(BANDS)
+    ]
+
+
+def similarity(a: List[int], b: List[int]) -> float:
+    """Оценка сходства Жаккара по подписям"""
+    return sum(x == y for x, y in zip(a, b)) / NUM_HASHES
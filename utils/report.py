@@ -0,0 +1,106 @@
+from typing import Dict, List, NamedTuple, Optional, Sequence
+
+import numpy as np
+
+from database.report import REPORT_FIELDS
+
+
+RATINGS = 6  # 0 — без оценки, 1–5
+# Telegram не пропустит сообщение длиннее 4096 символов
+LENGTH_LIMIT = 4096
+# Задержка модерации — с точностью до минуты, всё дольше года в последнем столбце
+DELAY_LIMIT_MINUTES = 366 * 24 * 60
+_HOUR_MS = 3_600_000
+_MINUTE_MS = 60_000
+# 1 января 1970 — четверг: сдвиг, чтобы понедельник был днём 0
+_EPOCH_WEEKDAY = 3
+
+
+class FeedbackReport(NamedTuple):
+    """Сводка по всей истории отзывов"""
+    total: int
+    distribution: Dict[int, int]
+    approval_by_rating: Dict[int, Optional[float]]
+    moderated_by_rating: Dict[int, int]
+    moderation_minutes: Dict[int, Optional[int]]
+    length: Dict[int, Optional[int]]
+    hours: List[int]
+    weekdays: List[int]
+
+
+def _accumulate(counts: np.ndarray, values: np.ndarray):
+    """Гистограмма значений в counts; bincount без minlength не выделяет лишнего"""
+    if values.size:
+        found = np.bincount(values)
+        counts[:found.size] += found
+
+
+def percentiles(counts: np.ndarray, qs: Sequence[int]) -> Dict[int, Optional[int]]:
+    """Перцентили по гистограмме: наименьшее значение, до которого набирается q% наблюдений"""
+    total = counts.sum()
+    if not total:
+        return {q: None for q in qs}
+    positions = np.searchsorted(np.cumsum(counts), np.asarray(qs) / 100 * total)
+    return {q: int(position) for q, position in zip(qs, positions)}
+
+
+class ReportBuilder:
+    """Отчёт, накапливаемый по пачкам строк (REPORT_FIELDS)
+
+    Каждая пачка превращается в столбцы NumPy и сразу сворачивается
+    в гистограммы фиксированного размера — память не растёт с числом
+    отзывов, а медианы и перцентили точны до единицы гистограммы.
+    """
+
+    def __init__(self):
+        self.rows = 0
+        self.ratings = np.zeros(RATINGS, np.int64)
+        # [оценка, итог]: столбец 0 — отклонено, 1 — одобрено
+        self.outcomes = np.zeros(RATINGS * 2, np.int64)
+        self.lengths = np.zeros(LENGTH_LIMIT + 1, np.int64)
+        self.delays = np.zeros(DELAY_LIMIT_MINUTES + 1, np.int64)
+        # [день недели, час]
+        self.hours = np.zeros(7 * 24, np.int64)
+
+    def add(self, batch: List[dict]):
+        size = len(batch)
+        if not size:
+            return
+        column = {
+            field: np.fromiter((row[field] for row in batch), np.int64, size) for field in REPORT_FIELDS
+        }
+
+        rating = np.clip(column["rating"], 0, RATINGS - 1)
+        _accumulate(self.ratings, rating)
+
+        approved = column["approved"]
+        moderated = approved >= 0
+        _accumulate(self.outcomes, rating[moderated] * 2 + approved[moderated])
+
+        _accumulate(self.lengths, np.minimum(column["length"], LENGTH_LIMIT))
+
+        delay = column["delay"][moderated]
+        _accumulate(self.delays, np.minimum(np.maximum(delay, 0) // _MINUTE_MS, DELAY_LIMIT_MINUTES))
+
+        hour = column["created"] // _HOUR_MS
+        _accumulate(self.hours, (hour // 24 + _EPOCH_WEEKDAY) % 7 * 24 + hour % 24)
+
+        self.rows += size
+
+    def result(self) -> FeedbackReport:
+        outcomes = self.outcomes.reshape(RATINGS, 2)
+        moderated = outcomes.sum(axis=1)
+        by_day_hour = self.hours.reshape(7, 24)
+        return FeedbackReport(
+            total=self.rows,
+            distribution={rating: int(self.ratings[rating]) for rating in range(RATINGS)},
+            approval_by_rating={
+                rating: float(outcomes[rating, 1] / moderated[rating]) if moderated[rating] else None
+                for rating in range(RATINGS)
+            },
+            moderated_by_rating={rating: int(moderated[rating]) for rating in range(RATINGS)},
+            moderation_minutes=percentiles(self.delays, (50, 90)),
+            length=percentiles(self.lengths, (50, 90, 99)),
+            hours=by_day_hour.sum(axis=0).tolist(),
+            weekdays=by_day_hour.sum(axis=1).tolist(),
+        )
@@ -0,0 +1,97 @@
+import math
+import re
+from collections import defaultdict
+from functools import lru_cache
+from typing import Callable, Dict, Hashable, Iterable, List
+
+
+_WORD = re.compile(r"\w+", re.UNICODE)
+
+# Окончания русских слов, от длинных к коротким. Грубее Snowball,
+# но сводит «доставка», «доставки», «доставкой» к одной основе
+_ENDINGS = sorted("""
+    ами ями ого его ому ему ыми ими ать ять ить еть уть ешь ишь ете ите ает яет ует
+    ой ей ий ый ая яя ое ее ую юю ом ем ам ям ах ях ов ев ми ые ие их ых ет ит ут ют ат ят
+    ия ию ии ья ье ью
+    ся сь ть ла ло ли на но ны
+    а я о е и ы у ю ь й
+""".split(), key=len, reverse=True)
+_MIN_STEM = 3
+
+
+@lru_cache(maxsize=65536)
+def stem(word: str) -> str:
+    """Основа слова: нижний регистр, ё → е, без окончания"""
+    word = word.lower().replace("ё", "е")
+    for ending in _ENDINGS:
+        if word.endswith(ending) and len(word) - len(ending) >= _MIN_STEM:
+            return word[:-len(ending)]
+    return word
+
+
+def terms(text: str) -> List[str]:
+    return [stem(word) for word in _WORD.findall(text or "")]
+
+
+class InvertedIndex:
+    """Обратный индекс по тексту отзывов в памяти процесса
+
+    Для развёртываний без текстовых индексов MongoDB. Хранит частоты основ
+    и метаданные для фильтров; ранжирование — TF-IDF с нормировкой по длине.
+    Индекс локален для процесса: при нескольких репликах каждая видит
+    только свои изменения до перестроения.
+    """
+
+    def __init__(self):
+        self._postings: Dict[str, Dict[Hashable, int]] = defaultdict(dict)
+        self._lengths: Dict[Hashable, int] = {}
+        self._meta: Dict[Hashable, dict] = {}
+
+    def __len__(self) -> int:
+        return len(self._meta)
+
+    def add(self, doc_id: Hashable, text: str, meta: dict):
+        if doc_id in self._meta:
+            self.remove(doc_id)
+        counts: Dict[str, int] = defaultdict(int)
+        for term in terms(text):
+            counts[term] += 1
+        for term, count in counts.items():
+            self._postings[term][doc_id] = count
+        self._lengths[doc_id] = sum(counts.values())
+        self._meta[doc_id] = {**meta, "_terms": tuple(counts)}
+
+    def update(self, doc_id: Hashable, **fields):
+        """Изменение метаданных (например, статуса после модерации)"""
+        meta = self._meta.get(doc_id)
+        if meta is not None:
+            meta.update(fields)
+
+    def remove(self, doc_id: Hashable):
+        meta = self._meta.pop(doc_id, None)
+        if meta is None:
+            return
+        for term in meta["_terms"]:
+            postings = self._postings.get(term)
+            if postings is not None:
+                postings.pop(doc_id, None)
+                if not postings:
+                    del self._postings[term]
+        del self._lengths[doc_id]
+
+    def search(self, text: str, predicate: Callable[[dict], bool] = None) -> List[Hashable]:
+        """ID документов с любым из слов запроса, от самых релевантных"""
+        scores: Dict[Hashable, float] = defaultdict(float)
+        total = len(self._meta) or 1
+        for term in set(terms(text)):
+            postings = self._postings.get(term, {})
+            if not postings:
+                continue
+            idf = math.log(1 + total / len(postings))
+            for doc_id, count in postings.items():
+                scores[doc_id] += count * idf
+
+        matched: Iterable[Hashable] = scores
+        if predicate is not None:
+            matched = [doc_id for doc_id in scores if predicate(self._meta[doc_id])]
+        return sorted(matched, key=lambda doc_id: scores[doc_id] / math.sqrt(self._lengths[doc_id] or 1), reverse=True)